@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async Writer - Фоновая запись на диск вне цикла событий asyncio
+Карты, логи и конфиги пишутся отдельным потоком через ограниченную очередь,
+чтобы задержки диска не замораживали соединения Telethon всех аккаунтов.
+JsonState - общая основа журналов (награды, промо, чекпоинты, история циклов)
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import copy
+import json
+import os
+import queue
+import threading
+
+# Размер очереди: при переполнении корутины ждут (без блокировки цикла событий)
+WRITER_QUEUE_SIZE = int(os.getenv("WRITER_QUEUE_SIZE", "1000"))
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """
+    Один поток-писатель с ограниченной очередью задач (fn, args, kwargs)
+    """
+
+    def __init__(self, maxsize=WRITER_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="anicard-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                fn, args, kwargs, future = item
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except Exception as e:
+                    print(f"❌ Ошибка фоновой записи ({getattr(fn, '__name__', fn)}): {e}")
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def submit_nowait(self, fn, *args, **kwargs):
+        """
+        Ставит запись в очередь из синхронного кода.
+        Блокируется только если очередь переполнена
+        """
+        future = concurrent.futures.Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    async def submit(self, fn, *args, **kwargs):
+        """
+        Ставит запись в очередь из корутины; при переполнении уступает цикл событий
+        """
+        future = concurrent.futures.Future()
+        item = (fn, args, kwargs, future)
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return future
+            except queue.Full:
+                await asyncio.sleep(0.01)
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def flush(self):
+        """
+        Ждёт завершения всех поставленных записей (блокирующе)
+        """
+        self._queue.join()
+
+    async def aflush(self):
+        """
+        Ждёт завершения всех записей, не блокируя цикл событий
+        """
+        await asyncio.to_thread(self.flush)
+
+    def close(self):
+        """
+        Дописывает очередь и останавливает поток
+        """
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+
+_shared_writer = None
+_shared_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    Возвращает общий для процесса фоновый писатель (дописывается при выходе)
+    """
+    global _shared_writer
+    if _shared_writer is None:
+        with _shared_lock:
+            if _shared_writer is None:
+                _shared_writer = BackgroundWriter()
+                atexit.register(_shared_writer.close)
+    return _shared_writer
+
+
+async def write_async(fn, *args, **kwargs):
+    """
+    Выполняет запись fn(*args, **kwargs) в фоновом потоке, не дожидаясь её
+    """
+    return await get_writer().submit(fn, *args, **kwargs)
+
+
+async def flush_writes():
+    """
+    Дожидается записи всего, что стоит в очереди (перед завершением цикла)
+    """
+    if _shared_writer is not None:
+        await _shared_writer.aflush()
+
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def read_json_async(path):
+    """
+    Читает JSON файл в пуле потоков
+    """
+    return await asyncio.to_thread(_load_json, path)
+
+
+def save_json(path, data):
+    """
+    Атомарно записывает JSON (выполняется в фоновом потоке):
+    сначала во временный файл, затем замена - файл не бывает записан наполовину
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class JsonState:
+    """
+    Состояние в JSON-файле: читается при первом обращении и живёт в памяти,
+    на диск пишется копия в фоновом потоке. Нечитаемый файл - начинаем заново
+    label - что это за файл (для сообщения об ошибке чтения)
+    """
+
+    label = "файл состояния"
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            try:
+                self._data = _load_json(self.path)
+            except FileNotFoundError:
+                self._data = {}
+            except Exception as e:
+                print(f"⚠️ Не удалось прочитать {self.label} {self.path}, начинаем заново: {e}")
+                self._data = {}
+        return self._data
+
+    def snapshot(self):
+        """
+        Копия данных для записи в фоновом потоке
+        """
+        return copy.deepcopy(self._load())
+
+    async def write(self):
+        """
+        Ставит запись копии в фоновый поток, не дожидаясь её
+        """
+        await write_async(save_json, self.path, self.snapshot())
+
+    def write_nowait(self):
+        """
+        То же из синхронного кода
+        """
+        get_writer().submit_nowait(save_json, self.path, self.snapshot())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк классификатора сообщений
+Сравнивает message_classifier с прежним обработчиком wait_new_from
+на записанном корпусе ответов бота (benchmarks/message_corpus.json)
+
+Запуск:
+    python benchmarks/bench_classifier.py [повторов]
+"""
+
+import json
+import os
+import sys
+import timeit
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+from message_classifier import classify, is_ignored
+
+CORPUS_PATH = os.path.join(CURRENT_DIR, "message_corpus.json")
+
+
+def legacy_is_ignored(text, is_video):
+    """
+    Копия фильтра из прежнего обработчика wait_new_from (списки создаются
+    на каждое событие, text.lower() вызывается на каждую фразу)
+    """
+    if is_video:
+        return True
+
+    system_messages = [
+        "Получена новая",
+        "Вам попалась повторная карта",
+        "Следующая попытка будет доступна",
+        "повторная карта",
+        "следующая попытка",
+        "будет доступна"
+    ]
+    if any(sys_msg.lower() in text.lower() for sys_msg in system_messages):
+        return True
+
+    quest_keywords = ["квест", "задание", "миссия", "quest", "mission"]
+    if any(keyword in text.lower() for keyword in quest_keywords):
+        return True
+
+    return False
+
+
+def load_corpus():
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)["messages"]
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    corpus = load_corpus()
+
+    # Проверяем, что решения совпадают и категории верны
+    mismatches = 0
+    for item in corpus:
+        category = classify(item["text"], is_video=item["video"], has_buttons=item["buttons"])
+        if is_ignored(category) != legacy_is_ignored(item["text"], item["video"]):
+            mismatches += 1
+            print(f"❌ Расхождение с прежним фильтром: {item['text'][:50]!r}")
+        if category.value != item["category"]:
+            mismatches += 1
+            print(f"❌ Категория {category.value}, ожидалась {item['category']}: {item['text'][:50]!r}")
+
+    def run_legacy():
+        for item in corpus:
+            legacy_is_ignored(item["text"], item["video"])
+
+    def run_classifier():
+        for item in corpus:
+            is_ignored(classify(item["text"], is_video=item["video"], has_buttons=item["buttons"]))
+
+    total = repeats * len(corpus)
+    legacy_time = min(timeit.repeat(run_legacy, number=repeats, repeat=3))
+    classifier_time = min(timeit.repeat(run_classifier, number=repeats, repeat=3))
+
+    print(f"📊 Сообщений в корпусе: {len(corpus)}, повторов: {repeats}")
+    print(f"🐢 Прежний обработчик: {legacy_time / total * 1e9:8.0f} нс/сообщение")
+    print(f"⚡ Классификатор:      {classifier_time / total * 1e9:8.0f} нс/сообщение")
+    print(f"🚀 Ускорение: x{legacy_time / classifier_time:.2f}")
+    print(f"✅ Расхождений: {mismatches}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
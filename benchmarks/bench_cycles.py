@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сквозной бенчмарк циклов против симулятора бота (benchmarks/mock_bot.py)
+run_daily_cycle и run_card_cycle прогоняются для 1, 10, 100 и 1000 аккаунтов
+при разных concurrency. Каждый прогон - отдельный процесс (честный пик RSS).
+Общий лимит действий по умолчанию снят, иначе он, а не код, задаёт время.
+
+Результаты пишутся в JSON, чтобы сравнивать прогоны между коммитами:
+    время, действия (отправки + клики) на аккаунт, таймауты ответов,
+    запасные iter_messages, FloodWait, пик RSS, обращения по сценариям
+С --assert-budget бенчмарк падает, если прогон сценария вышел за бюджет действий.
+
+Запуск:
+    python benchmarks/bench_cycles.py
+    python benchmarks/bench_cycles.py --accounts 1,10 --concurrency 2,10 --cycles daily
+    python benchmarks/bench_cycles.py --output results.json --latency 20 --action-interval 50
+    python benchmarks/bench_cycles.py --accounts 10 --concurrency 10 --assert-budget
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+RESULTS_DIR = os.path.join(CURRENT_DIR, "results")
+
+
+def peak_rss_mb():
+    """
+    Пик RSS процесса в МБ (None, если модуль resource недоступен, например на Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КБ, macOS - байты
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PARENT_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+async def run_single(cycle, accounts, concurrency, latency, jitter, flood_rate, seed):
+    """
+    Один прогон в текущем процессе. Возвращает словарь с метриками
+    """
+    from mock_bot import BOT_USERNAME, MockAnicardBot, install
+
+    bot = MockAnicardBot(latency=latency, jitter=jitter, flood_rate=flood_rate, seed=seed)
+    combined_cycle = install(bot)
+    from latency_tracker import get_latency_tracker
+    from round_trips import get_round_trip_counter
+
+    os.makedirs("accounts", exist_ok=True)
+    with open(os.path.join("accounts", "accounts.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "bot": "@" + BOT_USERNAME,
+            "concurrency": concurrency,
+            "accounts": [{"session": f"mock_{i}", "phone": f"+7000{i:07d}"} for i in range(accounts)],
+        }, f)
+
+    runner = combined_cycle.run_daily_cycle if cycle == "daily" else combined_cycle.run_card_cycle
+    started = time.perf_counter()
+    # Логи циклов не нужны: тысячи строк на прогон
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            await runner()
+            await bot.drain()
+        finally:
+            sys.stdout = stdout
+    wall = time.perf_counter() - started
+
+    totals = bot.totals()
+    actions = totals["sent"] + totals["clicks"]
+    counter = get_round_trip_counter()
+    return {
+        "cycle": cycle,
+        "accounts": accounts,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "accounts_per_min": round(accounts / wall * 60, 1) if wall else None,
+        "round_trips_per_account": round(actions / accounts, 2),
+        "messages_sent": totals["sent"],
+        "clicks": totals["clicks"],
+        "reply_timeouts": sum(get_latency_tracker().timeouts.values()),
+        "history_fallbacks": totals["history_fetches"],
+        "flood_waits": totals["flood_waits"],
+        "peak_rss_mb": peak_rss_mb(),
+        "scenarios": counter.summary(),
+        "budget_violations": [
+            {"account": account, "scenario": scenario, "actions": actions, "budget": budget}
+            for account, scenario, actions, budget in counter.violations()
+        ],
+    }
+
+
+def run_in_subprocess(args, cycle, accounts, concurrency):
+    """
+    Запускает прогон отдельным процессом во временной папке
+    """
+    env = dict(os.environ)
+    env["ACTION_INTERVAL"] = str(args.action_interval)
+    env["GLOBAL_ACTIONS_PER_SECOND"] = str(args.global_rate)
+    env.setdefault("API_ID", "1")
+    env.setdefault("API_HASH", "mock")
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--single", cycle, str(accounts), str(concurrency),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--flood-rate", str(args.flood_rate), "--seed", str(args.seed),
+    ]
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк циклов на симуляторе бота")
+    parser.add_argument("--single", nargs=3, metavar=("CYCLE", "ACCOUNTS", "CONCURRENCY"),
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--cycles", default="daily,cards", help="daily,cards")
+    parser.add_argument("--accounts", default="1,10,100,1000", help="количества аккаунтов через запятую")
+    parser.add_argument("--concurrency", default="2,10,50", help="значения concurrency через запятую")
+    parser.add_argument("--latency", type=float, default=50, help="задержка ответа бота, мс")
+    parser.add_argument("--jitter", type=float, default=20, help="разброс задержки, мс")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля действий с FloodWait")
+    parser.add_argument("--action-interval", type=int, default=50, help="ACTION_INTERVAL для прогона, мс")
+    parser.add_argument("--global-rate", type=float, default=0,
+                        help="GLOBAL_ACTIONS_PER_SECOND для прогона (0 - без общего лимита)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--assert-budget", action="store_true",
+                        help="код возврата 1, если прогон сценария вышел за бюджет действий (round_trips.py)")
+    parser.add_argument("--output", help="путь к JSON (по умолчанию benchmarks/results/cycles_<коммит>.json)")
+    args = parser.parse_args()
+
+    if args.single:
+        cycle, accounts, concurrency = args.single[0], int(args.single[1]), int(args.single[2])
+        result = asyncio.run(run_single(cycle, accounts, concurrency, args.latency / 1000.0,
+                                        args.jitter / 1000.0, args.flood_rate, args.seed))
+        print(json.dumps(result, ensure_ascii=False))
+        return
+
+    commit = git_commit()
+    results = []
+    print(f"📊 Коммит: {commit or '-'}, задержка бота {args.latency:.0f}±{args.jitter:.0f} мс, "
+          f"ACTION_INTERVAL {args.action_interval} мс, общий лимит {args.global_rate or '-'} действий/с")
+    for cycle in args.cycles.split(","):
+        for accounts in parse_list(args.accounts):
+            for concurrency in parse_list(args.concurrency):
+                if concurrency > accounts and concurrency != min(parse_list(args.concurrency)):
+                    continue  # Больше потоков, чем аккаунтов, ничего не меняет
+                result = run_in_subprocess(args, cycle, accounts, concurrency)
+                results.append(result)
+                print(f"  {cycle:5s} аккаунтов {accounts:5d} | concurrency {concurrency:3d} | "
+                      f"{result['wall_s']:8.2f} с | {result['round_trips_per_account']:6.1f} действий/акк | "
+                      f"таймаутов {result['reply_timeouts']:4d} | iter_messages {result['history_fallbacks']:4d} | "
+                      f"RSS {result['peak_rss_mb']} МБ")
+                for violation in result["budget_violations"][:5]:
+                    print(f"    ⚠️ {violation['account']}/{violation['scenario']}: "
+                          f"{violation['actions']} действий при бюджете {violation['budget']}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"cycles_{commit or 'local'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "settings": {
+                "latency_ms": args.latency,
+                "jitter_ms": args.jitter,
+                "flood_rate": args.flood_rate,
+                "action_interval_ms": args.action_interval,
+                "global_actions_per_second": args.global_rate,
+                "seed": args.seed,
+            },
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результаты: {output}")
+
+    if args.assert_budget and any(result["budget_violations"] for result in results):
+        print("❌ Превышен бюджет действий")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
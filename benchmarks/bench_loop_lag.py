@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк задержки цикла событий при массовом сохранении карт
+Сравнивает три варианта записи внутри корутин:
+  - json:   прежний save_card_to_file (чтение + перезапись JSON файла аккаунта)
+  - sqlite: CardStore прямо в цикле событий
+  - writer: CardStore через фоновый поток async_writer
+
+Задержка цикла измеряется тикером: sleep(1 мс) и замер опоздания пробуждения.
+
+Запуск:
+    python benchmarks/bench_loop_lag.py [аккаунтов] [карт на аккаунт]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+from async_writer import BackgroundWriter
+from card_store import CardStore
+
+TICK = 0.001
+
+
+def legacy_save_card_to_file(folder, session_name, card_info):
+    """
+    Прежняя запись: весь файл аккаунта читается и перезаписывается на каждую карту
+    """
+    file_path = os.path.join(folder, f"{session_name}.json")
+    if os.path.exists(file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    else:
+        data = {"legendary": [], "mythic": [], "adamantine": [], "epic": []}
+
+    rarity = card_info["rarity"]
+    for existing_card in data[rarity]:
+        if existing_card["name"] == card_info["name"]:
+            return
+    data[rarity].append(dict(card_info, timestamp=datetime.now().isoformat()))
+    data[rarity].sort(key=lambda x: x["name"])
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def make_card(account, i):
+    return {
+        "name": f"Карта {account}-{i}",
+        "rating": 87,
+        "rarity": "legendary",
+        "universe": "Наруто",
+        "element": "Огонь 🔥",
+        "type": "battle",
+    }
+
+
+async def ticker(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - start - TICK)
+
+
+async def run_mode(mode, accounts, cards_per_account, workdir):
+    store = None
+    writer = None
+    if mode in ("sqlite", "writer"):
+        store = CardStore(os.path.join(workdir, f"{mode}.db"))
+    if mode == "writer":
+        writer = BackgroundWriter()
+
+    async def account_task(account):
+        for i in range(cards_per_account):
+            card = make_card(account, i)
+            if mode == "json":
+                legacy_save_card_to_file(workdir, f"account_{account}", card)
+            elif mode == "sqlite":
+                store.add_card(f"account_{account}", card)
+            else:
+                await writer.submit(store.add_card, f"account_{account}", card)
+            # Имитация сетевой паузы между попытками
+            await asyncio.sleep(0)
+
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(account_task(a) for a in range(accounts)))
+    if writer:
+        await writer.aflush()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick_task
+
+    if writer:
+        writer.close()
+    if store:
+        store.close()
+
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    return {
+        "mode": mode,
+        "wall_s": round(elapsed, 3),
+        "lag_p99_ms": round(p99 * 1000, 2),
+        "lag_max_ms": round((lags[-1] if lags else 0.0) * 1000, 2),
+        "ticks": len(lags),
+    }
+
+
+async def main():
+    accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    cards_per_account = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    print(f"📊 Аккаунтов: {accounts}, карт на аккаунт: {cards_per_account}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in ("json", "sqlite", "writer"):
+            result = await run_mode(mode, accounts, cards_per_account, workdir)
+            print(f"  {result['mode']:7s} время {result['wall_s']:7.3f} с | "
+                  f"лаг p99 {result['lag_p99_ms']:7.2f} мс | макс {result['lag_max_ms']:7.2f} мс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mock Bot - Офлайн симулятор @anicardplaybot и поддельный TelegramClient
+Позволяет прогонять ежедневный цикл и цикл карт для сотен аккаунтов без сети:
+меню и инлайн-кнопки, AniPass, Дары богов, Крафт меню и Омут душ, сокровищница
+клана, магазин, профиль с попытками, выпадение карт, повторы и кулдауны.
+
+Задержка, разброс и FloodWait настраиваются; при одинаковом seed поведение
+бота детерминировано.
+
+Подмена клиента в combined_cycle:
+    bot = MockAnicardBot(latency=0.02)
+    install(bot)            # combined_cycle.TelegramClient и client_pool.TelegramClient
+
+Быстрая проверка:
+    python benchmarks/mock_bot.py [daily|cards]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+from telethon import events
+from telethon.errors import FloodWaitError
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.abspath(os.path.join(CURRENT_DIR, os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+BOT_ID = 777000
+BOT_USERNAME = "anicardplaybot"
+
+MAIN_MENU_TEXT = "📜 Главное меню\n\nВыберите раздел:"
+MAIN_MENU_BUTTONS = [["🎫 AniPass", "⛩ Дары богов"], ["🧬 Крафт меню", "🏆 Рейтинг"]]
+ARTIFACTS_TEXT = "⛩ Прикоснись к  древним артефактам, чтобы получить их дары"
+ARTIFACTS_BUTTONS = [["🀄️ Мистический жетон"], ["🎲 Древний куб удачи", "📯 Рог призыва"], ["Назад 🔙"]]
+CRAFT_TEXT = "🧬 В Аникарде есть много способов получить новые карты"
+CRAFT_BUTTONS = [["🪞 Омут душ", "🧪 Алхимия"], ["Назад 🔙"]]
+DONATE_BUTTON = "🔘 Пожертвовать все эссенции/проекции душ 🔘"
+FILTERS_TEXT = "⚙️ Выберите нужные фильтры для карт"
+FILTERS_BUTTONS = [["Боевые ⚔️", "Коллекционные 🎭"], ["Карты ⏩"]]
+SPIN_PRICE = 70
+
+CARD_NAMES = [
+    "Итачи Учиха", "Мадара Учиха", "Ханами", "Шуна", "Зоро", "Годжо Сатору", "Леви Аккерман",
+    "Микаса Аккерман", "Ванилла Айс", "Какаши Хатаке", "Рем", "Мегумин", "Эрен Йегер", "Луффи",
+]
+UNIVERSES = ["Наруто", "Магическая битва", "Атака титанов", "Ван Пис", "ДжоДжо"]
+ELEMENTS = ["Огонь 🔥", "Вода 💧", "Дерево 🍃", "Земля 🪨", "Воздух 🌪"]
+NOISE = [
+    "📋 Ежедневный квест выполнен! Получите награду в меню квестов",
+    "🎯 Новое задание: получите 5 боевых карт",
+]
+RARE_RATINGS = [80, 87, 88, 89, 90, 99, 100, 101]
+COMMON_RATINGS = list(range(40, 80)) + list(range(81, 87))
+
+
+# === ПОДДЕЛЬНЫЕ ОБЪЕКТЫ TELETHON ===
+
+class FakeSession:
+    def __init__(self, filename):
+        self.filename = filename
+
+
+class FakeEntity:
+    def __init__(self, id=BOT_ID, username=BOT_USERNAME):
+        self.id = id
+        self.username = username
+
+
+class FakeUser:
+    def __init__(self, id, username, phone):
+        self.id = id
+        self.username = username
+        self.phone = phone
+        self.first_name = username
+        self.last_name = None
+
+
+class FakeButton:
+    """
+    Инлайн-кнопка: click() передаёт нажатие симулятору бота
+    """
+
+    def __init__(self, message, text):
+        self.message = message
+        self.text = text
+        self.data = text.encode("utf-8")
+
+    async def click(self):
+        client = self.message.client
+        client.bot.maybe_flood(client)
+        client.stats["clicks"] += 1
+        await client.bot.handle_click(client, self.message, self.text)
+
+
+class FakeMessage:
+    """
+    Сообщение с raw_text, кнопками и флагом видео
+    """
+
+    def __init__(self, client, id, text, buttons=None, video=False, out=False):
+        self.client = client
+        self.id = id
+        self.out = out
+        self.video = video
+        self.set_content(text, buttons)
+
+    def set_content(self, text, buttons=None):
+        self.raw_text = text
+        self.text = text
+        self.message = text
+        self.buttons = [[FakeButton(self, b) for b in row] for row in buttons] if buttons else None
+
+
+class FakeEvent:
+    def __init__(self, message):
+        self.message = message
+        self.raw_text = message.raw_text
+
+
+class FakeTelegramClient:
+    """
+    Замена TelegramClient: send_message, on/add_event_handler,
+    remove_event_handler, iter_messages, get_entity, start/get_me/is_user_authorized
+    """
+
+    def __init__(self, bot, session, api_id=None, api_hash=None):
+        self.bot = bot
+        self.session = FakeSession(session if str(session).endswith(".session") else f"{session}.session")
+        self.handlers = []
+        self.history = []
+        self.connected = False
+        self.entity = FakeEntity()
+        self._next_id = 1
+        self.stats = {"sent": 0, "clicks": 0, "history_fetches": 0, "bot_messages": 0, "edits": 0}
+
+    # --- подключение ---
+    async def start(self, phone=None, **kwargs):
+        self.connected = True
+        return self
+
+    async def connect(self):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def is_user_authorized(self):
+        return True
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+    async def get_me(self):
+        name = os.path.basename(self.session.filename).replace(".session", "")
+        return FakeUser(zlib.crc32(name.encode()), name, f"+7{zlib.crc32(name.encode()) % 10**10:010d}")
+
+    async def get_entity(self, username):
+        return self.entity
+
+    # --- события ---
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event=None):
+        self.handlers = [(cb, ev) for cb, ev in self.handlers if cb != callback]
+
+    def on(self, event):
+        def decorator(callback):
+            self.add_event_handler(callback, event)
+            return callback
+        return decorator
+
+    async def _dispatch(self, message, edited=False):
+        for callback, event in list(self.handlers):
+            # MessageEdited наследуется от NewMessage - проверяем его первым
+            is_edit_handler = isinstance(event, events.MessageEdited)
+            if is_edit_handler != edited:
+                continue
+            await callback(FakeEvent(message))
+
+    # --- сообщения ---
+    def _new_id(self):
+        message_id = self._next_id
+        self._next_id += 1
+        return message_id
+
+    async def send_message(self, entity, text):
+        self.bot.maybe_flood(self)
+        self.stats["sent"] += 1
+        message = FakeMessage(self, self._new_id(), text, out=True)
+        self.history.append(message)
+        await self.bot.handle_text(self, text)
+        return message
+
+    async def iter_messages(self, entity, limit=None):
+        self.stats["history_fetches"] += 1
+        count = 0
+        for message in reversed(self.history):
+            if limit is not None and count >= limit:
+                return
+            count += 1
+            yield message
+
+    async def receive(self, text, buttons=None, video=False):
+        """
+        Новое сообщение от бота
+        """
+        message = FakeMessage(self, self._new_id(), text, buttons=buttons, video=video)
+        self.history.append(message)
+        self.stats["bot_messages"] += 1
+        await self._dispatch(message)
+        return message
+
+    async def edit(self, message, text, buttons=None):
+        """
+        Бот редактирует своё сообщение
+        """
+        message.set_content(text, buttons)
+        self.stats["edits"] += 1
+        await self._dispatch(message, edited=True)
+
+
+# === СОСТОЯНИЕ АККАУНТА В СИМУЛЯТОРЕ ===
+
+class AccountState:
+    def __init__(self, rng):
+        self.rng = rng
+        self.battle_attempts = rng.randint(0, 3)
+        self.collection_attempts = rng.randint(0, 2)
+        self.free_at = {"battle": 0.0, "collection": 0.0}
+        self.battle_coins = rng.choice([0, 140, 210, 700, 1000])
+        self.anipass_level_ready = rng.random() < 0.7
+        self.has_clan = rng.random() < 0.6
+        self.payout = rng.random() < 0.5
+        self.claimed = set()
+        self.essences = rng.randint(0, 20)
+        self.owned = {}
+        self.mode = None
+        self.filter_name = None
+
+
+# === СИМУЛЯТОР БОТА ===
+
+class MockAnicardBot:
+    """
+    Симулятор @anicardplaybot.
+    latency/jitter - задержка каждого ответа (сек), flood_rate - доля
+    действий с FloodWaitError на flood_seconds, noise_rate - доля ответов,
+    перед которыми приходит квестовое сообщение
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, flood_rate=0.0, flood_seconds=1,
+                 rare_rate=0.15, duplicate_rate=0.2, noise_rate=0.05, cooldown=4 * 3600, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.rare_rate = rare_rate
+        self.duplicate_rate = duplicate_rate
+        self.noise_rate = noise_rate
+        self.cooldown = cooldown
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.accounts = {}
+        self.clients = []
+        self.flood_waits = 0
+        self._tasks = set()
+
+    def client(self, session, api_id=None, api_hash=None):
+        """
+        Фабрика с сигнатурой TelegramClient(session, api_id, api_hash)
+        """
+        client = FakeTelegramClient(self, session, api_id, api_hash)
+        self.clients.append(client)
+        return client
+
+    def state(self, client):
+        key = client.session.filename
+        state = self.accounts.get(key)
+        if state is None:
+            state = AccountState(random.Random(self.seed * 1000003 + zlib.crc32(key.encode())))
+            self.accounts[key] = state
+        return state
+
+    def maybe_flood(self, client):
+        if self.flood_rate and self.rng.random() < self.flood_rate:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+
+    def _delay(self):
+        # Минимум 1 мс: ответ никогда не приходит в том же шаге цикла событий
+        return max(0.001, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, client, steps):
+        """
+        Доставляет шаги ("new", text, buttons) / ("edit", message, text, buttons)
+        по очереди, каждый со своей задержкой
+        """
+        async def deliver():
+            for step in steps:
+                await asyncio.sleep(self._delay())
+                if step[0] == "new":
+                    await client.receive(step[1], buttons=step[2])
+                else:
+                    await client.edit(step[1], step[2], buttons=step[3])
+
+        if self.noise_rate and self.rng.random() < self.noise_rate:
+            steps = [("new", self.rng.choice(NOISE), None)] + list(steps)
+        task = asyncio.get_running_loop().create_task(deliver())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self):
+        """
+        Дожидается доставки всех запланированных ответов
+        """
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    # --- текстовые команды ---
+    async def handle_text(self, client, text):
+        state = self.state(client)
+        text = text.strip()
+
+        if state.mode == "card_name" and not text.startswith("/"):
+            state.mode = "filters"
+            state.filter_name = text
+            self._schedule(client, [("new", FILTERS_TEXT, FILTERS_BUTTONS)])
+            return
+        if state.mode == "filters" and text not in ("📜 Меню", "Меню", "🎒 Профиль", "🧳 Мои карты"):
+            if text not in ("Боевые ⚔️", "Коллекционные 🎭", "✖️", "Высокий рейтинг вперёд", "Новые вперёд"):
+                state.filter_name = text
+            self._schedule(client, [("new", FILTERS_TEXT, FILTERS_BUTTONS)])
+            return
+        state.mode = None
+
+        if text in ("📜 Меню", "Меню"):
+            self._schedule(client, [("new", MAIN_MENU_TEXT, MAIN_MENU_BUTTONS)])
+        elif text == "/start":
+            self._schedule(client, [("new", "👋 Добро пожаловать в Anicard!", None)])
+        elif text.startswith("/start ") or text.startswith("/promo"):
+            state.battle_attempts += 3
+            self._schedule(client, [("new", "✅ Промокод активирован! Вы получили 3 ⚔️ попытки", None)])
+        elif text == "🛡 Мой клан":
+            if state.has_clan:
+                self._schedule(client, [("new", "🛡 Клан «Акацуки»\n\nУчастников: 18/30\nУровень: 7",
+                                         [["💰 Сокровищница"], ["👥 Участники"]])])
+            else:
+                self._schedule(client, [("new", "😔 У вас нет клана", None)])
+        elif text == "🛍 Магазин":
+            self._schedule(client, [("new", f"🛍 Магазин\n\nBattleCoin: {state.battle_coins} 🎖",
+                                     [["🎖️ Крутки за BattleCoin"], ["💎 Донат"]])])
+        elif text == "🎒 Профиль":
+            self._schedule(client, [("new", self._profile_text(client, state), None)])
+        elif text in ("⚔️ Получить карту", "🏵️ Получить карту"):
+            self._spin(client, state, "battle" if text.startswith("⚔️") else "collection")
+        elif text == "🧳 Мои карты":
+            state.mode = "card_name"
+            self._schedule(client, [("new", "🧳 Введите название карты или нажмите кнопку ниже", [["Название ➕"]])])
+        else:
+            self._schedule(client, [("new", "🤔 Неизвестная команда. Откройте 📜 Меню", None)])
+
+    def _profile_text(self, client, state):
+        nick = os.path.basename(client.session.filename).replace(".session", "")
+        return (f"🎒 Профиль\n\nНик: {nick}\nКарт: {sum(len(v) for v in state.owned.values())}\n"
+                f"Попытки: · ⚔️ - {state.battle_attempts} | 🎭 - {state.collection_attempts}\n"
+                f"BattleCoin: {state.battle_coins} 🎖")
+
+    def _spin(self, client, state, card_type):
+        now = time.time()
+        attr = "battle_attempts" if card_type == "battle" else "collection_attempts"
+        if getattr(state, attr) > 0:
+            setattr(state, attr, getattr(state, attr) - 1)
+        elif now >= state.free_at[card_type]:
+            state.free_at[card_type] = now + self.cooldown
+        else:
+            left = int(state.free_at[card_type] - now)
+            self._schedule(client, [("new", f"⏳ Следующая попытка будет доступна через {left // 3600} ч {left % 3600 // 60} мин", None)])
+            return
+
+        rng = state.rng
+        rating = rng.choice(RARE_RATINGS) if rng.random() < self.rare_rate else rng.choice(COMMON_RATINGS)
+        owned = state.owned.setdefault(card_type, {})
+        if owned and rng.random() < self.duplicate_rate:
+            name = rng.choice(sorted(owned))
+            notice = f"🔁 Вам попалась повторная карта: {name}\n\nВы получили 15 🧩 осколков"
+        else:
+            name = rng.choice(CARD_NAMES)
+            kind = "боевая" if card_type == "battle" else "коллекционная"
+            notice = f"🪪 Получена новая {kind} карточка\n\n🎴 Карта: {name}"
+        owned[name] = rating
+        card = f"{rating} | {name}\n🔮 Вселенная: {rng.choice(UNIVERSES)}\n🍃 Элемент: {rng.choice(ELEMENTS)}"
+        self._schedule(client, [("new", notice, None), ("new", card, None)])
+
+    # --- нажатия кнопок ---
+    async def handle_click(self, client, message, button):
+        state = self.state(client)
+
+        if button == "Назад 🔙":
+            self._schedule(client, [("edit", message, MAIN_MENU_TEXT, MAIN_MENU_BUTTONS)])
+        elif button == "🎫 AniPass":
+            self._schedule(client, [("edit", message, *self._anipass(state))])
+        elif "✔️" in button:
+            state.anipass_level_ready = False
+            self._schedule(client, [("edit", message, *self._anipass(state, "🎉 Награда уровня получена!"))])
+        elif button == "⛩ Дары богов":
+            self._schedule(client, [("edit", message, ARTIFACTS_TEXT, ARTIFACTS_BUTTONS)])
+        elif button in ("🀄️ Мистический жетон", "🎲 Древний куб удачи", "📯 Рог призыва"):
+            if button in state.claimed:
+                reply = "🕯 Артефакт ещё восстанавливает силы"
+            else:
+                state.claimed.add(button)
+                reply = f"{button.split()[0]} Вы получили дар артефакта!"
+            self._schedule(client, [("new", reply, None), ("new", ARTIFACTS_TEXT, ARTIFACTS_BUTTONS)])
+        elif button == "🧬 Крафт меню":
+            self._schedule(client, [("new", "🧬 Крафт меню", None), ("new", CRAFT_TEXT, CRAFT_BUTTONS)])
+        elif button == "🪞 Омут душ":
+            self._schedule(client, [("edit", message, f"🪞 Омут душ\n\nЭссенции: {state.essences}\nПроекции душ: 0",
+                                     [[DONATE_BUTTON], ["Назад 🔙"]])])
+        elif button == DONATE_BUTTON:
+            donated, state.essences = state.essences, 0
+            self._schedule(client, [("new", f"💎 Вы пожертвовали {donated} эссенций", None)])
+        elif button == "💰 Сокровищница":
+            if state.payout:
+                self._schedule(client, [("edit", message, "💰 Сокровищница клана\n\nДоступна выплата: 50 🎖",
+                                         [["Получить выплату"], ["Назад 🔙"]])])
+            else:
+                self._schedule(client, [("edit", message, "💰 Сокровищница клана\n\nНет доступных выплат", [["Назад 🔙"]])])
+        elif button == "Получить выплату":
+            state.payout = False
+            state.battle_coins += 50
+            self._schedule(client, [("new", "✅ Выплата получена: 50 🎖", None)])
+        elif button == "🎖️ Крутки за BattleCoin":
+            self._schedule(client, [("edit", message, f"🎰 Крутки за BattleCoin\n\n{SPIN_PRICE} 🎖 за крутку",
+                                     [["1 ⚔️", "10 ⚔️"], ["Назад 🔙"]])])
+        elif button in ("1 ⚔️", "10 ⚔️"):
+            count = int(button.split()[0])
+            if state.battle_coins >= count * SPIN_PRICE:
+                state.battle_coins -= count * SPIN_PRICE
+                state.battle_attempts += count
+                self._schedule(client, [("new", f"✅ Куплено {count} ⚔️ попыток", None)])
+            else:
+                self._schedule(client, [("new", "❌ Недостаточно BattleCoin", None)])
+        elif button == "Название ➕":
+            state.mode = "card_name"
+            self._schedule(client, [("new", "📝 Введите название карты", None)])
+        elif button == "Карты ⏩":
+            state.mode = None
+            name = (state.filter_name or "").casefold()
+            cards = [f"{rating} | {card}" for owned in state.owned.values()
+                     for card, rating in owned.items() if name in card.casefold()]
+            self._schedule(client, [("edit", message, "🎴 Ваши карты", [[c] for c in cards[:10]] or [["Назад 🔙"]])])
+        else:
+            self._schedule(client, [("new", "🤔 Этот раздел пока недоступен", None)])
+
+    def _anipass(self, state, note="Нажмите ✔️ чтобы забрать награду уровня"):
+        level = "2 ✔️" if state.anipass_level_ready else "2 ✅"
+        return (f"🎫 AniPass\n\nУровень: 14\nОпыт: 2300/2500\n\n{note}", [["1 ✅", level], ["Назад 🔙"]])
+
+    def totals(self):
+        """
+        Сумма счётчиков всех клиентов
+        """
+        totals = {"sent": 0, "clicks": 0, "history_fetches": 0, "bot_messages": 0, "edits": 0}
+        for client in self.clients:
+            for key, value in client.stats.items():
+                totals[key] += value
+        totals["flood_waits"] = self.flood_waits
+        return totals
+
+
+def install(bot):
+    """
+    Подменяет TelegramClient в combined_cycle и client_pool на клиентов симулятора
+    """
+    os.environ.setdefault("API_ID", "1")
+    os.environ.setdefault("API_HASH", "mock")
+    import client_pool
+    import combined_cycle
+
+    combined_cycle.TelegramClient = bot.client
+    client_pool.TelegramClient = bot.client
+    return combined_cycle
+
+
+async def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else "daily"
+    bot = MockAnicardBot(latency=0.01, jitter=0.005, seed=1)
+    combined_cycle = install(bot)
+    client = bot.client("accounts/mock_1")
+    await client.start()
+    started = time.perf_counter()
+    # Карты сохраняются во временную базу, а не в accounts/cards.db
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        if mode == "cards":
+            await combined_cycle.card_cycle_for_account(client, "@" + BOT_USERNAME)
+        else:
+            await combined_cycle.daily_cycle_for_account(client, "@" + BOT_USERNAME)
+        await bot.drain()
+        await combined_cycle.flush_writes()
+        os.chdir(PARENT_DIR)
+    print(f"⏱️ {time.perf_counter() - started:.2f} с, {bot.totals()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
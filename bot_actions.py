@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bot Actions - Действия с ботом: отправка, клик, ожидание ответа
+Общие для циклов и движка сценариев (scenario_engine): ожидание регистрируется
+до действия, темп задаёт лимитер, обращения учитываются по сценариям
+"""
+
+import asyncio
+import re
+
+from message_router import get_router
+from rate_limiter import get_rate_limiter
+from round_trips import get_round_trip_counter
+
+
+async def wait_new_from(client, entity, timeout=None, regex=None, contains=None):
+    """
+    Ждём НОВОЕ сообщение от entity (бота).
+    Можно фильтровать по подстроке (contains) или regex.
+    Игнорирует видео, квесты и системные сообщения.
+    Сообщения приходят через постоянный маршрутизатор клиента (message_router).
+    timeout=None - адаптивный таймаут по замерам задержки бота.
+    """
+    router = get_router(client, entity)
+    waiter = router.arm(contains=contains, regex=regex)
+    return await router.wait(waiter, timeout, step=f"wait:{contains or regex or 'reply'}")
+
+async def click_button(msg, *, text=None, regex=None, index=None, case_insensitive=True):
+    """
+    Клик по инлайн-кнопке в сообщении:
+    - text: точное совпадение подписи
+    - regex: регулярка по подписи
+    - index: порядковый номер (0..N-1), слева направо, сверху вниз
+    Возвращает True/False.
+    """
+    if not msg or not msg.buttons:
+        return False
+    flat = [b for row in msg.buttons for b in row]
+    if index is not None:
+        if 0 <= index < len(flat):
+            await flat[index].click()
+            return True
+        return False
+
+    def norm(s):
+        return (s or "") if not case_insensitive else (s or "").lower()
+
+    for b in flat:
+        bt = b.text or ""
+        if text and norm(bt) == norm(text):
+            await b.click()
+            return True
+        if regex and re.search(regex, bt, re.I if case_insensitive else 0):
+            await b.click()
+            return True
+    return False
+
+async def send_and_wait(client, entity, message, timeout=None, contains=None, regex=None, step=None, cooldown=False):
+    """
+    Отправляет сообщение и ждёт ответ бота.
+    Ожидание регистрируется до отправки; темп задаёт лимитер (rate_limiter),
+    таймаут по умолчанию - по замерам задержки (latency_tracker).
+    step - имя шага для замеров, если текст сообщения меняется (название карты)
+    cooldown - сообщение о кулдауне тоже ответ (крутка карты)
+    Бросает asyncio.TimeoutError, если ответа нет.
+    """
+    router = get_router(client, entity)
+    return await get_rate_limiter().run(
+        client.session.filename, router.send_and_wait, message, timeout, contains=contains, regex=regex, step=step,
+        cooldown=cooldown,
+    )
+
+async def send_limited(client, entity, message):
+    """
+    Отправляет сообщение без ожидания ответа, через лимитер
+    """
+    sent = await get_rate_limiter().run(client.session.filename, client.send_message, entity, message)
+    get_round_trip_counter().count(client.session.filename, "sent", message)
+    return sent
+
+async def fetch_last_message(client, entity):
+    """
+    Запасной путь после таймаута: последнее сообщение из истории чата
+    (лишний запрос к Telegram, поэтому учитывается отдельно)
+    """
+    get_round_trip_counter().count(client.session.filename, "history_fetches")
+    async for message in client.iter_messages(entity, limit=1):
+        return message
+    return None
+
+async def send_message_and_wait(client, entity, message, timeout=None, contains=None, regex=None, step=None):
+    """
+    Отправляет сообщение и ждет ответ (contains/regex - фильтр ответа)
+    """
+    try:
+        return await send_and_wait(client, entity, message, timeout=timeout, contains=contains, regex=regex, step=step)
+    except asyncio.TimeoutError:
+        print(f"⚠️ [{client.session.filename}] Таймаут при ожидании ответа на '{message}'")
+        # Пытаемся получить последнее сообщение
+        try:
+            return await fetch_last_message(client, entity)
+        except:
+            return None
+
+async def open_screen(client, entity, command, screen=None):
+    """
+    Экран бота с инлайн-кнопками (меню, магазин, клан).
+    Если прошлое сообщение экрана всё ещё показывает ту же раскладку,
+    кнопки нажимаются прямо в нём - без отправки команды и ожидания ответа
+    """
+    router = get_router(client, entity)
+    screen = screen or command
+    msg = router.screens.get(screen)
+    if msg is not None:
+        print(f"♻️ [{client.session.filename}] '{command}': кнопки из сохранённого сообщения, без повторного запроса")
+        return msg
+    
+    msg = await send_message_and_wait(client, entity, command)
+    if msg and not router.screens.remember(screen, msg):
+        print(f"🔄 [{client.session.filename}] '{command}': раскладка кнопок изменилась, кэш обновлён")
+    return msg
+
+async def click_button_and_wait(client, entity, msg, button_text=None, button_index=None, timeout=None, waiter=None):
+    """
+    Нажимает кнопку и ждет новое сообщение.
+    waiter - заранее зарегистрированное ожидание ответа на клик, если за ним
+    в очереди должно стоять ещё одно (Click.then_expect в scenario_engine)
+    """
+    try:
+        if not button_text and button_index is None:
+            return None
+        
+        # Регистрируем ожидание до клика, чтобы не потерять быстрый ответ
+        router = get_router(client, entity)
+        # Ответом считается и новое сообщение, и редактирование нажатого
+        if waiter is None:
+            waiter = router.arm(edit_of=getattr(msg, "id", None))
+        
+        async def click():
+            # Задержка ответа считается от клика, а не от ожидания в лимитере
+            router.mark_sent(waiter)
+            if button_text:
+                clicked = await click_button(msg, text=button_text)
+            else:
+                clicked = await click_button(msg, index=button_index)
+            if clicked:
+                get_round_trip_counter().count(client.session.filename, "clicked", f"click:{button_text or button_index}")
+            return clicked
+        
+        try:
+            clicked = await get_rate_limiter().run(client.session.filename, click)
+        except Exception:
+            router.disarm(waiter)
+            # Сообщение больше не принимает нажатия - не берём его из кэша экранов
+            router.screens.forget_message(getattr(msg, "id", None))
+            raise
+        
+        if clicked:
+            try:
+                return await router.wait(waiter, timeout, step=f"click:{button_text or button_index}")
+            except asyncio.TimeoutError:
+                print(f"⚠️ [{client.session.filename}] Таймаут при ожидании ответа после клика")
+                # Пытаемся получить последнее сообщение
+                try:
+                    return await fetch_last_message(client, entity)
+                except:
+                    return None
+        else:
+            router.disarm(waiter)
+            print(f"⚠️ [{client.session.filename}] Кнопка не найдена: {button_text or f'index {button_index}'}")
+        return None
+    except Exception as e:
+        print(f"❌ [{client.session.filename}] Ошибка в click_button_and_wait: {e}")
+        return None
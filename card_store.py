@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Card Store - Хранилище редких карт в SQLite
+Одна база accounts/cards.db (WAL) вместо перезаписи accounts/cards/<session>.json
+на каждую карту. Уникальность по (аккаунт, редкость, название).
+
+Импорт старых JSON файлов:
+    python card_store.py import [папка]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from session_names import account_name
+
+CARDS_DB_PATH = os.path.join("accounts", "cards.db")
+CARDS_FOLDER = os.path.join("accounts", "cards")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    rarity TEXT NOT NULL,
+    name TEXT NOT NULL,
+    rating INTEGER,
+    universe TEXT,
+    element TEXT,
+    type TEXT,
+    timestamp TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cards_account_rarity_name ON cards (account, rarity, name);
+CREATE INDEX IF NOT EXISTS idx_cards_rating ON cards (rating);
+"""
+
+CARD_FIELDS = ("account", "rarity", "name", "rating", "universe", "element", "type", "timestamp")
+
+
+class CardStore:
+    """
+    Потокобезопасная обёртка над SQLite базой редких карт
+    """
+
+    def __init__(self, path=CARDS_DB_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.create_function("casefold", 1, lambda s: (s or "").casefold(), deterministic=True)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _row(self, account, card_info):
+        rarity = card_info.get("rarity")
+        return (
+            account_name(account),
+            rarity,
+            card_info.get("name") or card_info.get("character") or "Неизвестно",
+            card_info.get("rating"),
+            card_info.get("universe", ""),
+            card_info.get("element", ""),
+            card_info.get("type", ""),
+            card_info.get("timestamp") or datetime.now().isoformat(),
+        )
+
+    def add_cards(self, account, cards):
+        """
+        Добавляет карты одной транзакцией.
+        Возвращает список флагов: True - карта новая, False - уже была
+        """
+        rows = [self._row(account, card) for card in cards]
+        inserted = []
+        with self._lock, self._conn:
+            for row in rows:
+                cursor = self._conn.execute(
+                    f"INSERT OR IGNORE INTO cards ({', '.join(CARD_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                inserted.append(cursor.rowcount == 1)
+        return inserted
+
+    def add_card(self, account, card_info):
+        """
+        Добавляет одну карту. True - карта новая, False - уже была
+        """
+        return self.add_cards(account, [card_info])[0]
+
+    def cards(self, accounts=None, min_rating=None, search=None):
+        """
+        Список карт (dict) с фильтрами по аккаунтам, минимальному рейтингу и
+        подстроке названия; отсортирован по рейтингу (редкие сверху)
+        """
+        where = []
+        params = []
+        if accounts is not None:
+            names = [account_name(a) for a in accounts]
+            if not names:
+                return []
+            where.append(f"account IN ({', '.join('?' for _ in names)})")
+            params.extend(names)
+        if min_rating is not None:
+            where.append("rating >= ?")
+            params.append(min_rating)
+        if search:
+            where.append("instr(casefold(name), ?) > 0")
+            params.append(search.casefold())
+
+        query = f"SELECT {', '.join(CARD_FIELDS)} FROM cards"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY rating DESC, account, name"
+
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def cards_by_account(self, accounts=None):
+        """
+        Карты в прежнем формате файлов: {аккаунт: {редкость: [карты]}}
+        """
+        result = {}
+        for card in self.cards(accounts=accounts):
+            account = card.pop("account")
+            rarity = card["rarity"]
+            result.setdefault(account, {}).setdefault(rarity, []).append(card)
+        return result
+
+    def import_json_folder(self, folder=CARDS_FOLDER):
+        """
+        Импортирует старые accounts/cards/<session>.json. Повторный импорт безопасен
+        """
+        folder = Path(folder)
+        if not folder.exists():
+            return 0
+
+        imported = 0
+        for card_file in sorted(folder.glob("*.json")):
+            try:
+                with open(card_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"❌ Ошибка при чтении {card_file}: {e}")
+                continue
+
+            cards = []
+            for rarity, items in data.items():
+                for card in items or []:
+                    cards.append(dict(card, rarity=rarity))
+            imported += sum(self.add_cards(card_file.stem, cards))
+
+        return imported
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_card_store(path=CARDS_DB_PATH):
+    """
+    Возвращает общее хранилище карт. При первом создании базы
+    автоматически импортирует существующие JSON файлы
+    """
+    global _shared_store
+    if _shared_store is None:
+        with _shared_lock:
+            if _shared_store is None:
+                is_new = not os.path.exists(path)
+                store = CardStore(path)
+                if is_new:
+                    imported = store.import_json_folder()
+                    if imported:
+                        print(f"📦 Импортировано карт из JSON: {imported}")
+                _shared_store = store
+    return _shared_store
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "import":
+        folder = sys.argv[2] if len(sys.argv) > 2 else CARDS_FOLDER
+        imported = get_card_store().import_json_folder(folder)
+        print(f"📦 Импортировано новых карт: {imported}")
+    else:
+        print("Использование: python card_store.py import [папка с JSON]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checkpoints - Пройденные разделы сценариев по аккаунтам и дате цикла
+Каждый пройденный раздел (Group в scenario_engine) сразу записывается на диск.
+Если процесс упал посреди цикла, перезапуск продолжает каждый аккаунт с первого
+непройденного раздела, а аккаунты, закончившие цикл, не подключаются вовсе.
+Дата цикла считается по расписанию сброса бота (claim_ledger), поэтому после
+сброса все отметки начинаются заново.
+
+Файл: accounts/checkpoints.json
+    {"daily": {"date": "2025-01-01", "accounts": {"account_1": {"done": ["daily:AniPass"], "finished": false}}}}
+"""
+
+import os
+
+from async_writer import JsonState
+from claim_ledger import get_claim_ledger
+from session_names import account_name
+
+CHECKPOINTS_PATH = os.path.join("accounts", "checkpoints.json")
+CHECKPOINTS_ENABLED = os.getenv("CYCLE_CHECKPOINTS", "1") != "0"
+
+
+class AccountCheckpoint:
+    """
+    Отметки одного аккаунта в одном цикле (ctx.checkpoint для scenario_engine)
+    """
+
+    def __init__(self, store, session_name, cycle):
+        self.store = store
+        self.session_name = session_name
+        self.cycle = cycle
+
+    def is_done(self, key):
+        return key in self.store._account(self.session_name, self.cycle)["done"]
+
+    def mark_done(self, key):
+        done = self.store._account(self.session_name, self.cycle)["done"]
+        if key not in done:
+            done.append(key)
+            self.store.write_nowait()
+
+
+class CycleCheckpoints(JsonState):
+    """
+    Отметки по (цикл, аккаунт) для текущей даты цикла.
+    Запись - сразу после каждой отметки (write_nowait)
+    """
+
+    label = "чекпоинты"
+
+    def __init__(self, path=CHECKPOINTS_PATH, enabled=CHECKPOINTS_ENABLED):
+        super().__init__(path)
+        self.enabled = enabled
+
+    def cycle_date(self, now=None):
+        """
+        Дата текущего цикла: день последнего ежедневного сброса бота
+        """
+        return get_claim_ledger().period_start("daily", now).date().isoformat()
+
+    def _cycle(self, cycle):
+        data = self._load()
+        date = self.cycle_date()
+        state = data.get(cycle)
+        if state is None or state.get("date") != date:
+            # Новый день бота - отметки прошлого цикла больше не действуют
+            state = {"date": date, "accounts": {}}
+            data[cycle] = state
+        return state
+
+    def _account(self, session_name, cycle):
+        accounts = self._cycle(cycle)["accounts"]
+        return accounts.setdefault(account_name(session_name), {"done": [], "finished": False})
+
+    def for_account(self, session_name, cycle):
+        """
+        Чекпоинт аккаунта для ScenarioContext (None, если чекпоинты выключены)
+        """
+        if not self.enabled:
+            return None
+        return AccountCheckpoint(self, session_name, cycle)
+
+    def is_finished(self, session_name, cycle):
+        """
+        True, если аккаунт уже закончил этот цикл сегодня
+        """
+        if not self.enabled:
+            return False
+        account = self._cycle(cycle)["accounts"].get(account_name(session_name))
+        return bool(account and account.get("finished"))
+
+    def mark_finished(self, session_name, cycle):
+        if not self.enabled:
+            return
+        self._account(session_name, cycle)["finished"] = True
+        self.write_nowait()
+
+
+_shared_checkpoints = None
+
+
+def get_checkpoints():
+    """
+    Возвращает общие для процесса чекпоинты циклов
+    """
+    global _shared_checkpoints
+    if _shared_checkpoints is None:
+        _shared_checkpoints = CycleCheckpoints()
+    return _shared_checkpoints
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claim Ledger - Журнал полученных наград по аккаунтам
+Когда аккаунт последний раз забрал каждую награду (или убедился, что она
+уже забрана). По расписанию сброса бота ежедневный цикл заходит только в
+разделы, где в текущем периоде ещё есть что получить.
+
+Журнал: accounts/claims.json
+    {"account_1": {"anipass": "2025-01-01T22:05:00+00:00", "no_clan": ...}}
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+from async_writer import JsonState
+from session_names import account_name
+
+CLAIMS_PATH = os.path.join("accounts", "claims.json")
+CLAIM_LEDGER_ENABLED = os.getenv("CLAIM_LEDGER", "1") != "0"
+# Ежедневный сброс бота (UTC) и день недели еженедельного сброса (0 - понедельник)
+DAILY_RESET_HOUR_UTC = int(os.getenv("BOT_RESET_HOUR_UTC", "22"))
+WEEKLY_RESET_WEEKDAY = int(os.getenv("BOT_WEEKLY_RESET_WEEKDAY", "6"))
+
+# Награда -> период сброса
+REWARDS = {
+    "anipass": "daily",
+    "mystic_token": "daily",
+    "luck_cube": "weekly",
+    "summon_horn": "weekly",
+    "soul_pool": "daily",
+    "clan_payout": "daily",
+    "shop_spins": "daily",
+    # Не награда: аккаунт без клана, сокровищницу проверяем раз в неделю
+    "no_clan": "weekly",
+}
+
+
+class ClaimLedger(JsonState):
+    """
+    Моменты получения наград по аккаунтам (UTC) и расписание сброса бота
+    """
+
+    label = "журнал наград"
+
+    def __init__(self, path=CLAIMS_PATH, reset_hour=DAILY_RESET_HOUR_UTC,
+                 weekly_weekday=WEEKLY_RESET_WEEKDAY, enabled=CLAIM_LEDGER_ENABLED):
+        super().__init__(path)
+        self.reset_hour = reset_hour
+        self.weekly_weekday = weekly_weekday
+        self.enabled = enabled
+
+    def period_start(self, kind, now=None):
+        """
+        Начало текущего периода (daily/weekly) по расписанию сброса бота
+        """
+        now = now or datetime.now(timezone.utc)
+        start = now.replace(hour=self.reset_hour, minute=0, second=0, microsecond=0)
+        if start > now:
+            start -= timedelta(days=1)
+        if kind == "weekly":
+            start -= timedelta(days=(start.weekday() - self.weekly_weekday) % 7)
+        return start
+
+    def last_claimed(self, session_name, reward):
+        value = self._load().get(account_name(session_name), {}).get(reward)
+        return datetime.fromisoformat(value) if value else None
+
+    def is_done(self, session_name, reward, now=None):
+        """
+        True, если награда уже получена в текущем периоде
+        """
+        if not self.enabled:
+            return False
+        claimed = self.last_claimed(session_name, reward)
+        return claimed is not None and claimed >= self.period_start(REWARDS[reward], now)
+
+    def pending(self, session_name, now=None):
+        """
+        Награды, которые в текущем периоде ещё могут что-то дать
+        """
+        pending = {reward for reward in REWARDS if reward != "no_clan" and not self.is_done(session_name, reward, now)}
+        if self.is_done(session_name, "no_clan", now):
+            pending.discard("clan_payout")
+        return pending
+
+    def mark(self, session_name, reward, now=None):
+        """
+        Отмечает награду полученной (или уже забранной) в текущем периоде
+        """
+        now = now or datetime.now(timezone.utc)
+        self._load().setdefault(account_name(session_name), {})[reward] = now.isoformat(timespec="seconds")
+
+
+_shared_ledger = None
+
+
+def get_claim_ledger():
+    """
+    Возвращает общий для процесса журнал наград
+    """
+    global _shared_ledger
+    if _shared_ledger is None:
+        _shared_ledger = ClaimLedger()
+    return _shared_ledger
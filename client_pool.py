@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Client Pool - Пул подключённых клиентов Telegram
+Клиенты авторизуются один раз и остаются подключены между циклами;
+get_me() и сущность бота кэшируются, при обрыве переподключение ленивое
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from telethon import TelegramClient
+
+from message_router import close_routers
+
+
+class PooledClient:
+    """
+    Клиент аккаунта в пуле + кэш get_me() и сущности бота
+    """
+
+    def __init__(self, session_name, client):
+        self.session_name = session_name
+        self.client = client
+        self.user = None
+        self.entities = {}
+        self.lock = asyncio.Lock()
+
+
+class ClientPool:
+    """
+    Пул клиентов по имени сессии. Заимствование через borrow():
+
+        async with pool.borrow(acc, "@anicardplaybot") as (client, user, entity):
+            ...
+    """
+
+    def __init__(self, api_id, api_hash, sessions_folder="accounts", keep_connected=True):
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.sessions_folder = sessions_folder
+        # False - пул одного прогона: клиент отключается после заимствования
+        self.keep_connected = keep_connected
+        self.clients = {}
+
+    def _get(self, session_name):
+        pooled = self.clients.get(session_name)
+        if pooled is None:
+            client = TelegramClient(f"{self.sessions_folder}/{session_name}", self.api_id, self.api_hash)
+            pooled = PooledClient(session_name, client)
+            self.clients[session_name] = pooled
+        return pooled
+
+    def client_for(self, session_name):
+        """
+        Клиент аккаунта из пула (создаётся без подключения)
+        """
+        return self._get(session_name).client
+
+    def mark_checked(self, session_name, user):
+        """
+        Клиент уже подключён и проверен (session_health): запоминает get_me(),
+        чтобы borrow() только переподключался, без интерактивного start()
+        """
+        self._get(session_name).user = user
+
+    def is_ready(self, session_name, bot_username=None):
+        """
+        True, если клиент уже авторизован, подключён (и знает сущность бота)
+        """
+        pooled = self.clients.get(session_name)
+        if pooled is None or pooled.user is None or not pooled.client.is_connected():
+            return False
+        return bot_username is None or bot_username in pooled.entities
+
+    async def _ensure_ready(self, pooled, phone, bot_username):
+        client = pooled.client
+        if pooled.user is None:
+            # Первое подключение: полная авторизация
+            await client.start(phone=phone)
+            pooled.user = await client.get_me()
+        elif not client.is_connected():
+            # Ленивое переподключение: сессия уже авторизована
+            print(f"🔌 [{pooled.session_name}] Переподключаемся...")
+            await client.connect()
+
+        if bot_username not in pooled.entities:
+            pooled.entities[bot_username] = await client.get_entity(bot_username)
+        return pooled.entities[bot_username]
+
+    async def warm(self, acc, bot_username):
+        """
+        Подключает аккаунт заранее, не занимая его
+        """
+        pooled = self._get(acc["session"])
+        async with pooled.lock:
+            await self._ensure_ready(pooled, acc.get("phone"), bot_username)
+        return pooled
+
+    @asynccontextmanager
+    async def borrow(self, acc, bot_username):
+        """
+        Выдаёт (client, user, entity) подключённого аккаунта.
+        Клиент не отключается после использования (если keep_connected)
+        """
+        pooled = self._get(acc["session"])
+        async with pooled.lock:
+            try:
+                entity = await self._ensure_ready(pooled, acc.get("phone"), bot_username)
+            except Exception:
+                # Неудачное подключение не оставляем в пуле
+                await self.discard(acc["session"])
+                raise
+            try:
+                yield pooled.client, pooled.user, entity
+            finally:
+                if not self.keep_connected:
+                    await self.discard(acc["session"])
+
+    async def discard(self, session_name):
+        """
+        Отключает и убирает клиент из пула
+        """
+        pooled = self.clients.pop(session_name, None)
+        if pooled is not None:
+            close_routers(pooled.client)
+            await pooled.client.disconnect()
+
+    async def close(self):
+        """
+        Отключает все клиенты пула
+        """
+        for session_name in list(self.clients):
+            try:
+                await self.discard(session_name)
+            except Exception as e:
+                print(f"⚠️ [{session_name}] Ошибка при отключении: {e}")
@@ -6,32 +6,89 @@ Anicard Combined Cycle - Объединенный цикл
 """
 
 import asyncio
-import json
 import os
-import random
 import re
 import sys
 import time
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
-from telethon import TelegramClient, events
+from telethon import TelegramClient
 from telethon.errors import FloodWaitError, SessionPasswordNeededError
 
+from async_writer import flush_writes, read_json_async, save_json, write_async
+from card_store import get_card_store
+from checkpoints import get_checkpoints
+from claim_ledger import REWARDS, get_claim_ledger
+from client_pool import ClientPool
+from bot_actions import (
+    click_button_and_wait,
+    fetch_last_message,
+    send_and_wait,
+    send_message_and_wait,
+)
+from message_classifier import MessageCategory, classify_message
+from message_router import close_routers
+from latency_tracker import get_latency_tracker
+from rate_limiter import ACCOUNT_INTERVAL_MS, get_rate_limiter
+from cycle_history import get_cycle_history
+from work_slots import CARD_CHUNK_SIZE, WorkSlots
+from connection_probe import (
+    PROBE_CONCURRENCY,
+    PROBE_REPORT_PATH,
+    build_report,
+    print_table,
+    probe_accounts,
+    summarize,
+)
+from promo_ledger import OUTCOMES as PROMO_OUTCOMES, classify_reply, get_promo_ledger
+from round_trips import get_round_trip_counter
+from session_health import HEALTH_CHECK_ENABLED, check_sessions
+from scenario_engine import (
+    Back,
+    Branch,
+    Call,
+    Click,
+    Group,
+    Mark,
+    Open,
+    Scenario,
+    ScenarioContext,
+    Send,
+    Stop,
+    StepFailed,
+    get_step_stats,
+    run_scenario,
+)
+
 # Загружаем переменные окружения
 load_dotenv()
 
 # === КОНФИГУРАЦИЯ ===
 API_ID = int(os.getenv("API_ID"))
 API_HASH = os.getenv("API_HASH")
-MESSAGE_TIMEOUT_MS = int(os.getenv("MESSAGE_TIMEOUT", "700"))
-MESSAGE_TIMEOUT = MESSAGE_TIMEOUT_MS / 1000.0
+# MESSAGE_TIMEOUT больше не фиксированная пауза: таймаут ответа бота считается
+# по замерам задержки (latency_tracker), интервал между действиями задаёт
+# только лимитер (rate_limiter)
+
+# Пакетная фильтрация редких карт: одна настройка фильтров на все карты прогона.
+# По умолчанию выключена - что бот сохраняет фильтры между поисками, не проверено
+BATCH_RARE_FILTER = os.getenv("BATCH_RARE_FILTER", "0") == "1"
+
+# Фильтры "Мои карты": тип карт и общие фильтры (подпись, значение)
+FILTER_TYPE_BUTTONS = {"battle": "Боевые ⚔️", "collection": "Коллекционные 🎭"}
+COMMON_CARD_FILTERS = [
+    ("Вселенные", "✖️"),
+    ("Редкости", "✖️"),
+    ("Стихии", "✖️"),
+    ("сортировку", "Высокий рейтинг вперёд"),
+    ("сортировку", "Новые вперёд"),
+]
 
-# Папка для сохранения редких карт
-CARDS_FOLDER = "accounts/cards"
-if not os.path.exists(CARDS_FOLDER):
-    os.makedirs(CARDS_FOLDER)
+# Награды, ради которых ежедневный цикл открывает меню, и артефакты "Даров богов"
+MENU_REWARDS = {"anipass", "mystic_token", "luck_cube", "summon_horn", "soul_pool"}
+ARTIFACT_REWARDS = {"mystic_token", "luck_cube", "summon_horn"}
 
 # === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 
@@ -86,51 +143,29 @@ def parse_card_response(text, card_type):
         print(f"❌ Ошибка при парсинге карты: {e}")
         return None
 
-def save_card_to_file(session_name, card_info):
+def save_cards(session_name, cards):
     """
-    Сохраняет редкую карту в файл
+    Сохраняет редкие карты в хранилище (SQLite) одной транзакцией
     """
     try:
-        rarity = is_rare_card(card_info["rating"])
-        if not rarity:
+        rare = []
+        for card_info in cards:
+            rarity = is_rare_card(card_info["rating"])
+            if rarity:
+                rare.append(dict(card_info, rarity=rarity))
+        if not rare:
             return
         
-        file_path = os.path.join(CARDS_FOLDER, f"{session_name}.json")
+        inserted = get_card_store().add_cards(session_name, rare)
         
-        # Загружаем существующие данные
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        else:
-            data = {"legendary": [], "mythic": [], "adamantine": [], "epic": []}
-        
-        # Проверяем, нет ли уже такой карты
-        for existing_card in data[rarity]:
-            if existing_card["name"] == card_info["name"]:
+        for card_info, is_new in zip(rare, inserted):
+            if is_new:
+                print(f"💾 [{session_name}] Редкая карта сохранена: {card_info['name']} ({card_info['rarity']})")
+            else:
                 print(f"🔄 [{session_name}] Карта {card_info['name']} уже есть в коллекции")
-                return
-        
-        # Добавляем новую карту
-        data[rarity].append({
-            "name": card_info["name"],
-            "universe": card_info["universe"],
-            "element": card_info["element"],
-            "rating": card_info["rating"],
-            "type": card_info["type"],
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Сортируем по названию
-        data[rarity].sort(key=lambda x: x["name"])
-        
-        # Сохраняем
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        print(f"💾 [{session_name}] Редкая карта сохранена: {card_info['name']} ({rarity})")
         
     except Exception as e:
-        print(f"❌ [{session_name}] Ошибка сохранения карты: {e}")
+        print(f"❌ [{session_name}] Ошибка сохранения карт: {e}")
 
 def send_card_notification(session_name, card_info):
     """
@@ -146,552 +181,197 @@ def send_card_notification(session_name, card_info):
     emoji = rarity_emoji.get(card_info["rarity"], "⚪")
     print(f"🎉 [{session_name}] НОВАЯ РЕДКАЯ КАРТА! {emoji} {card_info['name']} (Рейтинг: {card_info['rating']}, {card_info['rarity']})")
 
-async def wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, regex=None, contains=None):
-    """
-    Ждём НОВОЕ сообщение от entity (бота).
-    Можно фильтровать по подстроке (contains) или regex.
-    Игнорирует видео, квесты и системные сообщения.
-    """
-    loop = asyncio.get_event_loop()
-    fut = loop.create_future()
+# === ШАГИ СЦЕНАРИЕВ ===
 
-    @client.on(events.NewMessage(from_users=entity))
-    async def handler(event):
-        text = event.raw_text or ""
-        
-        # Игнорируем видео сообщения
-        if event.message.video:
-            print(f"🎥 [{client.session.filename}] Получено видео сообщение - игнорируем")
-            return
-            
-        # Игнорируем системные сообщения бота
-        system_messages = [
-            "Получена новая",
-            "Вам попалась повторная карта", 
-            "Следующая попытка будет доступна",
-            "повторная карта",
-            "следующая попытка",
-            "будет доступна"
-        ]
-        
-        if any(sys_msg.lower() in text.lower() for sys_msg in system_messages):
-            print(f"ℹ️ [{client.session.filename}] Системное сообщение: {text[:50]}...")
-            return
-            
-        # Игнорируем квестовые сообщения (обычно содержат "квест", "задание", "миссия")
-        quest_keywords = ["квест", "задание", "миссия", "quest", "mission"]
-        if any(keyword in text.lower() for keyword in quest_keywords):
-            print(f"📋 [{client.session.filename}] Квестовое сообщение: {text[:50]}...")
-            return
-        
-        # Применяем пользовательские фильтры
-        if (contains and contains.lower() in text.lower()) or \
-           (regex and re.search(regex, text, re.I)) or \
-           (not contains and not regex):
-            if not fut.done():
-                fut.set_result(event.message)
+ARTIFACTS_TEXT = "Прикоснись к  древним артефактам"
+CRAFT_TEXT = "В Аникарде есть много способов получить новые карты"
+DONATE_BUTTON = "🔘 Пожертвовать все эссенции/проекции душ 🔘"
 
-    try:
-        return await asyncio.wait_for(fut, timeout=timeout)
-    finally:
-        client.remove_event_handler(handler)
-
-async def click_button(msg, *, text=None, regex=None, index=None, case_insensitive=True):
+async def claim_anipass(ctx):
     """
-    Клик по инлайн-кнопке в сообщении:
-    - text: точное совпадение подписи
-    - regex: регулярка по подписи
-    - index: порядковый номер (0..N-1), слева направо, сверху вниз
-    Возвращает True/False.
+    Забирает награду AniPass (✔️ - доступна, ✅ - уже забрана)
     """
-    if not msg or not msg.buttons:
-        return False
-    flat = [b for row in msg.buttons for b in row]
-    if index is not None:
-        if 0 <= index < len(flat):
-            await flat[index].click()
-            return True
-        return False
+    button_texts = ctx.button_texts()
+    available_buttons = [t for t in button_texts if "✔️" in t]
+    taken_buttons = [t for t in button_texts if "✅" in t]
+    ctx.log("📊", f"Доступные кнопки: {available_buttons}")
+    ctx.log("📊", f"Забранные кнопки: {taken_buttons}")
+    
+    if available_buttons:
+        # Меню AniPass остаётся текущим сообщением для возврата
+        ctx.log("🎯", f"AniPass доступен, нажимаем {available_buttons[0]}")
+        reward_msg = await click_button_and_wait(ctx.client, ctx.entity, ctx.msg, button_text=available_buttons[0])
+        if reward_msg:
+            ctx.log("✅", "AniPass получен")
+            ctx.mark("anipass")
+        else:
+            raise StepFailed("не удалось получить AniPass")
+    elif taken_buttons:
+        ctx.log("ℹ️", "AniPass уже забран за день, пропускаем...")
+        ctx.mark("anipass")
+    else:
+        ctx.log("⚠️", "Не найдено ни доступных, ни забранных кнопок AniPass")
 
-    def norm(s):
-        return (s or "") if not case_insensitive else (s or "").lower()
+async def ensure_artifacts_message(ctx):
+    """
+    Убеждаемся, что текущее сообщение - экран артефактов с кнопкой "Назад"
+    """
+    if ARTIFACTS_TEXT not in ctx.text():
+        ctx.log("🪤", "Получаем актуальное сообщение с артефактами...")
+        ctx.msg = await fetch_last_message(ctx.client, ctx.entity) or ctx.msg
 
-    for b in flat:
-        bt = b.text or ""
-        if text and norm(bt) == norm(text):
-            await b.click()
-            return True
-        if regex and re.search(regex, bt, re.I if case_insensitive else 0):
-            await b.click()
-            return True
-    return False
+async def spend_profile_attempts(ctx):
+    """
+    Тратит попытки, указанные в профиле (текущее сообщение)
+    """
+    rare_cards = ctx.values.setdefault("rare_cards", [])
+    attempts_match = re.search(r'Попытки:\s*·\s*⚔️\s*-\s*(\d+)\s*\|\s*🎭\s*-\s*(\d+)', ctx.text())
+    if not attempts_match:
+        ctx.log("ℹ️", "Попытки не найдены в профиле")
+        return
+    
+    battle_attempts = int(attempts_match.group(1))
+    collection_attempts = int(attempts_match.group(2))
+    ctx.log("📊", f"Попытки: ⚔️ {battle_attempts} | 🎭 {collection_attempts}")
+    if battle_attempts == 0 and collection_attempts == 0:
+        ctx.log("ℹ️", "Нет попыток для траты")
+        return
+    
+    # Порции по CARD_CHUNK_SIZE круток: между ними слот отдаётся другим аккаунтам
+    chunks = []
+    for card_type, attempts in (("battle", battle_attempts), ("collection", collection_attempts)):
+        size = CARD_CHUNK_SIZE if CARD_CHUNK_SIZE > 0 and ctx.turn is not None else attempts
+        chunks.extend((card_type, min(size, attempts - done)) for done in range(0, attempts, max(size, 1)))
+    
+    stopped = set()
+    for i, (card_type, attempts) in enumerate(chunks):
+        if card_type in stopped:
+            continue
+        if i > 0:
+            ctx.log("📦", f"Порция {i + 1}/{len(chunks)}: отдаём слот ожидающим аккаунтам...")
+            await ctx.turn.yield_turn()
+        rare_cards.extend(await use_attempts(ctx.client, ctx.entity, attempts, card_type, stopped))
 
-async def send_message_and_wait(client, entity, message, timeout=MESSAGE_TIMEOUT):
+async def spend_extra_attempts(ctx):
     """
-    Отправляет сообщение и ждет ответ
+    Тратит по 1 крутке каждого вида (дополнительно)
     """
-    await client.send_message(entity, message)
-    await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после отправки
-    try:
-        return await wait_new_from(client, entity, timeout=timeout)
-    except asyncio.TimeoutError:
-        print(f"⚠️ [{client.session.filename}] Таймаут при ожидании ответа на '{message}'")
-        # Пытаемся получить последнее сообщение
-        try:
-            async for message in client.iter_messages(entity, limit=1):
-                return message
-        except:
-            return None
+    rare_cards = ctx.values.setdefault("rare_cards", [])
+    rare_cards.extend(await use_attempts(ctx.client, ctx.entity, 1, "battle"))
+    rare_cards.extend(await use_attempts(ctx.client, ctx.entity, 1, "collection"))
 
-async def click_button_and_wait(client, entity, msg, button_text=None, button_index=None, timeout=MESSAGE_TIMEOUT):
+async def filter_found_rare_cards(ctx):
     """
-    Нажимает кнопку и ждет новое сообщение
+    Фильтрует редкие карты, найденные за прогон
     """
-    try:
-        if button_text:
-            clicked = await click_button(msg, text=button_text)
-        elif button_index is not None:
-            clicked = await click_button(msg, index=button_index)
-        else:
-            return None
-        
-        if clicked:
-            try:
-                return await wait_new_from(client, entity, timeout=timeout)
-            except asyncio.TimeoutError:
-                print(f"⚠️ [{client.session.filename}] Таймаут при ожидании ответа после клика")
-                # Пытаемся получить последнее сообщение
-                try:
-                    async for message in client.iter_messages(entity, limit=1):
-                        return message
-                except:
-                    return None
-        else:
-            print(f"⚠️ [{client.session.filename}] Кнопка не найдена: {button_text or f'index {button_index}'}")
-        return None
-    except Exception as e:
-        print(f"❌ [{client.session.filename}] Ошибка в click_button_and_wait: {e}")
-        return None
+    await filter_rare_cards(ctx.client, ctx.entity, ctx.values.get("rare_cards", []))
+
+# Профиль, попытки и фильтрация редких карт - общие для ежедневного цикла и цикла карт
+ATTEMPT_STEPS = [
+    Call(spend_profile_attempts, title="Тратим попытки из профиля", emoji="🎯"),
+    Call(spend_extra_attempts, title="Тратим по 1 крутке каждого вида", emoji="🎯"),
+    Call(filter_found_rare_cards, title="Фильтруем редкие карты", emoji="🔍"),
+]
+
+DAILY_SCENARIO = Scenario("daily", [
+    Open("📜 Меню", emoji="📜", when=lambda ctx: ctx.is_pending(*MENU_REWARDS)),
+    Group("AniPass", emoji="🎫", when=lambda ctx: ctx.is_pending("anipass"), steps=[
+        Click(("AniPass", "🎫"), emoji="🎫"),
+        Call(claim_anipass, title="Проверяем награду AniPass", emoji="📊"),
+        Back(),
+    ]),
+    Group("Дары богов", emoji="⛩", when=lambda ctx: ctx.is_pending(*ARTIFACT_REWARDS), steps=[
+        Click(("Дары богов", "⛩"), emoji="⛩"),
+        # Награда приходит отдельным сообщением, затем бот присылает экран артефактов заново
+        Click("🀄️ Мистический жетон", keep=True, then_expect=ARTIFACTS_TEXT,
+              reward="mystic_token", optional=True, emoji="🀄️"),
+        Click("🎲 Древний куб удачи", keep=True, then_expect=ARTIFACTS_TEXT,
+              reward="luck_cube", optional=True, emoji="🎲"),
+        Click("📯 Рог призыва", keep=True, then_expect=ARTIFACTS_TEXT,
+              reward="summon_horn", optional=True, emoji="📯"),
+        Call(ensure_artifacts_message, title=None),
+        Back(),
+    ]),
+    Group("Крафт меню", emoji="🧬", reward="soul_pool", steps=[
+        Click(("Крафт", "🧬"), then_expect=CRAFT_TEXT, emoji="🧬"),
+        Click("🪞 Омут душ", emoji="🌊"),
+        Click(DONATE_BUTTON, title="Жертвуем все эссенции", optional=True, emoji="💎"),
+    ]),
+    Group("Клан", emoji="🛡", reward="clan_payout", steps=[
+        Open("🛡 Мой клан", emoji="🛡"),
+        Branch(lambda ctx: "У вас нет клана" in ctx.text(), then=[
+            Mark("no_clan", title=None),
+            Stop("У аккаунта нет клана, пропускаем сокровищницу"),
+        ]),
+        Click(("Сокровищница", "💰"), emoji="💰"),
+        Branch(lambda ctx: "Нет доступных выплат" in ctx.text(), then=[Stop("Нет доступных выплат")]),
+        Click(("Получить выплату", "выплату"), emoji="💰"),
+    ]),
+    Group("Магазин", emoji="🛍", reward="shop_spins", steps=[
+        Open("🛍 Магазин", emoji="🛍"),
+        Click(("BattleCoin", "🎖️"), emoji="🎰"),
+        Click("10 ⚔️", optional=True, emoji="⚔️"),
+    ]),
+    Group("Профиль и попытки", emoji="🎒", steps=[
+        Send("🎒 Профиль", contains="Попытки", emoji="🎒"),
+        *ATTEMPT_STEPS,
+    ]),
+])
+
+CARD_SCENARIO = Scenario("cards", [
+    # Ответ на /start забирается здесь: иначе опоздавшее приветствие
+    # получило бы ожидание профиля и сдвинуло все следующие ответы
+    Send("/start", title="Активируем бота", emoji="🚀", optional=True),
+    # Без профиля сценарий останавливается
+    Send("🎒 Профиль", contains="Попытки", emoji="🎒"),
+    *ATTEMPT_STEPS,
+])
 
 # === ЕЖЕДНЕВНЫЙ ЦИКЛ ===
 
-async def daily_cycle_for_account(client, bot_username):
+async def daily_cycle_for_account(client, bot_username, entity=None, turn=None):
     """
-    Ежедневный цикл для одного аккаунта
+    Ежедневный цикл для одного аккаунта (сценарий DAILY_SCENARIO)
+    entity - уже полученная сущность бота (из пула клиентов), чтобы не запрашивать её снова
+    turn - слот аккаунта (work_slots), отдаётся между порциями круток
     """
     try:
-        entity = await client.get_entity(bot_username)
+        if entity is None:
+            entity = await client.get_entity(bot_username)
         print(f"🎯 [{client.session.filename}] Начинаем ежедневный цикл...")
         
-        # Добавляем небольшую задержку между аккаунтами
-        await asyncio.sleep(random.uniform(0.1, 0.3))
-
-        # 1. Отправляем "📜 Меню"
-        print(f"📜 [{client.session.filename}] Отправляем 'Меню'...")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между текстовыми сообщениями
-        msg = await send_message_and_wait(client, entity, "📜 Меню")
-        print(f"✅ [{client.session.filename}] Меню получено")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-
-        # 2. AniPass
-        print(f"🎫 [{client.session.filename}] Нажимаем 'AniPass'...")
-        try:
-            # Ищем кнопку AniPass
-            if msg and msg.buttons:
-                button_texts = [b.text for row in msg.buttons for b in row]
-                print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
-                
-                # Ищем кнопку AniPass
-                anipass_button = None
-                for button_text in button_texts:
-                    if "AniPass" in button_text or "🎫" in button_text:
-                        anipass_button = button_text
-                        break
-                
-                if anipass_button:
-                    print(f"🎫 [{client.session.filename}] Найдена кнопка: {anipass_button}")
-                    msg = await click_button_and_wait(client, entity, msg, button_text=anipass_button)
-                    if msg:
-                        print(f"✅ [{client.session.filename}] AniPass открыт")
-                        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                        
-                        # Проверяем доступность AniPass
-                        if msg.buttons:
-                            button_texts = [b.text for row in msg.buttons for b in row]
-                            print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
-                            
-                            # Ищем кнопку с галочкой (✔️ - доступен, ✅ - уже забран)
-                            checkmark_button = None
-                            available_buttons = []
-                            taken_buttons = []
-                            
-                            for button_text in button_texts:
-                                if "✔️" in button_text:  # Heavy check mark - доступен для получения
-                                    available_buttons.append(button_text)
-                                elif "✅" in button_text:  # Check mark - уже забран
-                                    taken_buttons.append(button_text)
-                            
-                            print(f"📊 [{client.session.filename}] Доступные кнопки: {available_buttons}")
-                            print(f"📊 [{client.session.filename}] Забранные кнопки: {taken_buttons}")
-                            
-                            if available_buttons:
-                                # Берем первую доступную кнопку
-                                checkmark_button = available_buttons[0]
-                                print(f"🎯 [{client.session.filename}] Выбрана кнопка для получения: {checkmark_button}")
-                            elif taken_buttons:
-                                print(f"ℹ️ [{client.session.filename}] Все доступные награды уже забраны")
-                            else:
-                                print(f"⚠️ [{client.session.filename}] Не найдено ни доступных, ни забранных кнопок AniPass")
-                            
-                            if checkmark_button:
-                                print(f"✅ [{client.session.filename}] AniPass доступен, нажимаем галочку")
-                                # Сохраняем ссылку на сообщение с меню AniPass
-                                anipass_menu_msg = msg
-                                reward_msg = await click_button_and_wait(client, entity, msg, button_text=checkmark_button)
-                                if reward_msg:
-                                    print(f"✅ [{client.session.filename}] AniPass получен")
-                                    await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после получения
-                                    # Используем сохраненное сообщение с меню для возврата
-                                    msg = anipass_menu_msg
-                                else:
-                                    print(f"⚠️ [{client.session.filename}] Не удалось получить AniPass")
-                            else:
-                                print(f"ℹ️ [{client.session.filename}] AniPass уже забран за день, пропускаем...")
-                        
-                        # Нажимаем "Назад" - теперь используем правильное сообщение с кнопками
-                        print(f"🔙 [{client.session.filename}] Нажимаем 'Назад'...")
-                        msg = await click_button_and_wait(client, entity, msg, button_text="Назад 🔙")
-                        if msg:
-                            print(f"✅ [{client.session.filename}] Вернулись в главное меню")
-                            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после возврата
-                else:
-                    print(f"⚠️ [{client.session.filename}] Кнопка AniPass не найдена")
-            else:
-                print(f"⚠️ [{client.session.filename}] Нет кнопок в сообщении")
-        except Exception as e:
-            print(f"⚠️ [{client.session.filename}] Ошибка в AniPass: {e}")
-
-        # 3. Дары богов
-        print(f"⛩ [{client.session.filename}] Переходим в 'Дары богов'...")
-        try:
-            # Ищем кнопку "Дары богов"
-            if msg and msg.buttons:
-                button_texts = [b.text for row in msg.buttons for b in row]
-                print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
-                
-                # Ищем кнопку "Дары богов"
-                gifts_button = None
-                for button_text in button_texts:
-                    if "Дары богов" in button_text or "⛩" in button_text:
-                        gifts_button = button_text
-                        break
-                
-                if gifts_button:
-                    print(f"⛩ [{client.session.filename}] Найдена кнопка: {gifts_button}")
-                    msg = await click_button_and_wait(client, entity, msg, button_text=gifts_button)
-                    if msg:
-                        print(f"✅ [{client.session.filename}] Дары богов открыты")
-                        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                        
-                        # Получаем награды
-                        print(f"🎁 [{client.session.filename}] Получаем награды...")
-                        
-                        # Мистический жетон (ежедневно)
-                        print(f"🀄️ [{client.session.filename}] Получаем мистический жетон...")
-                        try:
-                            reward_msg = await click_button_and_wait(client, entity, msg, button_text="🀄️ Мистический жетон")
-                            if reward_msg:
-                                print(f"🀄️ [{client.session.filename}] Награда получена, ждем новое сообщение с артефактами...")
-                                # Ждем новое сообщение с артефактами после получения жетона
-                                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT*2, contains="Прикоснись к  древним артефактам")
-                                if msg:
-                                    print(f"✅ [{client.session.filename}] Получено обновленное сообщение с артефактами")
-                                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после получения
-                        except Exception as e:
-                            print(f"⚠️ [{client.session.filename}] Таймаут при получении жетона")
-                        
-                        # Древний куб удачи (еженедельно)
-                        print(f"🎲 [{client.session.filename}] Получаем древний куб удачи...")
-                        try:
-                            reward_msg = await click_button_and_wait(client, entity, msg, button_text="🎲 Древний куб удачи")
-                            if reward_msg:
-                                print(f"🎲 [{client.session.filename}] Награда получена, ждем новое сообщение с артефактами...")
-                                # Ждем новое сообщение с артефактами после получения куба
-                                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT*2, contains="Прикоснись к  древним артефактам")
-                                if msg:
-                                    print(f"✅ [{client.session.filename}] Получено обновленное сообщение с артефактами")
-                                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после получения
-                        except Exception as e:
-                            print(f"⚠️ [{client.session.filename}] Таймаут при получении куба удачи")
-                        
-                        # Рог призыва (еженедельно)
-                        print(f"📯 [{client.session.filename}] Получаем рог призыва...")
-                        try:
-                            reward_msg = await click_button_and_wait(client, entity, msg, button_text="📯 Рог призыва")
-                            if reward_msg:
-                                print(f"📯 [{client.session.filename}] Награда получена, ждем новое сообщение с артефактами...")
-                                # Ждем новое сообщение с артефактами после получения рога
-                                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT*2, contains="Прикоснись к  древним артефактам")
-                                if msg:
-                                    print(f"✅ [{client.session.filename}] Получено обновленное сообщение с артефактами")
-                                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после получения
-                        except Exception as e:
-                            print(f"⚠️ [{client.session.filename}] Таймаут при получении рога призыва")
-                        
-                        # Убеждаемся, что у нас есть актуальное сообщение с кнопкой "Назад"
-                        if not msg or "Прикоснись к  древним артефактам" not in msg.raw_text:
-                            print(f"🪤 [{client.session.filename}] Получаем актуальное сообщение с артефактами...")
-                            try:
-                                async for message in client.iter_messages(entity, limit=1):
-                                    msg = message
-                                    break
-                            except Exception as e:
-                                print(f"⚠️ [{client.session.filename}] Ошибка при получении последнего сообщения: {e}")
-                        
-                        # Нажимаем "Назад" - теперь в правильном сообщении
-                        print(f"🔙 [{client.session.filename}] Нажимаем 'Назад'...")
-                        msg = await click_button_and_wait(client, entity, msg, button_text="Назад 🔙")
-                        if msg:
-                            print(f"✅ [{client.session.filename}] Вернулись в главное меню")
-                            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после возврата
-                else:
-                    print(f"⚠️ [{client.session.filename}] Кнопка 'Дары богов' не найдена")
-            else:
-                print(f"⚠️ [{client.session.filename}] Нет кнопок в сообщении")
-        except Exception as e:
-            print(f"⚠️ [{client.session.filename}] Ошибка в 'Дары богов': {e}")
-
-        # 4. Крафт меню
-        print(f"🧬 [{client.session.filename}] Переходим в 'Крафт меню'...")
-        try:
-            # Ищем кнопку "Крафт меню"
-            if msg and msg.buttons:
-                button_texts = [b.text for row in msg.buttons for b in row]
-                print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
-                
-                # Ищем кнопку "Крафт меню"
-                craft_button = None
-                for button_text in button_texts:
-                    if "Крафт" in button_text or "🧬" in button_text:
-                        craft_button = button_text
-                        break
-                
-                if craft_button:
-                    print(f"🧬 [{client.session.filename}] Найдена кнопка: {craft_button}")
-                    craft_msg = await click_button_and_wait(client, entity, msg, button_text=craft_button)
-                    if craft_msg:
-                        print(f"✅ [{client.session.filename}] Крафт меню открыто, ждем новое сообщение...")
-                        # Ждем новое сообщение с вариантами получения карт
-                        try:
-                            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT*2, contains="В Аникарде есть много способов получить новые карты")
-                            if msg:
-                                print(f"✅ [{client.session.filename}] Получено сообщение с вариантами получения карт")
-                            else:
-                                print(f"⚠️ [{client.session.filename}] Не получено ожидаемое сообщение, используем последнее")
-                                msg = craft_msg
-                        except Exception as e:
-                            print(f"⚠️ [{client.session.filename}] Ошибка при ожидании нового сообщения: {e}")
-                            msg = craft_msg
-                        
-                        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                        
-                        # Омут душ
-                        print(f"🌊 [{client.session.filename}] Нажимаем 'Омут душ'...")
-                        try:
-                            msg = await click_button_and_wait(client, entity, msg, button_text="🪞 Омут душ")
-                            if msg:
-                                print(f"✅ [{client.session.filename}] Омут душ открыт")
-                                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                                
-                                # Пожертвовать все эссенции
-                                print(f"💎 [{client.session.filename}] Пожертвуем все эссенции...")
-                                try:
-                                    msg = await click_button_and_wait(client, entity, msg, button_text="🔘 Пожертвовать все эссенции/проекции душ 🔘")
-                                    if msg:
-                                        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после пожертвования
-                                except Exception as e:
-                                    print(f"⚠️ [{client.session.filename}] Таймаут при пожертвовании, пробуем продолжить...")
-                        except Exception as e:
-                            print(f"⚠️ [{client.session.filename}] Таймаут при переходе в 'Омут душ', пробуем продолжить...")
-                else:
-                    print(f"⚠️ [{client.session.filename}] Кнопка 'Крафт меню' не найдена")
-            else:
-                print(f"⚠️ [{client.session.filename}] Нет кнопок в сообщении")
-        except Exception as e:
-            print(f"⚠️ [{client.session.filename}] Ошибка в 'Крафт меню': {e}")
-
-        # 5. Клан
-        print(f"🛡 [{client.session.filename}] Проверяем клан...")
-        try:
-            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между текстовыми сообщениями
-            msg = await send_message_and_wait(client, entity, "🛡 Мой клан")
-            
-            if msg and "У вас нет клана" in msg.raw_text:
-                print(f"ℹ️ [{client.session.filename}] У аккаунта нет клана, пропускаем сокровищницу")
-            else:
-                print(f"🏰 [{client.session.filename}] У аккаунта есть клан, проверяем сокровищницу...")
-                if msg and msg.buttons:
-                    button_texts = [b.text for row in msg.buttons for b in row]
-                    print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
-                    
-                    # Ищем кнопку сокровищницы
-                    treasury_button = None
-                    for button_text in button_texts:
-                        if "Сокровищница" in button_text or "💰" in button_text:
-                            treasury_button = button_text
-                            break
-                    
-                    if treasury_button:
-                        print(f"💰 [{client.session.filename}] Найдена кнопка: {treasury_button}")
-                        msg = await click_button_and_wait(client, entity, msg, button_text=treasury_button)
-                        if msg:
-                            print(f"✅ [{client.session.filename}] Сокровищница открыта")
-                            
-                            # Проверяем доступные выплаты и нажимаем кнопку
-                            if "Нет доступных выплат" in msg.raw_text:
-                                print(f"ℹ️ [{client.session.filename}] Нет доступных выплат")
-                            else:
-                                print(f"💰 [{client.session.filename}] Есть доступные выплаты")
-                                
-                                # Ищем кнопку "Получить выплату"
-                                if msg.buttons:
-                                    button_texts = [b.text for row in msg.buttons for b in row]
-                                    print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
-                                    
-                                    payout_button = None
-                                    for button_text in button_texts:
-                                        if "Получить выплату" in button_text or "выплату" in button_text.lower():
-                                            payout_button = button_text
-                                            break
-                                    
-                                    if payout_button:
-                                        print(f"💰 [{client.session.filename}] Нажимаем '{payout_button}'...")
-                                        msg = await click_button_and_wait(client, entity, msg, button_text=payout_button)
-                                        if msg:
-                                            print(f"✅ [{client.session.filename}] Выплата получена")
-                                        else:
-                                            print(f"⚠️ [{client.session.filename}] Не удалось получить выплату")
-                                    else:
-                                        print(f"⚠️ [{client.session.filename}] Кнопка 'Получить выплату' не найдена")
-                    else:
-                        print(f"⚠️ [{client.session.filename}] Кнопка 'Сокровищница' не найдена")
-                else:
-                    print(f"⚠️ [{client.session.filename}] Нет кнопок в сообщении")
-        except Exception as e:
-            print(f"⚠️ [{client.session.filename}] Ошибка при проверке клана: {e}")
-
-        # 6. Магазин
-        print(f"🛍 [{client.session.filename}] Переходим в магазин...")
-        try:
-            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между текстовыми сообщениями
-            msg = await send_message_and_wait(client, entity, "🛍 Магазин")
-            print(f"✅ [{client.session.filename}] В магазине")
-            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-            
-            # Крутки за BattleCoin
-            print(f"🎰 [{client.session.filename}] Нажимаем 'крутки за BattleCoin'...")
-            try:
-                # Ищем кнопку "Крутки за BattleCoin"
-                if msg and msg.buttons:
-                    button_texts = [b.text for row in msg.buttons for b in row]
-                    print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
-                    
-                    # Ищем кнопку "Крутки за BattleCoin"
-                    battlecoin_button = None
-                    for button_text in button_texts:
-                        if "BattleCoin" in button_text or "🎖️" in button_text:
-                            battlecoin_button = button_text
-                            break
-                    
-                    if battlecoin_button:
-                        print(f"🎰 [{client.session.filename}] Найдена кнопка: {battlecoin_button}")
-                        msg = await click_button_and_wait(client, entity, msg, button_text=battlecoin_button)
-                        if msg:
-                            print(f"✅ [{client.session.filename}] Крутки открыты")
-                            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                            
-                            # Покупаем 10 ⚔️
-                            print(f"⚔️ [{client.session.filename}] Нажимаем '10 ⚔️'...")
-                            try:
-                                msg = await click_button_and_wait(client, entity, msg, button_text="10 ⚔️")
-                                if msg:
-                                    await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после покупки
-                            except Exception as e:
-                                print(f"⚠️ [{client.session.filename}] Таймаут при покупке круток, пробуем продолжить...")
-                    else:
-                        print(f"⚠️ [{client.session.filename}] Кнопка 'Крутки за BattleCoin' не найдена")
-                else:
-                    print(f"⚠️ [{client.session.filename}] Нет кнопок в сообщении")
-            except Exception as e:
-                print(f"⚠️ [{client.session.filename}] Таймаут при переходе в крутки, пробуем продолжить...")
-        except Exception as e:
-            print(f"⚠️ [{client.session.filename}] Ошибка в магазине: {e}")
-
-        # 7. Профиль и попытки
-        print(f"🎒 [{client.session.filename}] Получаем профиль...")
-        try:
-            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между текстовыми сообщениями
-            msg = await send_message_and_wait(client, entity, "🎒 Профиль")
-            print(f"✅ [{client.session.filename}] Профиль получен")
-            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-
-            # Парсим попытки
-            profile_text = msg.raw_text
-            attempts_match = re.search(r'Попытки:\s*·\s*⚔️\s*-\s*(\d+)\s*\|\s*🎭\s*-\s*(\d+)', profile_text)
-            
-            # Инициализируем список редких карт
-            rare_cards = []
-            
-            if attempts_match:
-                battle_attempts = int(attempts_match.group(1))
-                collection_attempts = int(attempts_match.group(2))
-                print(f"📊 [{client.session.filename}] Попытки: ⚔️ {battle_attempts} | 🎭 {collection_attempts}")
-                
-                # Тратим попытки
-                if battle_attempts > 0 or collection_attempts > 0:
-                    print(f"🎯 [{client.session.filename}] Проверяем попытки...")
-                    
-                    if battle_attempts > 0:
-                        battle_rare = await use_attempts(client, entity, battle_attempts, "battle")
-                        rare_cards.extend(battle_rare)
-                    
-                    if collection_attempts > 0:
-                        collection_rare = await use_attempts(client, entity, collection_attempts, "collection")
-                        rare_cards.extend(collection_rare)
-                else:
-                    print(f"ℹ️ [{client.session.filename}] Нет попыток для траты")
-            else:
-                print(f"ℹ️ [{client.session.filename}] Попытки не найдены в профиле")
-            
-            # Тратим по 1 крутке каждого вида (дополнительно)
-            print(f"🎯 [{client.session.filename}] Тратим по 1 крутке каждого вида...")
-            
-            # Тратим боевую крутку
-            battle_rare = await use_attempts(client, entity, 1, "battle")
-            rare_cards.extend(battle_rare)
-            
-            # Задержка между крутками
-            await asyncio.sleep(MESSAGE_TIMEOUT)
-            
-            # Тратим коллекционную крутку
-            collection_rare = await use_attempts(client, entity, 1, "collection")
-            rare_cards.extend(collection_rare)
-            
-            # Фильтруем все редкие карты
-            for card_info in rare_cards:
-                await filter_rare_card(client, entity, card_info)
-        except Exception as e:
-            print(f"⚠️ [{client.session.filename}] Ошибка при работе с профилем: {e}")
-
-        print(f"🎉 [{client.session.filename}] Ежедневный цикл завершен!")
+        # Журнал наград: заходим только туда, где в этом периоде ещё есть что получить
+        # Чекпоинт: после перезапуска пройденные сегодня разделы пропускаются
+        ledger = get_claim_ledger()
+        checkpoints = get_checkpoints()
+        checkpoint = checkpoints.for_account(client.session.filename, "daily")
+        ctx = ScenarioContext(client, entity, ledger=ledger, checkpoint=checkpoint, turn=turn)
+        claimed = sorted(set(REWARDS) - ctx.pending - {"no_clan"})
+        if claimed:
+            print(f"📒 [{client.session.filename}] Уже получено в этом периоде: {', '.join(claimed)}")
+        
+        # Аккаунт считается закончившим цикл, только если пройдены все разделы:
+        # иначе после перезапуска непройденные разделы повторятся
+        finished = await run_scenario(ctx, DAILY_SCENARIO)
+        if finished:
+            checkpoints.mark_finished(client.session.filename, "daily")
+        
+        # Сохраняем журнал наград в фоновом потоке
+        await ledger.write()
+        
+        if finished:
+            print(f"🎉 [{client.session.filename}] Ежедневный цикл завершен!")
+        else:
+            print(f"⚠️ [{client.session.filename}] Ежедневный цикл завершен не полностью, непройденные разделы будут повторены")
         
     except Exception as e:
         print(f"❌ [{client.session.filename}] Ошибка в ежедневном цикле: {e}")
 
-async def use_attempts(client, entity, attempts, card_type):
+async def use_attempts(client, entity, attempts, card_type, stopped=None):
     """
     Использует попытки для получения карт
-    Возвращает список редких карт
+    Возвращает список редких карт. На сообщение о кулдауне крутки этого типа
+    прекращаются (тип добавляется в stopped)
     """
     command = "⚔️ Получить карту" if card_type == "battle" else "🏵️ Получить карту"
     emoji = "⚔️" if card_type == "battle" else "🎭"
@@ -700,240 +380,371 @@ async def use_attempts(client, entity, attempts, card_type):
     print(f"{emoji} [{client.session.filename}] Используем {attempts} попыток для {card_type} карт...")
     
     for i in range(attempts):
-        try:
-            print(f"{emoji} [{client.session.filename}] Попытка {i+1}/{attempts}...")
-            await client.send_message(entity, command)
-            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после отправки команды
-            
+        with get_round_trip_counter().scenario(client.session.filename, "attempt"):
             try:
-                reply = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-                if reply and reply.raw_text:
-                    card_info = parse_card_response(reply.raw_text, card_type)
-                    if card_info:
-                        rarity = is_rare_card(card_info["rating"])
-                        if rarity:
-                            card_info["rarity"] = rarity
-                            save_card_to_file(client.session.filename, card_info)
-                            send_card_notification(client.session.filename, card_info)
-                            rare_cards.append(card_info)
-                            print(f"🎉 [{client.session.filename}] Редкая карта: {card_info['name']} (Рейтинг: {card_info['rating']})")
+                print(f"{emoji} [{client.session.filename}] Попытка {i+1}/{attempts}...")
+                try:
+                    # Кулдаун вместо карты - тоже ответ, без ожидания до таймаута
+                    reply = await send_and_wait(client, entity, command, cooldown=True)
+                    if reply and classify_message(reply) == MessageCategory.COOLDOWN:
+                        print(f"⏰ [{client.session.filename}] Кулдаун: попытки {card_type} закончились")
+                        if stopped is not None:
+                            stopped.add(card_type)
+                        break
+                    if reply and reply.raw_text:
+                        card_info = parse_card_response(reply.raw_text, card_type)
+                        if card_info:
+                            rarity = is_rare_card(card_info["rating"])
+                            if rarity:
+                                card_info["rarity"] = rarity
+                                send_card_notification(client.session.filename, card_info)
+                                rare_cards.append(card_info)
+                                print(f"🎉 [{client.session.filename}] Редкая карта: {card_info['name']} (Рейтинг: {card_info['rating']})")
+                            else:
+                                print(f"📝 [{client.session.filename}] Обычная карта: {card_info['name']} (Рейтинг: {card_info['rating']})")
                         else:
-                            print(f"📝 [{client.session.filename}] Обычная карта: {card_info['name']} (Рейтинг: {card_info['rating']})")
-                    else:
-                        print(f"📝 [{client.session.filename}] Не удалось распарсить карту (попытка {i+1})")
-                            
-            except asyncio.TimeoutError:
-                print(f"⚠️ [{client.session.filename}] Таймаут при попытке {i+1}")
-            
-            if i < attempts - 1:
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между попытками получения карт
-        except Exception as e:
-            print(f"❌ [{client.session.filename}] Ошибка при попытке {i+1}: {e}")
+                            print(f"📝 [{client.session.filename}] Не удалось распарсить карту (попытка {i+1})")
+                                
+                except asyncio.TimeoutError:
+                    print(f"⚠️ [{client.session.filename}] Таймаут при попытке {i+1}")
+            except Exception as e:
+                print(f"❌ [{client.session.filename}] Ошибка при попытке {i+1}: {e}")
+        
+    # Сохраняем все редкие карты серии одной транзакцией в фоновом потоке
+    if rare_cards:
+        await write_async(save_cards, client.session.filename, rare_cards)
     
     return rare_cards
 
-async def filter_rare_card(client, entity, card_info):
+async def show_filtered_cards(client, entity, msg, card_info):
     """
-    Выполняет фильтрацию для редких карт
+    Нажимает "Карты ⏩" на экране фильтров и ищет карту с нужным рейтингом.
+    Возвращает True, если карта нашлась
     """
-    try:
-        print(f"🔍 [{client.session.filename}] Фильтруем редкую карту: {card_info['name']} (Рейтинг: {card_info['rating']})")
+    if msg and msg.buttons:
+        button_texts = [b.text for row in msg.buttons for b in row]
+        print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
         
-        # Отправляем "Мои карты"
-        print(f"🧳 [{client.session.filename}] Отправляем 'Мои карты'...")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        msg = await send_message_and_wait(client, entity, "🧳 Мои карты")
+        # Ищем кнопку "Карты ⏩"
+        cards_button = None
+        for button_text in button_texts:
+            if "Карты" in button_text and "⏩" in button_text:
+                cards_button = button_text
+                break
         
-        if msg and "Введите название карты" in msg.raw_text:
-            print(f"📝 [{client.session.filename}] Отправляем название карты: {card_info['name']}")
-            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-            msg = await send_message_and_wait(client, entity, card_info['name'])
-            
-            if msg and "Выберите нужные фильтры" in msg.raw_text:
-                print(f"⚙️ [{client.session.filename}] Устанавливаем фильтры...")
-                
-                # Устанавливаем тип карт
-                if card_info['type'] == 'battle':
-                    print(f"⚔️ [{client.session.filename}] Устанавливаем тип: Боевые ⚔️")
-                    await client.send_message(entity, "Боевые ⚔️")
-                else:
-                    print(f"🎭 [{client.session.filename}] Устанавливаем тип: Коллекционные 🎭")
-                    await client.send_message(entity, "Коллекционные 🎭")
-                
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-                
-                # Устанавливаем название карты
-                print(f"📝 [{client.session.filename}] Устанавливаем название карты: {card_info['name']}")
-                await client.send_message(entity, card_info['name'])
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-                
-                # Устанавливаем Вселенные: ✖️
-                print(f"🌍 [{client.session.filename}] Устанавливаем Вселенные: ✖️")
-                await client.send_message(entity, "✖️")
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-                
-                # Устанавливаем Редкости: ✖️
-                print(f"⭐ [{client.session.filename}] Устанавливаем Редкости: ✖️")
-                await client.send_message(entity, "✖️")
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-                
-                # Устанавливаем Стихии: ✖️
-                print(f"🔥 [{client.session.filename}] Устанавливаем Стихии: ✖️")
-                await client.send_message(entity, "✖️")
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-                
-                # Устанавливаем сортировку: Высокий рейтинг вперёд
-                print(f"📊 [{client.session.filename}] Устанавливаем сортировку: Высокий рейтинг вперёд")
-                await client.send_message(entity, "Высокий рейтинг вперёд")
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+        if cards_button:
+            print(f"⏩ [{client.session.filename}] Нажимаем '{cards_button}'...")
+            msg = await click_button_and_wait(client, entity, msg, button_text=cards_button)
+            if msg:
+                print(f"✅ [{client.session.filename}] Перешли к картам")
                 
-                # Устанавливаем сортировку: Новые вперёд
-                print(f"📊 [{client.session.filename}] Устанавливаем сортировку: Новые вперёд")
-                await client.send_message(entity, "Новые вперёд")
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-                msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-                
-                # Нажимаем "Карты ⏩"
-                if msg and msg.buttons:
+                # Проверяем рейтинг карт по кнопкам
+                if msg.buttons:
                     button_texts = [b.text for row in msg.buttons for b in row]
-                    print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
+                    print(f"📋 [{client.session.filename}] Кнопки карт: {button_texts}")
                     
-                    # Ищем кнопку "Карты ⏩"
-                    cards_button = None
+                    # Ищем карту с нужным рейтингом
                     for button_text in button_texts:
-                        if "Карты" in button_text and "⏩" in button_text:
-                            cards_button = button_text
-                            break
+                        if "|" in button_text:
+                            # Парсим рейтинг из кнопки (например: "81 | Ваннилла Айс")
+                            rating_match = re.search(r'(\d+)\s*\|', button_text)
+                            if rating_match:
+                                rating = int(rating_match.group(1))
+                                if rating == card_info['rating']:
+                                    print(f"🎯 [{client.session.filename}] Найдена карта с рейтингом {rating}: {button_text}")
+                                    return True
+        else:
+            print(f"⚠️ [{client.session.filename}] Кнопка 'Карты ⏩' не найдена")
+    else:
+        print(f"⚠️ [{client.session.filename}] Нет кнопок для перехода к картам")
+    return False
+
+async def filter_rare_card(client, entity, card_info):
+    """
+    Выполняет фильтрацию для редких карт
+    """
+    with get_round_trip_counter().scenario(client.session.filename, "filter"):
+        try:
+            print(f"🔍 [{client.session.filename}] Фильтруем редкую карту: {card_info['name']} (Рейтинг: {card_info['rating']})")
+            
+            # Отправляем "Мои карты"
+            print(f"🧳 [{client.session.filename}] Отправляем 'Мои карты'...")
+            msg = await send_message_and_wait(client, entity, "🧳 Мои карты")
+            
+            if msg and "Введите название карты" in msg.raw_text:
+                print(f"📝 [{client.session.filename}] Отправляем название карты: {card_info['name']}")
+                msg = await send_message_and_wait(client, entity, card_info['name'], step="card_name")
+                
+                if msg and "Выберите нужные фильтры" in msg.raw_text:
+                    print(f"⚙️ [{client.session.filename}] Устанавливаем фильтры...")
                     
-                    if cards_button:
-                        print(f"⏩ [{client.session.filename}] Нажимаем '{cards_button}'...")
-                        msg = await click_button_and_wait(client, entity, msg, button_text=cards_button)
-                        if msg:
-                            print(f"✅ [{client.session.filename}] Перешли к картам")
-                            
-                            # Проверяем рейтинг карт по кнопкам
-                            if msg.buttons:
-                                button_texts = [b.text for row in msg.buttons for b in row]
-                                print(f"📋 [{client.session.filename}] Кнопки карт: {button_texts}")
-                                
-                                # Ищем карту с нужным рейтингом
-                                for button_text in button_texts:
-                                    if "|" in button_text:
-                                        # Парсим рейтинг из кнопки (например: "81 | Ваннилла Айс")
-                                        rating_match = re.search(r'(\d+)\s*\|', button_text)
-                                        if rating_match:
-                                            rating = int(rating_match.group(1))
-                                            if rating == card_info['rating']:
-                                                print(f"🎯 [{client.session.filename}] Найдена карта с рейтингом {rating}: {button_text}")
-                                                break
+                    # Устанавливаем тип карт
+                    if card_info['type'] == 'battle':
+                        print(f"⚔️ [{client.session.filename}] Устанавливаем тип: Боевые ⚔️")
+                        msg = await send_and_wait(client, entity, "Боевые ⚔️")
                     else:
-                        print(f"⚠️ [{client.session.filename}] Кнопка 'Карты ⏩' не найдена")
+                        print(f"🎭 [{client.session.filename}] Устанавливаем тип: Коллекционные 🎭")
+                        msg = await send_and_wait(client, entity, "Коллекционные 🎭")
+                    
+                    # Устанавливаем название карты
+                    print(f"📝 [{client.session.filename}] Устанавливаем название карты: {card_info['name']}")
+                    msg = await send_and_wait(client, entity, card_info['name'], step="card_name")
+                    
+                    # Устанавливаем Вселенные: ✖️
+                    print(f"🌍 [{client.session.filename}] Устанавливаем Вселенные: ✖️")
+                    msg = await send_and_wait(client, entity, "✖️")
+                    
+                    # Устанавливаем Редкости: ✖️
+                    print(f"⭐ [{client.session.filename}] Устанавливаем Редкости: ✖️")
+                    msg = await send_and_wait(client, entity, "✖️")
+                    
+                    # Устанавливаем Стихии: ✖️
+                    print(f"🔥 [{client.session.filename}] Устанавливаем Стихии: ✖️")
+                    msg = await send_and_wait(client, entity, "✖️")
+                    
+                    # Устанавливаем сортировку: Высокий рейтинг вперёд
+                    print(f"📊 [{client.session.filename}] Устанавливаем сортировку: Высокий рейтинг вперёд")
+                    msg = await send_and_wait(client, entity, "Высокий рейтинг вперёд")
+                    
+                    # Устанавливаем сортировку: Новые вперёд
+                    print(f"📊 [{client.session.filename}] Устанавливаем сортировку: Новые вперёд")
+                    msg = await send_and_wait(client, entity, "Новые вперёд")
+                    
+                    # Нажимаем "Карты ⏩" и ищем карту по рейтингу
+                    await show_filtered_cards(client, entity, msg, card_info)
                 else:
-                    print(f"⚠️ [{client.session.filename}] Нет кнопок для перехода к картам")
+                    print(f"⚠️ [{client.session.filename}] Не получено сообщение о фильтрах")
             else:
-                print(f"⚠️ [{client.session.filename}] Не получено сообщение о фильтрах")
-        else:
-            print(f"⚠️ [{client.session.filename}] Не получено сообщение о вводе названия карты")
-            
-    except Exception as e:
-        print(f"❌ [{client.session.filename}] Ошибка при фильтрации карты: {e}")
+                print(f"⚠️ [{client.session.filename}] Не получено сообщение о вводе названия карты")
+                
+        except Exception as e:
+            print(f"❌ [{client.session.filename}] Ошибка при фильтрации карты: {e}")
+
+async def filter_batched_card(client, entity, card_info, batch):
+    """
+    Поиск карты в пакете: "Мои карты", название, тип - только при смене,
+    общие фильтры - один раз за пакет (batch - что уже установлено).
+    Возвращает True, если карта нашлась
+    """
+    msg = await send_message_and_wait(client, entity, "🧳 Мои карты")
+    if not msg or "Введите название карты" not in msg.raw_text:
+        print(f"⚠️ [{client.session.filename}] Не получено сообщение о вводе названия карты")
+        return False
+    
+    print(f"📝 [{client.session.filename}] Отправляем название карты: {card_info['name']}")
+    msg = await send_message_and_wait(client, entity, card_info['name'], step="card_name")
+    if not msg or "Выберите нужные фильтры" not in msg.raw_text:
+        print(f"⚠️ [{client.session.filename}] Не получено сообщение о фильтрах")
+        return False
+    
+    # Тип карт - только если отличается от уже установленного
+    card_type = FILTER_TYPE_BUTTONS[card_info['type']]
+    if card_type != batch.get("type"):
+        print(f"⚙️ [{client.session.filename}] Устанавливаем тип: {card_type}")
+        msg = await send_and_wait(client, entity, card_type)
+        batch["type"] = card_type
+    
+    # Вселенные, редкости, стихии и сортировки - один раз за пакет
+    if not batch.get("common"):
+        for label, value in COMMON_CARD_FILTERS:
+            print(f"⚙️ [{client.session.filename}] Устанавливаем {label}: {value}")
+            msg = await send_and_wait(client, entity, value)
+        batch["common"] = True
+    
+    return await show_filtered_cards(client, entity, msg, card_info)
+
+async def filter_rare_cards(client, entity, rare_cards):
+    """
+    Фильтрует все редкие карты прогона; одинаковые карты (тип, название,
+    рейтинг) ищутся один раз.
+    По умолчанию каждая карта проходит полную настройку фильтров.
+    BATCH_RARE_FILTER=1: общие фильтры ставятся один раз за пакет, тип - при
+    смене. Если карта в пакете не нашлась, фильтры могли сброситься: для неё
+    выполняется полная настройка, а пакет начинается заново
+    """
+    cards = []
+    seen = set()
+    # В пакете карты одного типа идут подряд, чтобы реже менять тип
+    for card_info in sorted(rare_cards, key=lambda c: c["type"]) if BATCH_RARE_FILTER else rare_cards:
+        key = (card_info["type"], card_info["name"], card_info["rating"])
+        if key not in seen:
+            seen.add(key)
+            cards.append(card_info)
+    
+    if not BATCH_RARE_FILTER:
+        for card_info in cards:
+            await filter_rare_card(client, entity, card_info)
+        return
+    
+    if cards:
+        print(f"🔍 [{client.session.filename}] Пакетная фильтрация редких карт: {len(cards)}")
+    batch = {}
+    for card_info in cards:
+        with get_round_trip_counter().scenario(client.session.filename, "filter"):
+            try:
+                print(f"🔍 [{client.session.filename}] Фильтруем редкую карту: {card_info['name']} (Рейтинг: {card_info['rating']})")
+                found = await filter_batched_card(client, entity, card_info, batch)
+            except Exception as e:
+                print(f"❌ [{client.session.filename}] Ошибка при фильтрации карты: {e}")
+                found = False
+        if not found:
+            print(f"🔄 [{client.session.filename}] Карта не найдена в пакете - полная настройка фильтров")
+            # Неизвестно, какие фильтры действуют - следующая карта ставит их заново
+            batch.clear()
+            await filter_rare_card(client, entity, card_info)
 
 # === ЦИКЛ КАРТ ===
 
-async def card_cycle_for_account(client, bot_username):
+async def card_cycle_for_account(client, bot_username, entity=None, turn=None):
     """
-    Цикл получения карт для одного аккаунта
+    Цикл получения карт для одного аккаунта (сценарий CARD_SCENARIO)
+    entity - уже полученная сущность бота (из пула клиентов), чтобы не запрашивать её снова
+    turn - слот аккаунта (work_slots), отдаётся между порциями круток
     """
     try:
-        entity = await client.get_entity(bot_username)
+        if entity is None:
+            entity = await client.get_entity(bot_username)
         print(f"🎯 [{client.session.filename}] Начинаем цикл карт...")
         
-        # Добавляем небольшую задержку между аккаунтами
-        await asyncio.sleep(random.uniform(0.1, 0.3))
-
-        # 1. Активируем бота
-        print(f"🚀 [{client.session.filename}] Активируем бота...")
-        await client.send_message(entity, "/start")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после отправки
-        
-        # 2. Проверяем профиль на наличие попыток
-        print(f"🎒 [{client.session.filename}] Проверяем профиль...")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между текстовыми сообщениями
-        msg = await send_message_and_wait(client, entity, "🎒 Профиль")
-        if msg:
-            print(f"✅ [{client.session.filename}] Профиль получен")
-        else:
-            print(f"⚠️ [{client.session.filename}] Не удалось получить профиль, пробуем продолжить...")
-            return
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        
-        # Парсим попытки
-        profile_text = msg.raw_text
-        attempts_match = re.search(r'Попытки:\s*·\s*⚔️\s*-\s*(\d+)\s*\|\s*🎭\s*-\s*(\d+)', profile_text)
+        if await run_scenario(ScenarioContext(client, entity, turn=turn), CARD_SCENARIO):
+            print(f"🎉 [{client.session.filename}] Цикл карт завершен!")
         
-        if attempts_match:
-            battle_attempts = int(attempts_match.group(1))
-            collection_attempts = int(attempts_match.group(2))
-            print(f"📊 [{client.session.filename}] Попытки: ⚔️ {battle_attempts} | 🎭 {collection_attempts}")
-        else:
-            print(f"ℹ️ [{client.session.filename}] Попытки не найдены в профиле")
-            battle_attempts = 0
-            collection_attempts = 0
-        
-        # 2. Сначала тратим попытки из профиля (если есть)
-        rare_cards = []
-        if battle_attempts > 0 or collection_attempts > 0:
-            print(f"🎯 [{client.session.filename}] Тратим попытки из профиля...")
-            
-            if battle_attempts > 0:
-                battle_rare = await use_attempts(client, entity, battle_attempts, "battle")
-                rare_cards.extend(battle_rare)
-            
-            if collection_attempts > 0:
-                collection_rare = await use_attempts(client, entity, collection_attempts, "collection")
-                rare_cards.extend(collection_rare)
-        
-        # 3. Тратим по 1 крутке каждого вида (дополнительно)
-        print(f"🎯 [{client.session.filename}] Тратим по 1 крутке каждого вида...")
+    except Exception as e:
+        print(f"❌ [{client.session.filename}] Ошибка в цикле карт: {e}")
+        import traceback
+        traceback.print_exc()
+
+# === ОСНОВНЫЕ ФУНКЦИИ ===
+
+# Сколько аккаунтов прогревать одновременно перед ежедневным циклом
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "20"))
+
+def create_client_pool(keep_connected=True):
+    """
+    Создаёт пул клиентов с ключами API из .env (для непрерывного режима).
+    keep_connected=False - пул одного прогона: клиент отключается после цикла аккаунта
+    """
+    return ClientPool(API_ID, API_HASH, keep_connected=keep_connected)
+
+def run_pool(pool=None):
+    """
+    (пул, создан ли он для этого прогона). Без общего пула создаётся пул
+    одного прогона: клиенты, подключённые проверкой сессий, достаются циклу
+    без повторного подключения. Такой пул закрывается в конце прогона
+    """
+    if pool is not None:
+        return pool, False
+    return create_client_pool(keep_connected=False), True
+
+async def precheck_sessions(accounts, pool):
+    """
+    Проверяет все сессии параллельно без запроса кода и возвращает здоровые.
+    Проверенные клиенты пула остаются подключены для цикла
+    """
+    if not HEALTH_CHECK_ENABLED or not accounts:
+        return accounts
+    
+    # Уже подключённые клиенты пула (например, после прогрева) повторно не проверяются
+    ready = {acc["session"] for acc in accounts if pool.is_ready(acc["session"])}
+    to_check = [acc for acc in accounts if acc["session"] not in ready]
+    if not to_check:
+        return accounts
+    healthy, _ = await check_sessions(
+        to_check, lambda acc: pool.client_for(acc["session"]), keep_connected=True,
+        on_ok=lambda acc, user: pool.mark_checked(acc["session"], user),
+    )
+    healthy = {acc["session"] for acc in healthy} | ready
+    return [acc for acc in accounts if acc["session"] in healthy]
+
+async def warm_up_accounts(pool, concurrency=WARMUP_CONCURRENCY):
+    """
+    Прогрев перед ежедневным циклом: подключает и авторизует все аккаунты
+    и получает сущность бота заранее, чтобы в окне сброса оставалось только
+    отправить первое сообщение. Клиенты остаются в пуле
+    """
+    try:
+        config = await read_json_async("accounts/accounts.json")
+        bot_username = config.get("bot", "@anicardplaybot")
+        accounts = config.get("accounts", [])
         
-        # Тратим боевую крутку
-        battle_rare = await use_attempts(client, entity, 1, "battle")
-        rare_cards.extend(battle_rare)
+        print(f"🔥 Прогрев {len(accounts)} аккаунтов перед ежедневным циклом...")
+        started = time.monotonic()
+        accounts = await precheck_sessions(accounts, pool)
         
-        # Задержка между крутками
-        await asyncio.sleep(MESSAGE_TIMEOUT)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
         
-        # Тратим коллекционную крутку
-        collection_rare = await use_attempts(client, entity, 1, "collection")
-        rare_cards.extend(collection_rare)
+        async def warm(acc):
+            async with semaphore:
+                try:
+                    await pool.warm(acc, bot_username)
+                    return True
+                except Exception as e:
+                    print(f"⚠️ [{acc['session']}] Прогрев не удался: {e}")
+                    await pool.discard(acc["session"])
+                    return False
         
-        # 4. Фильтруем редкие карты
-        for card_info in rare_cards:
-            await filter_rare_card(client, entity, card_info)
-
-        print(f"🎉 [{client.session.filename}] Цикл карт завершен!")
+        warmed = await asyncio.gather(*(warm(acc) for acc in accounts))
+        print(f"🔥 Прогрето аккаунтов: {sum(warmed)} из {len(warmed)} за {time.monotonic() - started:.1f} с")
         
     except Exception as e:
-        print(f"❌ [{client.session.filename}] Ошибка в цикле карт: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"❌ Ошибка при прогреве аккаунтов: {e}")
 
-# === ОСНОВНЫЕ ФУНКЦИИ ===
+@asynccontextmanager
+async def timed_cycle(cycle, session_name, turn=None):
+    """
+    Замеряет цикл аккаунта (время в слоте и число круток) для истории циклов.
+    С turn считается только время в слоте, без ожидания между порциями
+    """
+    counter = get_round_trip_counter()
+    attempts_before = counter.run_count(session_name, "attempt")
+    started = turn.held_seconds() if turn is not None else time.monotonic()
+    yield
+    attempts = counter.run_count(session_name, "attempt") - attempts_before
+    finished = turn.held_seconds() if turn is not None else time.monotonic()
+    get_cycle_history().record(cycle, session_name, finished - started, attempts)
+
+def order_accounts(cycle, accounts):
+    """
+    Порядок запуска: от самого долгого по прошлым циклам к самому быстрому (LPT)
+    """
+    history = get_cycle_history()
+    ordered = history.order(cycle, accounts)
+    if ordered != list(accounts):
+        longest = [f"{acc['session']} ~{history.expected(cycle, acc['session']) or 0:.0f} с" for acc in ordered[:3]]
+        print(f"📈 Порядок по прошлым циклам (сначала долгие): {', '.join(longest)}...")
+    return ordered
+
+@asynccontextmanager
+async def connect_account(acc, bot_username, pool=None):
+    """
+    Подключает аккаунт и выдаёт (client, user, entity).
+    С пулом клиент берётся из него и не отключается; без пула создаётся
+    новый клиент на один цикл (entity тогда None - его получит сам цикл).
+    """
+    if pool is not None:
+        async with pool.borrow(acc, bot_username) as lease:
+            yield lease
+        return
+    
+    client = TelegramClient(f"accounts/{acc['session']}", API_ID, API_HASH)
+    try:
+        await client.start(phone=acc.get("phone", "Неизвестно"))
+        user = await client.get_me()
+        yield client, user, None
+    finally:
+        close_routers(client)
+        await client.disconnect()
 
-async def run_daily_cycle():
+async def run_daily_cycle(pool=None):
     """
     Запускает ежедневный цикл для всех аккаунтов
+    pool - ClientPool: клиенты берутся из пула и остаются подключены после цикла
+    (без пула - пул одного прогона)
     """
+    pool, own_pool = run_pool(pool)
     try:
         # Загружаем конфигурацию аккаунтов
-        with open("accounts/accounts.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = await read_json_async("accounts/accounts.json")
         
         bot_username = config.get("bot", "@anicardplaybot")
         concurrency = config.get("concurrency", 2)
@@ -941,53 +752,106 @@ async def run_daily_cycle():
         
         print(f"🔐 Настроено аккаунтов: {len(accounts)}")
         print(f"⚡ Одновременно работает: {concurrency}")
-        print(f"⏱️ Задержка между действиями: {MESSAGE_TIMEOUT_MS} мс")
+        print(f"⏱️ Интервал между действиями аккаунта: {ACCOUNT_INTERVAL_MS} мс")
         
         for i, acc in enumerate(accounts, 1):
             print(f"  {i}. {acc['session']} -> {bot_username}")
         
-        # Создаем семафор для ограничения одновременных подключений
-        semaphore = asyncio.Semaphore(concurrency)
+        # Сессии без авторизации отсеиваются до цикла и не занимают слот
+        accounts = await precheck_sessions(accounts, pool)
+        accounts = order_accounts("daily", accounts)
+        
+        # Обращения к боту считаются заново для каждого прогона
+        get_round_trip_counter().reset()
+        get_step_stats().reset()
+        
+        # Слоты concurrency: аккаунт отдаёт слот между порциями круток, оставаясь подключённым
+        slots = WorkSlots(concurrency)
+        
+        checkpoints = get_checkpoints()
         
         async def process_account(acc):
-            async with semaphore:
+            # Аккаунт уже закончил цикл сегодня (процесс перезапущен) - не подключаемся
+            if checkpoints.is_finished(acc["session"], "daily"):
+                print(f"⏭️ [{acc['session']}] Ежедневный цикл уже завершен сегодня, пропускаем")
+                return
+            
+            async with slots.turn(acc["session"]) as turn:
                 session_name = acc["session"]
                 phone = acc.get("phone", "Неизвестно")
                 
                 print(f"🔐 [{session_name}] Подключаемся к аккаунту {phone}...")
                 
-                client = TelegramClient(f"accounts/{session_name}", API_ID, API_HASH)
-                
                 try:
-                    await client.start(phone=phone)
-                    user = await client.get_me()
-                    print(f"✅ [{session_name}] Подключен как: @{user.username} ({user.phone})")
-                    
-                    # Запускаем ежедневный цикл
-                    await daily_cycle_for_account(client, bot_username)
+                    async with timed_cycle("daily", session_name, turn), \
+                            connect_account(acc, bot_username, pool) as (client, user, entity):
+                        print(f"✅ [{session_name}] Подключен как: @{user.username} ({user.phone})")
+                        
+                        # Запускаем ежедневный цикл
+                        await daily_cycle_for_account(client, bot_username, entity, turn)
                     
                 except Exception as e:
                     print(f"❌ [{session_name}] Ошибка: {e}")
-                finally:
-                    await client.disconnect()
         
         # Запускаем все аккаунты
         tasks = [process_account(acc) for acc in accounts]
         await asyncio.gather(*tasks, return_exceptions=True)
         
+        # Длительность аккаунтов для порядка следующего прогона
+        history = get_cycle_history()
+        await history.write()
+        
+        # Дожидаемся записи всех карт
+        await flush_writes()
+        
+        # Ожидание лимитера по аккаунтам и задержка бота по шагам (для настройки частоты)
+        get_rate_limiter().report()
+        get_rate_limiter().reset_stats()
+        get_latency_tracker().report()
+        get_round_trip_counter().report()
+        get_step_stats().report()
+        slots.report()
+        
         print("🎉 Ежедневный цикл завершен для всех аккаунтов!")
         
     except Exception as e:
         print(f"❌ Ошибка при запуске ежедневного цикла: {e}")
+    finally:
+        if own_pool:
+            await pool.close()
+
+async def run_card_cycle_for(acc, bot_username, pool=None, turn=None):
+    """
+    Подключает один аккаунт и запускает для него цикл карт
+    (используется и общим циклом, и планировщиком по кулдаунам)
+    turn - слот аккаунта (work_slots): между порциями круток отдаётся другим
+    """
+    session_name = acc["session"]
+    phone = acc.get("phone", "Неизвестно")
+    
+    print(f"🔐 [{session_name}] Подключаемся к аккаунту {phone}...")
+    
+    try:
+        async with timed_cycle("cards", session_name, turn), \
+                connect_account(acc, bot_username, pool) as (client, user, entity):
+            print(f"✅ [{session_name}] Подключен как: @{user.username} ({user.phone})")
+            
+            # Запускаем цикл карт
+            await card_cycle_for_account(client, bot_username, entity, turn)
+        
+    except Exception as e:
+        print(f"❌ [{session_name}] Ошибка: {e}")
 
-async def run_card_cycle():
+async def run_card_cycle(pool=None):
     """
     Запускает цикл карт для всех аккаунтов
+    pool - ClientPool: клиенты берутся из пула и остаются подключены после цикла
+    (без пула - пул одного прогона)
     """
+    pool, own_pool = run_pool(pool)
     try:
         # Загружаем конфигурацию аккаунтов
-        with open("accounts/accounts.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = await read_json_async("accounts/accounts.json")
         
         bot_username = config.get("bot", "@anicardplaybot")
         concurrency = config.get("concurrency", 2)
@@ -995,44 +859,52 @@ async def run_card_cycle():
         
         print(f"🔐 Настроено аккаунтов: {len(accounts)}")
         print(f"⚡ Одновременно работает: {concurrency}")
-        print(f"⏱️ Задержка между действиями: {MESSAGE_TIMEOUT_MS} мс")
+        print(f"⏱️ Интервал между действиями аккаунта: {ACCOUNT_INTERVAL_MS} мс")
         
         for i, acc in enumerate(accounts, 1):
             print(f"  {i}. {acc['session']} -> {bot_username}")
         
-        # Создаем семафор для ограничения одновременных подключений
-        semaphore = asyncio.Semaphore(concurrency)
+        # Сессии без авторизации отсеиваются до цикла и не занимают слот
+        accounts = await precheck_sessions(accounts, pool)
+        accounts = order_accounts("cards", accounts)
+        
+        # Обращения к боту считаются заново для каждого прогона
+        get_round_trip_counter().reset()
+        get_step_stats().reset()
+        
+        # Слоты concurrency: аккаунт отдаёт слот между порциями круток, оставаясь подключённым
+        slots = WorkSlots(concurrency)
         
         async def process_account(acc):
-            async with semaphore:
-                session_name = acc["session"]
-                phone = acc.get("phone", "Неизвестно")
-                
-                print(f"🔐 [{session_name}] Подключаемся к аккаунту {phone}...")
-                
-                client = TelegramClient(f"accounts/{session_name}", API_ID, API_HASH)
-                
-                try:
-                    await client.start(phone=phone)
-                    user = await client.get_me()
-                    print(f"✅ [{session_name}] Подключен как: @{user.username} ({user.phone})")
-                    
-                    # Запускаем цикл карт
-                    await card_cycle_for_account(client, bot_username)
-                    
-                except Exception as e:
-                    print(f"❌ [{session_name}] Ошибка: {e}")
-                finally:
-                    await client.disconnect()
+            async with slots.turn(acc["session"]) as turn:
+                await run_card_cycle_for(acc, bot_username, pool, turn)
         
         # Запускаем все аккаунты
         tasks = [process_account(acc) for acc in accounts]
         await asyncio.gather(*tasks, return_exceptions=True)
         
+        # Длительность аккаунтов для порядка следующего прогона
+        history = get_cycle_history()
+        await history.write()
+        
+        # Дожидаемся записи всех карт
+        await flush_writes()
+        
+        # Ожидание лимитера по аккаунтам и задержка бота по шагам (для настройки частоты)
+        get_rate_limiter().report()
+        get_rate_limiter().reset_stats()
+        get_latency_tracker().report()
+        get_round_trip_counter().report()
+        get_step_stats().report()
+        slots.report()
+        
         print("🎉 Цикл карт завершен для всех аккаунтов!")
         
     except Exception as e:
         print(f"❌ Ошибка при запуске цикла карт: {e}")
+    finally:
+        if own_pool:
+            await pool.close()
 
 async def main():
     """
@@ -1068,10 +940,10 @@ async def activate_promo_for_all_accounts(promo_input):
     Активирует промо для всех аккаунтов
     Поддерживает как ссылки (https://t.me/anicardplaybot?start=...), так и команды (/promo text)
     """
+    pool, own_pool = run_pool()
     try:
         # Загружаем конфигурацию
-        with open("accounts/accounts.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = await read_json_async("accounts/accounts.json")
         
         accounts = config.get("accounts", [])
         bot_username = config.get("bot", "@anicardplaybot")
@@ -1097,91 +969,103 @@ async def activate_promo_for_all_accounts(promo_input):
             print("   - Команду: /promo CODE")
             return
         
+        if promo_type == "link":
+            # Отправляем ссылку с параметром start
+            message = f"https://t.me/anicardplaybot?start={promo_code}"
+        else:
+            # Отправляем команду /promo
+            message = f"/promo {promo_code}" if promo_code else "/promo"
+        
+        # Журнал промо: аккаунты, уже получившие ответ на это промо, пропускаются
+        ledger = get_promo_ledger()
+        done = [acc for acc in accounts if ledger.is_done(message, acc["session"])]
+        pending = [acc for acc in accounts if not ledger.is_done(message, acc["session"])]
+        concurrency = config.get("concurrency", 2)
+        
         print(f"🤖 Бот: {bot_username}")
-        print(f"👤 Аккаунтов для активации: {len(accounts)}")
+        print(f"👤 Аккаунтов для активации: {len(pending)} из {len(accounts)}")
+        if done:
+            print(f"📒 Уже активировано ранее (по журналу): {len(done)}")
+        print(f"⚡ Одновременно работает: {concurrency}")
         print()
         
-        success_count = 0
-        error_count = 0
+        # Сессии без авторизации отсеиваются до активации
+        healthy = await precheck_sessions(pending, pool)
+        for acc in pending:
+            if acc not in healthy:
+                ledger.record(message, acc["session"], "error", "сессия не прошла проверку")
         
-        for acc in accounts:
-            session_name = acc["session"]
-            phone = acc.get("phone", "Неизвестно")
-            
-            print(f"🔐 [{session_name}] Активируем промо для {phone}...")
-            
-            client = TelegramClient(f"accounts/{session_name}", API_ID, API_HASH)
-            
-            try:
-                await client.start(phone=phone)
-                user = await client.get_me()
-                print(f"✅ [{session_name}] Подключен как: @{user.username}")
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def process_account(acc):
+            async with semaphore:
+                session_name = acc["session"]
+                phone = acc.get("phone", "Неизвестно")
+                
+                print(f"🔐 [{session_name}] Активируем промо для {phone}...")
                 
-                # Активируем промо
                 try:
-                    entity = await client.get_entity(bot_username)
-                    
-                    if promo_type == "link":
-                        # Отправляем ссылку с параметром start
-                        message = f"https://t.me/anicardplaybot?start={promo_code}"
-                    else:
-                        # Отправляем команду /promo
-                        message = f"/promo {promo_code}" if promo_code else "/promo"
-                    
-                    await client.send_message(entity, message)
-                    print(f"📤 [{session_name}] Отправлено: {message}")
-                    
-                    # Ждем ответ от бота
-                    try:
-                        response = await wait_new_from(client, entity, timeout=15)
-                        response_text = response.raw_text
-                        print(f"📱 [{session_name}] Ответ бота: {response_text[:100]}...")
+                    async with connect_account(acc, bot_username, pool) as (client, user, entity):
+                        print(f"✅ [{session_name}] Подключен как: @{user.username}")
+                        
+                        # Ожидание регистрируется до отправки, так что быстрый ответ не теряется;
+                        # промо не отправляется повторно и не подменяется историей чата
+                        promo_scenario = Scenario("promo", [
+                            Send(message, timeout=15, fallback=False, retries=0, title=None),
+                        ], start_delay=None)
+                        ctx = ScenarioContext(client, entity)
+                        print(f"📤 [{session_name}] Отправлено: {message}")
                         
-                        # Проверяем успешность активации
-                        if any(word in response_text.lower() for word in ["активирован", "получен", "промо", "успешно", "активация"]):
-                            print(f"✅ [{session_name}] Промо успешно активировано!")
-                            success_count += 1
+                        if not await run_scenario(ctx, promo_scenario):
+                            print(f"⏰ [{session_name}] Таймаут ожидания ответа от бота")
+                            ledger.record(message, session_name, "timeout")
                         else:
-                            print(f"⚠️ [{session_name}] Неясный ответ от бота")
-                            success_count += 1  # Считаем успешным, если бот ответил
-                            
-                    except asyncio.TimeoutError:
-                        print(f"⏰ [{session_name}] Таймаут ожидания ответа от бота")
-                        error_count += 1
-                    except Exception as e:
-                        print(f"❌ [{session_name}] Ошибка при получении ответа: {e}")
-                        error_count += 1
-                    
+                            response_text = ctx.text()
+                            print(f"📱 [{session_name}] Ответ бота: {response_text[:100]}...")
+                            outcome = classify_reply(response_text)
+                            print(f"📒 [{session_name}] Исход: {PROMO_OUTCOMES[outcome]}")
+                            ledger.record(message, session_name, outcome, response_text)
+                
                 except Exception as e:
-                    print(f"❌ [{session_name}] Ошибка отправки промо: {e}")
-                    error_count += 1
+                    print(f"❌ [{session_name}] Ошибка активации промо: {e}")
+                    ledger.record(message, session_name, "error", str(e))
                 
-            except Exception as e:
-                print(f"❌ [{session_name}] Ошибка авторизации: {e}")
-                error_count += 1
-            finally:
-                await client.disconnect()
-            
-            print()
-            await asyncio.sleep(2)  # Пауза между аккаунтами
+                # Журнал записывается после каждого аккаунта в фоновом потоке
+                await ledger.write()
+        
+        started = time.monotonic()
+        await asyncio.gather(*(process_account(acc) for acc in healthy), return_exceptions=True)
+        await ledger.write()
+        await flush_writes()
+        
+        outcomes = {}
+        for acc in pending:
+            outcome = ledger.outcome(message, acc["session"])
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
         
         print("=" * 50)
-        print(f"🎉 Активация промо завершена!")
-        print(f"✅ Успешно: {success_count}")
-        print(f"❌ Ошибок: {error_count}")
+        print(f"🎉 Активация промо завершена за {time.monotonic() - started:.1f} с!")
+        for outcome, label in PROMO_OUTCOMES.items():
+            if outcomes.get(outcome):
+                print(f"{label}: {outcomes[outcome]}")
+        if done:
+            print(f"⏭️ Пропущено (уже в журнале): {len(done)}")
         print(f"📊 Всего аккаунтов: {len(accounts)}")
         
     except Exception as e:
         print(f"❌ Ошибка при активации промо: {e}")
+    finally:
+        if own_pool:
+            await pool.close()
 
-async def test_bot_connection():
+async def test_bot_connection(concurrency=PROBE_CONCURRENCY, output=PROBE_REPORT_PATH):
     """
-    Тестирует подключение к боту для всех аккаунтов
+    Тестирует подключение к боту для всех аккаунтов параллельно:
+    время подключения, получения сущности бота и ответа бота по каждому аккаунту
     """
     try:
         # Загружаем конфигурацию
-        with open("accounts/accounts.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = await read_json_async("accounts/accounts.json")
         
         accounts = config.get("accounts", [])
         bot_username = config.get("bot", "@anicardplaybot")
@@ -1192,37 +1076,26 @@ async def test_bot_connection():
         
         print(f"🤖 Тестируем подключение к боту: {bot_username}")
         print(f"👤 Аккаунтов для проверки: {len(accounts)}")
+        print(f"⚡ Одновременно проверяется: {concurrency}")
         print()
         
-        for acc in accounts:
-            session_name = acc["session"]
-            phone = acc.get("phone", "Неизвестно")
-            
-            print(f"🔐 [{session_name}] Тестируем {phone}...")
-            
-            client = TelegramClient(f"accounts/{session_name}", API_ID, API_HASH)
-            
-            try:
-                await client.start(phone=phone)
-                user = await client.get_me()
-                print(f"✅ [{session_name}] Подключен как: @{user.username}")
-                
-                # Тестируем подключение к боту
-                try:
-                    entity = await client.get_entity(bot_username)
-                    await client.send_message(entity, "Меню")
-                    msg = await wait_new_from(client, entity, timeout=10)
-                    print(f"✅ [{session_name}] Подключение к боту работает!")
-                    print(f"📱 [{session_name}] Получено сообщение: {msg.raw_text[:50]}...")
-                except Exception as e:
-                    print(f"❌ [{session_name}] Ошибка подключения к боту: {e}")
-                
-            except Exception as e:
-                print(f"❌ [{session_name}] Ошибка авторизации: {e}")
-            finally:
-                await client.disconnect()
-            
-            print()
+        make_client = lambda acc: TelegramClient(f"accounts/{acc['session']}", API_ID, API_HASH)
+        started = time.monotonic()
+        results = await probe_accounts(accounts, make_client, bot_username, concurrency)
+        elapsed = time.monotonic() - started
+        
+        print_table(results, summarize(results))
+        print()
+        
+        ok = sum(1 for r in results if r["status"] == "ok")
+        print(f"✅ Бот отвечает: {ok} из {len(results)} аккаунтов за {elapsed:.1f} с")
+        if any(r["status"] == "unauthorized" for r in results):
+            print("🔑 Неавторизованные сессии: войдите заново через scripts/auth_manager.py")
+        
+        if output:
+            await write_async(save_json, output, build_report(results, bot_username, concurrency, elapsed))
+            await flush_writes()
+            print(f"💾 Отчёт: {output}")
         
         print("🎉 Тестирование завершено!")
         
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Connection Probe - Параллельная проверка связи аккаунтов с ботом
+Для каждого аккаунта замеряются три этапа: подключение (connect, проверка
+авторизации, get_me), получение сущности бота и ответ бота на "Меню".
+Итог - таблица от самого медленного аккаунта и JSON с теми же данными:
+по ним видно медленные сессии и разумный concurrency перед большим прогоном.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from latency_tracker import percentile
+from message_router import close_routers, get_router
+from rate_limiter import get_rate_limiter
+from session_names import account_name
+
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "20"))
+PROBE_REPLY_TIMEOUT = float(os.getenv("PROBE_REPLY_TIMEOUT", "10"))
+PROBE_REPORT_PATH = os.path.join("accounts", "connection_report.json")
+
+PHASES = ("connect_ms", "entity_ms", "reply_ms")
+
+
+def _ms(started):
+    return round((time.monotonic() - started) * 1000, 1)
+
+
+async def probe_account(client, bot_username, reply_timeout=PROBE_REPLY_TIMEOUT):
+    """
+    Замеряет этапы для одного аккаунта; код и 2FA не запрашиваются
+    """
+    result = {"status": "ok", "user": None, "error": ""}
+    result.update(dict.fromkeys(PHASES))
+    try:
+        started = time.monotonic()
+        if not client.is_connected():
+            await client.connect()
+        if not await client.is_user_authorized():
+            result["status"] = "unauthorized"
+            return result
+        user = await client.get_me()
+        result["user"] = f"@{user.username}" if user.username else str(user.id)
+        result["connect_ms"] = _ms(started)
+
+        started = time.monotonic()
+        entity = await client.get_entity(bot_username)
+        result["entity_ms"] = _ms(started)
+
+        # Ожидание регистрируется до отправки; задержка считается от отправки,
+        # ожидание лимитера в неё не входит
+        router = get_router(client, entity)
+        waiters = []
+
+        async def send_menu():
+            # Своё ожидание на каждую попытку: после FloodWait лимитер повторяет
+            # шаг, а ожидание неудачной отправки уже снято маршрутизатором
+            waiter = router.arm()
+            waiters.append(waiter)
+            return await router.send_and_wait("Меню", reply_timeout, step="probe", waiter=waiter)
+
+        await get_rate_limiter().run(client.session.filename, send_menu)
+        result["reply_ms"] = round(waiters[-1].latency * 1000, 1)
+    except asyncio.TimeoutError:
+        result["status"] = "no_reply"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def probe_accounts(accounts, make_client, bot_username, concurrency=PROBE_CONCURRENCY,
+                         reply_timeout=PROBE_REPLY_TIMEOUT):
+    """
+    Проверяет все аккаунты параллельно (не больше concurrency одновременно).
+    Возвращает результаты от самого медленного аккаунта
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def probe(acc):
+        async with semaphore:
+            client = make_client(acc)
+            try:
+                result = await probe_account(client, bot_username, reply_timeout)
+            finally:
+                close_routers(client)
+                try:
+                    await client.disconnect()
+                except Exception:
+                    pass
+            result["account"] = account_name(acc["session"])
+            result["total_ms"] = round(sum(result[phase] or 0 for phase in PHASES), 1)
+            return result
+
+    results = await asyncio.gather(*(probe(acc) for acc in accounts))
+    return sorted(results, key=lambda r: (r["status"] == "ok", -r["total_ms"]))
+
+
+def summarize(results):
+    """
+    {этап: {"p50", "p95", "max"}} по аккаунтам, где этап прошёл
+    """
+    summary = {}
+    for phase in PHASES + ("total_ms",):
+        values = [r[phase] for r in results if r["status"] == "ok" and r[phase] is not None]
+        summary[phase] = {
+            "p50": percentile(values, 0.5),
+            "p95": percentile(values, 0.95),
+            "max": max(values) if values else None,
+        }
+    return summary
+
+
+def print_table(results, summary):
+    """
+    Таблица задержек: проблемные аккаунты сверху, затем от самого медленного
+    """
+    def cell(value):
+        return f"{value:>9.0f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'Аккаунт':<20} {'Статус':<13} {'connect':>9} {'entity':>9} {'ответ':>9} {'всего':>9}")
+    for r in results:
+        line = (f"{r['account']:<20} {r['status']:<13} {cell(r['connect_ms'])} {cell(r['entity_ms'])} "
+                f"{cell(r['reply_ms'])} {cell(r['total_ms'] if r['status'] == 'ok' else None)}")
+        if r["error"]:
+            line += f"  {r['error'][:60]}"
+        print(line)
+    print()
+    for label, key in (("p50", "p50"), ("p95", "p95"), ("макс.", "max")):
+        print(f"{label:<20} {'':<13} " + " ".join(cell(summary[phase][key]) for phase in PHASES + ("total_ms",)))
+
+
+def build_report(results, bot_username, concurrency, elapsed):
+    return {
+        "checked_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "bot": bot_username,
+        "concurrency": concurrency,
+        "wall_s": round(elapsed, 2),
+        "summary": summarize(results),
+        "accounts": results,
+    }
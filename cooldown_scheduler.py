@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cooldown Scheduler - Планировщик аккаунтов по кулдаунам бота
+Сообщения "Следующая попытка будет доступна через X ч Y мин" превращаются
+в момент, когда аккаунт снова может крутить карты; каждый аккаунт запускается
+сразу, как только наступает его момент, а не ждёт самый медленный
+"""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import re
+import time
+from datetime import datetime
+
+from session_names import account_name
+
+# Стандартный интервал цикла карт, если бот не сообщил кулдаун
+DEFAULT_CARD_INTERVAL = 4 * 3600 + 10
+# Запас после окончания кулдауна (как и раньше, +1 минута)
+COOLDOWN_MARGIN = 60
+
+COOLDOWN_RE = re.compile(
+    r"доступна\s+через\s*(?:(?P<hours>\d+)\s*ч\w*)?\s*(?:(?P<minutes>\d+)\s*мин\w*)?\s*(?:(?P<seconds>\d+)\s*сек\w*)?",
+    re.I,
+)
+
+
+def parse_cooldown(text):
+    """
+    Возвращает длительность кулдауна в секундах или None
+    "⏳ Следующая попытка будет доступна через 3 ч 45 мин" -> 13500
+    """
+    match = COOLDOWN_RE.search(text or "")
+    if not match or not any(match.groupdict().values()):
+        return None
+    hours = int(match.group("hours") or 0)
+    minutes = int(match.group("minutes") or 0)
+    seconds = int(match.group("seconds") or 0)
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class CooldownTracker:
+    """
+    Момент доступности (time.time()) для каждого аккаунта.
+    За один прогон аккаунта берётся самый ранний кулдаун: как только
+    доступна хотя бы одна крутка, аккаунт стоит запустить.
+    """
+
+    def __init__(self, margin=COOLDOWN_MARGIN):
+        self.margin = margin
+        self._next = {}
+
+    def record(self, session_name, seconds, now=None):
+        now = time.time() if now is None else now
+        key = account_name(session_name)
+        eligible_at = now + seconds + self.margin
+        current = self._next.get(key)
+        if current is None or eligible_at < current:
+            self._next[key] = eligible_at
+        return self._next[key]
+
+    def next_eligible(self, session_name):
+        return self._next.get(account_name(session_name))
+
+    def clear(self, session_name):
+        self._next.pop(account_name(session_name), None)
+
+
+_shared_tracker = CooldownTracker()
+
+
+def get_cooldown_tracker():
+    """
+    Возвращает общий для процесса трекер кулдаунов
+    """
+    return _shared_tracker
+
+
+def record_cooldown_message(session_name, text):
+    """
+    Разбирает сообщение бота о кулдауне и запоминает его для аккаунта.
+    Возвращает длительность в секундах или None
+    """
+    seconds = parse_cooldown(text)
+    if seconds is None:
+        return None
+    _shared_tracker.record(session_name, seconds)
+    print(f"⏰ [{session_name}] Кулдаун: следующая попытка через {seconds // 60} мин")
+    return seconds
+
+
+class AccountScheduler:
+    """
+    Очередь с приоритетом (момент доступности, аккаунт).
+    run() запускает worker(acc) для каждого аккаунта, как только он доступен,
+    и ставит аккаунт обратно по кулдауну, полученному во время прогона.
+    """
+
+    def __init__(self, default_interval=DEFAULT_CARD_INTERVAL, tracker=None):
+        self.default_interval = default_interval
+        self.tracker = tracker or get_cooldown_tracker()
+        self._heap = []
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, acc, eligible_at=None):
+        """
+        Ставит аккаунт в очередь (по умолчанию - доступен сразу)
+        """
+        eligible_at = time.time() if eligible_at is None else eligible_at
+        heapq.heappush(self._heap, (eligible_at, next(self._counter), acc))
+        self._changed.set()
+
+    def next_run_at(self, acc, started_at):
+        """
+        Момент следующего запуска: кулдаун от бота или стандартный интервал
+        """
+        eligible_at = self.tracker.next_eligible(acc["session"])
+        if eligible_at is None:
+            eligible_at = started_at + self.default_interval
+        return eligible_at
+
+    async def _take_slot(self, semaphore, gate):
+        """
+        Занимает слот. gate закрыт (например, идёт ежедневный цикл) - аккаунт
+        ждёт его открытия без слота, чтобы слот не простаивал
+        """
+        while True:
+            if gate is not None:
+                await gate.wait()
+            await semaphore.acquire()
+            if gate is None or gate.is_open():
+                return
+            semaphore.release()
+
+    async def _run_one(self, worker, acc, semaphore, gate=None):
+        session_name = acc["session"]
+        await self._take_slot(semaphore, gate)
+        try:
+            self.tracker.clear(session_name)
+            started_at = time.time()
+            try:
+                # Запуск отмечается сразу после проверки gate, без await между ними
+                with gate.running() if gate is not None else contextlib.nullcontext():
+                    await worker(acc)
+            except Exception as e:
+                print(f"❌ [{session_name}] Ошибка в запланированном цикле: {e}")
+            finally:
+                eligible_at = self.next_run_at(acc, started_at)
+                self.add(acc, eligible_at)
+                print(f"⏰ [{session_name}] Следующий цикл карт в {datetime.fromtimestamp(eligible_at).strftime('%H:%M:%S')}")
+        finally:
+            semaphore.release()
+
+    async def run(self, worker, concurrency=2, gate=None):
+        """
+        Бесконечно запускает аккаунты по мере наступления их кулдаунов.
+        gate - условие запуска (await gate.wait(), gate.is_open(), with gate.running()):
+        аккаунт начинает, только когда оно выполнено
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        running = set()
+        try:
+            while True:
+                self._changed.clear()
+                if not self._heap:
+                    await self._changed.wait()
+                    continue
+
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    # Просыпаемся раньше, если в очередь встал более ранний аккаунт
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                _, _, acc = heapq.heappop(self._heap)
+                task = asyncio.create_task(self._run_one(worker, acc, semaphore, gate))
+                running.add(task)
+                task.add_done_callback(running.discard)
+        finally:
+            for task in running:
+                task.cancel()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cycle History - Длительность прошлых циклов по аккаунтам
+После каждого цикла для аккаунта сохраняются длительность (скользящее среднее)
+и число круток. Следующий прогон запускает аккаунты от самого долгого к самому
+быстрому (LPT): долгий аккаунт не оказывается последним в очереди и не
+растягивает весь прогон при том же concurrency.
+
+История: accounts/cycle_history.json
+    {"daily": {"account_1": {"seconds": 42.5, "attempts": 12, "runs": 7}}}
+"""
+
+import os
+import statistics
+
+from async_writer import JsonState
+from session_names import account_name
+
+HISTORY_PATH = os.path.join("accounts", "cycle_history.json")
+LPT_SCHEDULING_ENABLED = os.getenv("LPT_SCHEDULING", "1") != "0"
+# Вес последнего прогона в скользящем среднем длительности
+HISTORY_ALPHA = float(os.getenv("CYCLE_HISTORY_ALPHA", "0.5"))
+
+
+class CycleHistory(JsonState):
+    """
+    Длительность и крутки прошлых циклов по (цикл, аккаунт)
+    """
+
+    label = "историю циклов"
+
+    def __init__(self, path=HISTORY_PATH, alpha=HISTORY_ALPHA, enabled=LPT_SCHEDULING_ENABLED):
+        super().__init__(path)
+        self.alpha = alpha
+        self.enabled = enabled
+
+    def record(self, cycle, session_name, seconds, attempts):
+        """
+        Добавляет прогон аккаунта в скользящее среднее
+        """
+        accounts = self._load().setdefault(cycle, {})
+        entry = accounts.get(account_name(session_name))
+        if entry is None:
+            entry = {"seconds": seconds, "attempts": attempts, "runs": 0}
+            accounts[account_name(session_name)] = entry
+        else:
+            entry["seconds"] = self.alpha * seconds + (1 - self.alpha) * entry["seconds"]
+            entry["attempts"] = attempts
+        entry["seconds"] = round(entry["seconds"], 2)
+        entry["runs"] += 1
+
+    def expected(self, cycle, session_name):
+        """
+        Ожидаемая длительность цикла аккаунта (сек) или None без истории
+        """
+        entry = self._load().get(cycle, {}).get(account_name(session_name))
+        return entry["seconds"] if entry else None
+
+    def order(self, cycle, accounts):
+        """
+        Аккаунты от самого долгого к самому быстрому. Аккаунт без истории
+        считается средним (медиана известных); без истории порядок не меняется
+        """
+        if not self.enabled:
+            return list(accounts)
+        expected = {acc["session"]: self.expected(cycle, acc["session"]) for acc in accounts}
+        known = [seconds for seconds in expected.values() if seconds is not None]
+        if not known:
+            return list(accounts)
+        median = statistics.median(known)
+        # sorted устойчив: при равной оценке сохраняется порядок из accounts.json
+        return sorted(accounts, key=lambda acc: -(expected[acc["session"]] if expected[acc["session"]] is not None else median))
+
+
+_shared_history = None
+
+
+def get_cycle_history():
+    """
+    Возвращает общую для процесса историю циклов
+    """
+    global _shared_history
+    if _shared_history is None:
+        _shared_history = CycleHistory()
+    return _shared_history
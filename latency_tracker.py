@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Latency Tracker - Замер задержки ответов бота
+Время от отправки/клика до ответа записывается по аккаунту и типу шага;
+таймаут ожидания ответа = p99 * коэффициент вместо статического MESSAGE_TIMEOUT
+"""
+
+import math
+import os
+import re
+from collections import deque
+
+from session_names import account_name
+
+MESSAGE_TIMEOUT_MS = int(os.getenv("MESSAGE_TIMEOUT", "700"))
+# Таймаут, пока замеров ещё мало (мс, по умолчанию 2 * MESSAGE_TIMEOUT)
+DEFAULT_REPLY_TIMEOUT_MS = int(os.getenv("REPLY_TIMEOUT", str(MESSAGE_TIMEOUT_MS * 2)))
+# Таймаут = перцентиль * коэффициент, в пределах [минимум, максимум]
+REPLY_PERCENTILE = float(os.getenv("REPLY_PERCENTILE", "0.99"))
+REPLY_TIMEOUT_FACTOR = float(os.getenv("REPLY_TIMEOUT_FACTOR", "2.0"))
+# Минимум - не меньше прежнего статического MESSAGE_TIMEOUT
+REPLY_TIMEOUT_MIN_MS = int(os.getenv("REPLY_TIMEOUT_MIN", str(MESSAGE_TIMEOUT_MS)))
+REPLY_TIMEOUT_MAX_MS = int(os.getenv("REPLY_TIMEOUT_MAX", "15000"))
+# Сколько последних замеров хранить и сколько нужно, чтобы им доверять
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 5
+# Длина имени шага в ключе замеров
+STEP_NAME_LIMIT = 40
+
+
+def percentile(samples, q):
+    """
+    Перцентиль q (0..1) по списку значений (ближайший ранг)
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def step_name(step):
+    """
+    Имя шага для замеров: команда без аргументов ("/promo CODE" -> "/promo"),
+    числа заменены на # ("click:2 ✔️" -> "click:# ✔️"). Тексты с кодами,
+    счётчиками и рейтингами не плодят отдельные окна с единичными замерами
+    """
+    if step is None:
+        return None
+    step = str(step).strip()
+    if step.startswith("/"):
+        step = step.split()[0]
+    return re.sub(r"\d+", "#", step)[:STEP_NAME_LIMIT]
+
+
+class LatencyTracker:
+    """
+    Скользящие окна задержек: (аккаунт, шаг), шаг, аккаунт, все вместе.
+    Для таймаута берётся самое точное окно, в котором достаточно замеров
+    """
+
+    def __init__(self, default_timeout=DEFAULT_REPLY_TIMEOUT_MS / 1000.0, q=REPLY_PERCENTILE,
+                 factor=REPLY_TIMEOUT_FACTOR, min_timeout=REPLY_TIMEOUT_MIN_MS / 1000.0,
+                 max_timeout=REPLY_TIMEOUT_MAX_MS / 1000.0, window=LATENCY_WINDOW, min_samples=MIN_SAMPLES):
+        self.default_timeout = default_timeout
+        self.q = q
+        self.factor = factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self.timeouts = {}
+
+    def _window(self, key):
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self._samples[key] = samples
+        return samples
+
+    def _keys(self, account, step):
+        account = account_name(account) if account else None
+        step = step_name(step)
+        return [("pair", account, step), ("step", None, step), ("account", account, None), ("all", None, None)]
+
+    def record(self, account, step, seconds):
+        """
+        Записывает время ответа бота на шаг
+        """
+        for key in self._keys(account, step):
+            self._window(key).append(seconds)
+
+    def record_timeout(self, account, step):
+        """
+        Ответа не было - считается отдельно, в окно не пишется: таймаут
+        считается от перцентиля окна, и замер, равный таймауту, поднимал бы
+        следующий таймаут без конца (0.7 -> 1.4 -> 2.8 ... с)
+        """
+        step = step_name(step)
+        self.timeouts[step] = self.timeouts.get(step, 0) + 1
+
+    def timeout_for(self, account=None, step=None):
+        """
+        Таймаут ожидания ответа (сек) для аккаунта и шага
+        """
+        for key in self._keys(account, step):
+            samples = self._samples.get(key)
+            if samples and len(samples) >= self.min_samples:
+                value = percentile(samples, self.q) * self.factor
+                return min(self.max_timeout, max(self.min_timeout, value))
+        return self.default_timeout
+
+    def summary(self):
+        """
+        {шаг: {"count", "p50_ms", "p99_ms", "timeout_ms", "timeouts"}} по всем аккаунтам
+        """
+        result = {}
+        for (kind, _, step), samples in self._samples.items():
+            if kind != "step" or not samples:
+                continue
+            result[step] = {
+                "count": len(samples),
+                "p50_ms": round(percentile(samples, 0.5) * 1000),
+                "p99_ms": round(percentile(samples, 0.99) * 1000),
+                "timeout_ms": round(self.timeout_for(step=step) * 1000),
+                "timeouts": self.timeouts.get(step, 0),
+            }
+        return result
+
+    def report(self):
+        """
+        Печатает задержки бота по шагам
+        """
+        summary = self.summary()
+        if not summary:
+            return
+        print("📊 Задержка ответов бота по шагам:")
+        for step, stats in sorted(summary.items(), key=lambda item: -item[1]["count"]):
+            print(f"  {step}: замеров {stats['count']}, p50 {stats['p50_ms']} мс, "
+                  f"p99 {stats['p99_ms']} мс, таймаут {stats['timeout_ms']} мс, без ответа {stats['timeouts']}")
+
+
+_shared_tracker = None
+
+
+def get_latency_tracker():
+    """
+    Возвращает общий для процесса трекер задержек
+    """
+    global _shared_tracker
+    if _shared_tracker is None:
+        _shared_tracker = LatencyTracker()
+    return _shared_tracker
@@ -6,11 +6,14 @@ Anicard Auto - Главное меню
 """
 
 import os
+import re
 import sys
 import json
 import subprocess
 from pathlib import Path
 
+from card_store import get_card_store
+
 def clear_screen():
     """Очищает экран"""
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -72,58 +75,41 @@ def view_rare_cards():
     print("\n🎴 ПРОСМОТР РЕДКИХ КАРТ")
     print("=" * 40)
     
-    cards_folder = Path("accounts/cards")
-    if not cards_folder.exists():
-        print("❌ Папка с картами не найдена")
-        return
-    
-    card_files = list(cards_folder.glob("*.json"))
-    if not card_files:
-        print("📭 Редких карт пока нет")
+    try:
+        cards = get_card_store().cards()
+    except Exception as e:
+        print(f"❌ Ошибка при чтении хранилища карт: {e}")
         return
     
     # Собираем все карты из всех аккаунтов
     all_cards = []
     
-    for card_file in card_files:
-        try:
-            with open(card_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            account_name = card_file.stem
-            
-            for rarity, cards in data.items():
-                for card in cards:
-                    # Определяем рейтинг карты
-                    rating = card.get('rating', 0)
-                    if rating == 0 and rarity == 'adamantine':
-                        rating = 101
-                    elif rating == 0 and rarity == 'mythic':
-                        rating = 99
-                    elif rating == 0 and rarity == 'legendary':
-                        rating = 87
-                    elif rating == 0 and rarity == 'epic':
-                        rating = 80
-                    
-                    # Извлекаем эмодзи из поля element
-                    element = card.get('element', '')
-                    element_emoji = "⚪"  # По умолчанию
-                    
-                    # Извлекаем эмодзи из строки element
-                    import re
-                    emoji_match = re.search(r'([🔥💧🌍💨🍃⚡🧊💡🌑⭐🌟✨💎🔮])', element)
-                    if emoji_match:
-                        element_emoji = emoji_match.group(1)
-                    
-                    all_cards.append({
-                        'name': card['name'],
-                        'rating': rating,
-                        'element_emoji': element_emoji,
-                        'account': account_name
-                    })
-                        
-        except Exception as e:
-            print(f"❌ Ошибка при чтении {card_file}: {e}")
+    for card in cards:
+        # Определяем рейтинг карты
+        rating = card.get('rating') or 0
+        rarity = card['rarity']
+        if rating == 0 and rarity == 'adamantine':
+            rating = 101
+        elif rating == 0 and rarity == 'mythic':
+            rating = 99
+        elif rating == 0 and rarity == 'legendary':
+            rating = 87
+        elif rating == 0 and rarity == 'epic':
+            rating = 80
+        
+        # Извлекаем эмодзи из строки element
+        element = card.get('element') or ''
+        element_emoji = "⚪"  # По умолчанию
+        emoji_match = re.search(r'([🔥💧🌍💨🍃⚡🧊💡🌑⭐🌟✨💎🔮])', element)
+        if emoji_match:
+            element_emoji = emoji_match.group(1)
+        
+        all_cards.append({
+            'name': card['name'],
+            'rating': rating,
+            'element_emoji': element_emoji,
+            'account': card['account']
+        })
     
     if not all_cards:
         print("📭 Редких карт пока нет")
@@ -264,13 +250,12 @@ def check_config():
     else:
         print("❌ accounts.json не найден")
     
-    # Проверяем папку с картами
-    cards_folder = Path("accounts/cards")
-    if cards_folder.exists():
-        card_files = list(cards_folder.glob("*.json"))
-        print(f"✅ Папка с картами найдена ({len(card_files)} файлов)")
+    # Проверяем хранилище карт
+    cards_db = Path("accounts/cards.db")
+    if cards_db.exists():
+        print(f"✅ Хранилище карт найдено ({cards_db})")
     else:
-        print("❌ Папка с картами не найдена")
+        print("❌ Хранилище карт не найдено (будет создано при первом сохранении)")
     
     # Проверяем requirements.txt
     req_file = Path("requirements.txt")
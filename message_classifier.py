@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Message Classifier - Классификация сообщений бота
+Общий для combined_cycle.py и scripts/: текст приводится к нижнему регистру
+один раз и проверяется одним скомпилированным регулярным выражением
+"""
+
+import re
+from enum import Enum
+
+
+class MessageCategory(str, Enum):
+    """
+    Категория сообщения от бота
+    """
+    CARD_DROP = "card_drop"    # "Получена новая ... карточка"
+    DUPLICATE = "duplicate"    # "Вам попалась повторная карта"
+    COOLDOWN = "cooldown"      # "Следующая попытка будет доступна ..."
+    QUEST = "quest"            # Квесты, задания, миссии
+    VIDEO = "video"            # Видео о редких картах
+    MENU = "menu"              # Сообщение с инлайн-кнопками
+    OTHER = "other"            # Всё остальное
+
+
+# Фразы в нижнем регистре -> категория. Порядок внутри категории не важен,
+# при нескольких совпадениях побеждает самое левое в тексте.
+PATTERNS = {
+    MessageCategory.CARD_DROP: ["получена новая"],
+    MessageCategory.DUPLICATE: ["вам попалась повторная карта", "повторная карта"],
+    MessageCategory.COOLDOWN: ["следующая попытка будет доступна", "следующая попытка", "будет доступна"],
+    MessageCategory.QUEST: ["квест", "задание", "миссия", "quest", "mission"],
+}
+
+# Категории, которые wait_new_from не считает ответом на действие
+IGNORED_CATEGORIES = frozenset({
+    MessageCategory.CARD_DROP,
+    MessageCategory.DUPLICATE,
+    MessageCategory.COOLDOWN,
+    MessageCategory.QUEST,
+    MessageCategory.VIDEO,
+})
+
+
+def _build_matcher():
+    groups = []
+    for category, phrases in PATTERNS.items():
+        # Длинные фразы первыми, чтобы альтернатива не обрезала совпадение
+        alternatives = "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+        groups.append(f"(?P<{category.value}>{alternatives})")
+    return re.compile("|".join(groups))
+
+
+_MATCHER = _build_matcher()
+
+
+def classify(text, is_video=False, has_buttons=False, lowered=None):
+    """
+    Возвращает MessageCategory для текста сообщения.
+    lowered - уже приведённый к нижнему регистру текст, если он есть у вызывающего
+    """
+    if is_video:
+        return MessageCategory.VIDEO
+
+    if lowered is None:
+        lowered = (text or "").lower()
+    match = _MATCHER.search(lowered)
+    if match:
+        return MessageCategory(match.lastgroup)
+
+    if has_buttons:
+        return MessageCategory.MENU
+    return MessageCategory.OTHER
+
+
+def classify_message(message, lowered=None):
+    """
+    Классифицирует сообщение Telethon
+    """
+    return classify(
+        getattr(message, "raw_text", "") or "",
+        is_video=bool(getattr(message, "video", None)),
+        has_buttons=bool(getattr(message, "buttons", None)),
+        lowered=lowered,
+    )
+
+
+def is_ignored(category):
+    """
+    True, если сообщение не является ответом на действие (системное, квест, видео)
+    """
+    return category in IGNORED_CATEGORIES
+
+
+def log_ignored(session_name, category, text):
+    """
+    Печатает строку о проигнорированном сообщении в привычном формате
+    """
+    if category == MessageCategory.VIDEO:
+        print(f"🎥 [{session_name}] Получено видео сообщение - игнорируем")
+    elif category == MessageCategory.QUEST:
+        print(f"📋 [{session_name}] Квестовое сообщение: {text[:50]}...")
+    else:
+        print(f"ℹ️ [{session_name}] Системное сообщение: {text[:50]}...")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Message Router - Постоянный маршрутизатор ответов бота
+Один обработчик NewMessage/MessageEdited на клиента вместо регистрации нового на каждый вызов
+"""
+
+import asyncio
+import re
+import time
+
+from telethon import events
+
+from cooldown_scheduler import record_cooldown_message
+from latency_tracker import get_latency_tracker
+from message_classifier import MessageCategory, classify_message, is_ignored, log_ignored
+from round_trips import get_round_trip_counter
+from screen_cache import ScreenCache
+
+
+class Waiter:
+    """
+    Ожидание одного ответа бота: future + фильтры contains/regex.
+    edit_of - id сообщения, редактирование которого тоже считается ответом
+    sent_at - момент действия, от которого считается задержка ответа
+    latency - задержка ответа (сек), когда он получен
+    cooldown - сообщение о кулдауне тоже ответ (крутка карты без попыток)
+    """
+
+    def __init__(self, future, contains=None, regex=None, edit_of=None, cooldown=False):
+        self.future = future
+        self.edit_of = edit_of
+        self.cooldown = cooldown
+        self.sent_at = time.monotonic()
+        self.latency = None
+        self.contains = contains.lower() if contains else None
+        self.regex = re.compile(regex, re.I) if regex else None
+
+    def matches(self, text, lowered):
+        """
+        Проверяет, подходит ли сообщение под фильтры ожидания
+        """
+        if not self.contains and not self.regex:
+            return True
+        if self.contains and self.contains in lowered:
+            return True
+        if self.regex and self.regex.search(text):
+            return True
+        return False
+
+
+class ResponseRouter:
+    """
+    Долгоживущий маршрутизатор сообщений от бота для одного клиента.
+    Каждое сообщение разбирается один раз и отдаётся первому подходящему
+    ожиданию из очереди (FIFO).
+    """
+
+    def __init__(self, client, entity):
+        self.client = client
+        self.entity = entity
+        self.waiters = []
+        # Экраны с инлайн-кнопками, по которым можно нажимать без повторного запроса
+        self.screens = ScreenCache()
+        client.add_event_handler(self._on_message, events.NewMessage(from_users=entity))
+        client.add_event_handler(self._on_edit, events.MessageEdited(from_users=entity))
+
+    @property
+    def name(self):
+        return self.client.session.filename
+
+    async def _on_message(self, event):
+        text = event.raw_text or ""
+        lowered = text.lower()
+
+        # Игнорируем видео, системные и квестовые сообщения
+        category = classify_message(event.message, lowered)
+        if is_ignored(category):
+            log_ignored(self.name, category, text)
+            if category == MessageCategory.COOLDOWN:
+                # Кулдаун нужен планировщику; ответом он считается только
+                # для ожиданий крутки, иначе крутка ждала бы до таймаута
+                record_cooldown_message(self.name, text)
+                self.dispatch_cooldown(event.message)
+            return
+
+        self.screens.observe(event.message)
+        self.dispatch(event.message, text, lowered)
+
+    async def _on_edit(self, event):
+        # Бот часто отвечает на клик редактированием того же сообщения
+        text = event.raw_text or ""
+        self.screens.observe(event.message)
+        self.dispatch_edit(event.message, text, text.lower())
+
+    def dispatch_edit(self, message, text, lowered):
+        """
+        Отдаёт отредактированное сообщение ожиданию, привязанному к его id
+        """
+        for waiter in self.waiters:
+            if waiter.future.done() or waiter.edit_of != message.id:
+                continue
+            if waiter.matches(text, lowered):
+                waiter.future.set_result(message)
+                self.waiters.remove(waiter)
+                return True
+        return False
+
+    def dispatch_cooldown(self, message):
+        """
+        Отдаёт сообщение о кулдауне первому ожиданию, которое его принимает
+        """
+        for waiter in self.waiters:
+            if waiter.cooldown and not waiter.future.done():
+                waiter.future.set_result(message)
+                self.waiters.remove(waiter)
+                return True
+        return False
+
+    def dispatch(self, message, text, lowered=None):
+        """
+        Отдаёт сообщение первому подходящему ожиданию
+        """
+        if lowered is None:
+            lowered = text.lower()
+        for waiter in self.waiters:
+            if waiter.future.done():
+                continue
+            if waiter.matches(text, lowered):
+                waiter.future.set_result(message)
+                self.waiters.remove(waiter)
+                return True
+        return False
+
+    def arm(self, contains=None, regex=None, edit_of=None, cooldown=False):
+        """
+        Регистрирует ожидание ответа. Вызывать ДО действия (отправки/клика),
+        чтобы быстрый ответ бота не был потерян.
+        edit_of - id сообщения с кнопкой: его редактирование тоже завершит ожидание
+        """
+        loop = asyncio.get_running_loop()
+        waiter = Waiter(loop.create_future(), contains=contains, regex=regex, edit_of=edit_of, cooldown=cooldown)
+        self.waiters.append(waiter)
+        return waiter
+
+    def disarm(self, waiter):
+        """
+        Снимает ожидание из очереди
+        """
+        if waiter in self.waiters:
+            self.waiters.remove(waiter)
+        if not waiter.future.done():
+            waiter.future.cancel()
+
+    def mark_sent(self, waiter):
+        """
+        Отмечает момент действия (отправки/клика) для замера задержки
+        """
+        waiter.sent_at = time.monotonic()
+
+    async def wait(self, waiter, timeout=None, step="reply"):
+        """
+        Ждёт результат ранее зарегистрированного ожидания.
+        timeout=None - адаптивный таймаут по замерам задержки шага
+        """
+        tracker = get_latency_tracker()
+        counter = get_round_trip_counter()
+        if timeout is None:
+            timeout = tracker.timeout_for(self.name, step)
+        counter.count(self.name, "waited", step)
+        try:
+            message = await asyncio.wait_for(waiter.future, timeout=timeout)
+        except asyncio.TimeoutError:
+            tracker.record_timeout(self.name, step)
+            counter.count(self.name, "timeouts", step)
+            raise
+        finally:
+            self.disarm(waiter)
+        waiter.latency = time.monotonic() - waiter.sent_at
+        tracker.record(self.name, step, waiter.latency)
+        return message
+
+    async def send_and_wait(self, message, timeout=None, contains=None, regex=None, step=None, waiter=None,
+                            cooldown=False):
+        """
+        Атомарно: регистрирует ожидание, отправляет сообщение и ждёт ответ.
+        Возвращается сразу по приходу ответа, без фиксированной паузы.
+        step - тип шага для замера задержки (по умолчанию - текст сообщения).
+        waiter - заранее зарегистрированное ожидание, если вызывающему нужна
+        задержка ответа (waiter.latency); при ошибке отправки оно снимается,
+        поэтому повтор шага регистрирует новое
+        """
+        if waiter is None:
+            waiter = self.arm(contains=contains, regex=regex, cooldown=cooldown)
+        self.mark_sent(waiter)
+        try:
+            await self.client.send_message(self.entity, message)
+        except Exception:
+            self.disarm(waiter)
+            raise
+        get_round_trip_counter().count(self.name, "sent", step or message)
+        return await self.wait(waiter, timeout, step=step or message)
+
+    def close(self):
+        """
+        Снимает обработчик и отменяет все ожидания
+        """
+        self.client.remove_event_handler(self._on_message)
+        self.client.remove_event_handler(self._on_edit)
+        for waiter in list(self.waiters):
+            self.disarm(waiter)
+
+
+def get_router(client, entity):
+    """
+    Возвращает маршрутизатор клиента для entity (создаёт при первом обращении)
+    """
+    routers = getattr(client, "_response_routers", None)
+    if routers is None:
+        routers = {}
+        client._response_routers = routers
+
+    key = getattr(entity, "id", entity)
+    router = routers.get(key)
+    if router is None:
+        router = ResponseRouter(client, entity)
+        routers[key] = router
+    return router
+
+
+def close_routers(client):
+    """
+    Закрывает все маршрутизаторы клиента (перед отключением)
+    """
+    routers = getattr(client, "_response_routers", None) or {}
+    for router in routers.values():
+        router.close()
+    routers.clear()
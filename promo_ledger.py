@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Promo Ledger - Журнал активированных промокодов по аккаунтам
+Для каждого промо (ссылка или команда /promo) хранится исход по аккаунтам.
+Повторный запуск того же промо пропускает аккаунты с окончательным исходом
+и отправляет его только тем, где был таймаут или ошибка.
+
+Журнал: accounts/promo.json
+    {"/promo CODE": {"account_1": {"outcome": "activated", "reply": "...", "at": "2025-01-01T22:05:00+00:00"}}}
+"""
+
+import os
+from datetime import datetime, timezone
+
+from async_writer import JsonState
+from session_names import account_name
+
+PROMO_PATH = os.path.join("accounts", "promo.json")
+
+# Исход -> подпись для отчёта
+OUTCOMES = {
+    "activated": "✅ Активировано",
+    "already_used": "♻️ Уже активировано ранее",
+    "invalid": "🚫 Недействительный код",
+    "unclear": "⚠️ Неясный ответ",
+    "timeout": "⏰ Нет ответа",
+    "error": "❌ Ошибка",
+}
+# Бот ответил однозначно - повторять промо для аккаунта бессмысленно.
+# Неясный ответ не окончательный: промо отправится снова при следующем запуске
+FINAL_OUTCOMES = frozenset({"activated", "already_used", "invalid"})
+
+# Фразы ответа в нижнем регистре; проверяются по порядку: сначала точные
+# ("уже активирован" - не успех), широкие "уже"/"ранее" - последними,
+# чтобы не перехватить, например, "не найден ... уже"
+REPLY_PHRASES = (
+    ("already_used", ("уже активирова", "уже использова", "уже получ", "активирован ранее", "использован ранее")),
+    ("invalid", ("не найден", "недействител", "неверн", "истек", "истёк", "не существует", "закончил")),
+    ("activated", ("активирован", "получен", "успешно", "активация")),
+    ("already_used", ("уже", "использован", "ранее")),
+)
+
+
+def classify_reply(text):
+    """
+    Исход активации по ответу бота: activated / already_used / invalid / unclear
+    """
+    lowered = (text or "").lower()
+    for outcome, phrases in REPLY_PHRASES:
+        if any(phrase in lowered for phrase in phrases):
+            return outcome
+    return "unclear"
+
+
+class PromoLedger(JsonState):
+    """
+    Исходы промо по аккаунтам
+    """
+
+    label = "журнал промо"
+
+    def __init__(self, path=PROMO_PATH):
+        super().__init__(path)
+
+    def outcome(self, promo, session_name):
+        entry = self._load().get(promo, {}).get(account_name(session_name))
+        return entry["outcome"] if entry else None
+
+    def is_done(self, promo, session_name):
+        """
+        True, если промо уже дало аккаунту окончательный ответ
+        """
+        return self.outcome(promo, session_name) in FINAL_OUTCOMES
+
+    def record(self, promo, session_name, outcome, reply=""):
+        self._load().setdefault(promo, {})[account_name(session_name)] = {
+            "outcome": outcome,
+            "reply": (reply or "")[:200],
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+
+
+_shared_ledger = None
+
+
+def get_promo_ledger():
+    """
+    Возвращает общий для процесса журнал промо
+    """
+    global _shared_ledger
+    if _shared_ledger is None:
+        _shared_ledger = PromoLedger()
+    return _shared_ledger
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rare Card Index - Индекс редких карт из rare_cards_filter.json
+Файл читается один раз в словарь по нормализованному названию и
+перечитывается только при изменении mtime
+"""
+
+import json
+import os
+import threading
+import time
+
+RARE_CARDS_FILTER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rare_cards_filter.json")
+
+# Как часто (сек) проверять mtime файла; между проверками поиск не трогает диск
+CHECK_INTERVAL = 5.0
+
+
+def normalize_card_name(name):
+    """
+    Нормализует название карты для поиска: пробелы и регистр не важны
+    """
+    return " ".join((name or "").split()).casefold()
+
+
+class RareCardIndex:
+    """
+    Словарь {нормализованное название: (категория, рейтинг)}.
+    Один экземпляр разделяется всеми задачами аккаунтов: поиск только
+    читает текущий словарь, перезагрузка подменяет его целиком под блокировкой.
+    """
+
+    def __init__(self, path=RARE_CARDS_FILTER_PATH, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index = {}
+        self._mtime = None
+        self._next_check = 0.0
+        self.reload_if_changed(force=True)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _read_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        """
+        Читает файл и строит новый словарь. При ошибке возвращает None
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            print(f"⚠️ Файл {os.path.basename(self.path)} не найден, фильтрация по названию отключена")
+            return {}
+        except Exception as e:
+            print(f"❌ Ошибка загрузки {os.path.basename(self.path)}: {e}")
+            return None
+
+        index = {}
+        for category, cards in data.get("cards", {}).items():
+            for card in cards:
+                key = normalize_card_name(card.get("name", ""))
+                if key:
+                    # Как и раньше, при повторе побеждает первая категория в файле
+                    index.setdefault(key, (category, card.get("strength", None)))
+        return index
+
+    def reload_if_changed(self, force=False):
+        """
+        Перечитывает файл, если изменился его mtime
+        """
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            mtime = self._read_mtime()
+            if not force and mtime == self._mtime:
+                return False
+            index = self._load()
+            if index is None:
+                # Битый файл (например, в процессе записи) - оставляем старый индекс
+                return False
+            self._index = index
+            self._mtime = mtime
+            return True
+
+    def lookup(self, card_name):
+        """
+        Возвращает (категория, рейтинг) или (None, None)
+        """
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._index.get(normalize_card_name(card_name), (None, None))
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def get_rare_card_index():
+    """
+    Возвращает общий для процесса индекс редких карт
+    """
+    global _shared_index
+    if _shared_index is None:
+        with _shared_lock:
+            if _shared_index is None:
+                _shared_index = RareCardIndex()
+    return _shared_index
+
+
+def is_rare_card_by_name(card_name):
+    """
+    Проверяет, является ли карта редкой по названию из списка фильтрации
+    Возвращает кортеж (категория, рейтинг) или (None, None)
+    """
+    return get_rare_card_index().lookup(card_name)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate Limiter - Ограничение частоты действий (token bucket)
+Каждая отправка/клик проходит через корзину аккаунта и общую корзину всех
+аккаунтов. FloodWaitError ставит на паузу только затронутый аккаунт ровно
+на e.seconds, после чего шаг повторяется.
+"""
+
+import asyncio
+import os
+import time
+
+from telethon.errors import FloodWaitError
+
+from session_names import account_name
+
+# Минимальный интервал между действиями одного аккаунта (мс)
+ACCOUNT_INTERVAL_MS = int(os.getenv("ACTION_INTERVAL", os.getenv("MESSAGE_TIMEOUT", "700")))
+# Общий лимит действий всех аккаунтов в секунду и размер всплеска
+GLOBAL_RATE = float(os.getenv("GLOBAL_ACTIONS_PER_SECOND", "10"))
+GLOBAL_BURST = int(os.getenv("GLOBAL_ACTIONS_BURST", "10"))
+# Сколько раз повторять шаг после FloodWaitError
+FLOOD_RETRIES = int(os.getenv("FLOOD_RETRIES", "3"))
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate токенов в секунду, не больше capacity.
+    rate <= 0 - без ограничения
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def block(self, seconds):
+        """
+        Запрещает выдачу токенов на seconds секунд (FloodWait)
+        """
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self._refill(now)
+        self.tokens = 0.0
+
+    async def acquire(self):
+        """
+        Забирает один токен. Возвращает, сколько секунд пришлось ждать
+        """
+        if self.rate <= 0 and self.blocked_until <= time.monotonic():
+            return 0.0
+
+        waited = 0.0
+        # Блокировка сохраняет порядок ожидающих (FIFO)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self.blocked_until - now
+                if delay <= 0:
+                    if self.rate <= 0 or self.tokens >= 1:
+                        if self.rate > 0:
+                            self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class RateLimiter:
+    """
+    Корзина на каждый аккаунт + общая корзина.
+    Ведёт статистику ожидания по аккаунтам для настройки пропускной способности
+    """
+
+    def __init__(self, account_interval=ACCOUNT_INTERVAL_MS / 1000.0, global_rate=GLOBAL_RATE,
+                 global_burst=GLOBAL_BURST, flood_retries=FLOOD_RETRIES):
+        self.account_rate = 1.0 / account_interval if account_interval > 0 else 0
+        self.flood_retries = flood_retries
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.buckets = {}
+        self.stats = {}
+
+    def _bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.account_rate, 1)
+            self.buckets[key] = bucket
+        return bucket
+
+    def _stats(self, key):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = {"actions": 0, "waited": 0.0, "flood_waits": 0, "flood_waited": 0.0}
+            self.stats[key] = stats
+        return stats
+
+    async def acquire(self, account):
+        """
+        Ждёт разрешения на одно действие аккаунта. Возвращает время ожидания
+        """
+        key = account_name(account)
+        waited = await self._bucket(key).acquire()
+        waited += await self.global_bucket.acquire()
+        stats = self._stats(key)
+        stats["actions"] += 1
+        stats["waited"] += waited
+        return waited
+
+    def flood_wait(self, account, seconds):
+        """
+        Ставит аккаунт на паузу ровно на seconds (остальные аккаунты работают)
+        """
+        key = account_name(account)
+        self._bucket(key).block(seconds)
+        stats = self._stats(key)
+        stats["flood_waits"] += 1
+        stats["flood_waited"] += seconds
+
+    async def run(self, account, fn, *args, **kwargs):
+        """
+        Выполняет действие fn(*args, **kwargs) через лимитер.
+        При FloodWaitError ждёт e.seconds и повторяет шаг
+        """
+        attempt = 0
+        while True:
+            await self.acquire(account)
+            try:
+                return await fn(*args, **kwargs)
+            except FloodWaitError as e:
+                attempt += 1
+                if attempt > self.flood_retries:
+                    raise
+                print(f"⏰ [{account}] FloodWait: пауза {e.seconds} сек., повтор шага ({attempt}/{self.flood_retries})")
+                self.flood_wait(account, e.seconds)
+
+    def report(self):
+        """
+        Печатает время ожидания лимитера по аккаунтам
+        """
+        if not self.stats:
+            return
+        print("📊 Ожидание лимитера по аккаунтам:")
+        for key, stats in sorted(self.stats.items()):
+            avg = stats["waited"] / stats["actions"] if stats["actions"] else 0.0
+            line = (f"  {key}: действий {stats['actions']}, ожидание {stats['waited']:.1f} с "
+                    f"(в среднем {avg * 1000:.0f} мс)")
+            if stats["flood_waits"]:
+                line += f", FloodWait {stats['flood_waits']} раз ({stats['flood_waited']:.0f} с)"
+            print(line)
+
+    def reset_stats(self):
+        self.stats.clear()
+
+
+_shared_limiter = None
+
+
+def get_rate_limiter():
+    """
+    Возвращает общий для процесса лимитер
+    """
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = RateLimiter()
+    return _shared_limiter
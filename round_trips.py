@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Round Trips - Учёт обращений к боту по сценариям
+Каждая отправка, клик, ожидание ответа, таймаут и запасной iter_messages
+считаются по (аккаунт, сценарий, шаг). Для сценариев задаётся бюджет
+действий (отправки + клики) на один прогон; бенчмарк может упасть,
+если прогон сценария вышел за бюджет.
+"""
+
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from session_names import account_name
+
+ROUND_TRIP_KINDS = ("sent", "clicked", "waited", "timeouts", "history_fetches")
+# Действия, которые уходят боту (и тратят лимит Telegram)
+ACTION_KINDS = ("sent", "clicked")
+
+# Бюджет действий на один прогон сценария для одного аккаунта.
+# Переопределение: ROUND_TRIP_BUDGETS="daily=24,filter=10"
+DEFAULT_BUDGETS = {
+    "daily": 24,
+    "cards": 4,
+    "attempt": 1,
+    "filter": 10,
+}
+
+# Сценарий, в котором выполняется текущая задача (у каждого аккаунта своя)
+_current_run = ContextVar("round_trip_run", default=None)
+
+
+def parse_budgets(value):
+    """
+    "daily=24,filter=10" -> {"daily": 24, "filter": 10}
+    """
+    budgets = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        name, limit = item.split("=", 1)
+        budgets[name.strip()] = int(limit)
+    return budgets
+
+
+class RoundTripBudgetError(AssertionError):
+    """
+    Прогон сценария вышел за бюджет действий
+    """
+
+
+class RoundTripCounter:
+    """
+    Счётчики по (аккаунт, сценарий, шаг) и действия каждого прогона сценария.
+    Вложенный сценарий (например, фильтр внутри цикла карт) считается отдельно
+    и не входит в действия внешнего
+    """
+
+    def __init__(self, budgets=None):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(parse_budgets(os.getenv("ROUND_TRIP_BUDGETS")))
+        if budgets:
+            self.budgets.update(budgets)
+        self.counts = {}
+        self.runs = {}
+
+    @contextmanager
+    def scenario(self, account, name):
+        """
+        Всё, что выполняется внутри блока, относится к сценарию name
+        """
+        run = {"account": account_name(account), "scenario": name, "actions": 0}
+        token = _current_run.set(run)
+        try:
+            yield run
+        finally:
+            _current_run.reset(token)
+            self.runs.setdefault((run["account"], name), []).append(run["actions"])
+
+    def count(self, account, kind, step=None):
+        """
+        Увеличивает счётчик kind (sent/clicked/waited/timeouts/history_fetches)
+        """
+        run = _current_run.get()
+        scenario = run["scenario"] if run else "other"
+        key = (account_name(account), scenario, step)
+        counts = self.counts.get(key)
+        if counts is None:
+            counts = dict.fromkeys(ROUND_TRIP_KINDS, 0)
+            self.counts[key] = counts
+        counts[kind] += 1
+        if run and kind in ACTION_KINDS:
+            run["actions"] += 1
+
+    def run_count(self, account, scenario):
+        """
+        Сколько прогонов сценария было у аккаунта (например, круток - "attempt")
+        """
+        return len(self.runs.get((account_name(account), scenario), []))
+
+    def summary(self):
+        """
+        {сценарий: {"runs", "accounts", счётчики..., "avg_actions", "max_actions", "budget"}}
+        """
+        result = {}
+        for (_, scenario, _), counts in self.counts.items():
+            stats = result.setdefault(scenario, dict.fromkeys(ROUND_TRIP_KINDS, 0))
+            for kind, value in counts.items():
+                stats[kind] += value
+
+        for (account, scenario), runs in self.runs.items():
+            stats = result.setdefault(scenario, dict.fromkeys(ROUND_TRIP_KINDS, 0))
+            stats.setdefault("accounts", set()).add(account)
+            stats["runs"] = stats.get("runs", 0) + len(runs)
+            stats["max_actions"] = max(stats.get("max_actions", 0), max(runs))
+
+        for scenario, stats in result.items():
+            accounts = stats.pop("accounts", set())
+            stats["accounts"] = len(accounts)
+            stats.setdefault("runs", 0)
+            stats.setdefault("max_actions", 0)
+            actions = sum(stats[kind] for kind in ACTION_KINDS)
+            stats["avg_actions"] = round(actions / stats["runs"], 2) if stats["runs"] else None
+            stats["budget"] = self.budgets.get(scenario)
+        return result
+
+    def step_summary(self, scenario=None):
+        """
+        {(сценарий, шаг): счётчики} по всем аккаунтам
+        """
+        result = {}
+        for (_, name, step), counts in self.counts.items():
+            if scenario and name != scenario:
+                continue
+            stats = result.setdefault((name, step), dict.fromkeys(ROUND_TRIP_KINDS, 0))
+            for kind, value in counts.items():
+                stats[kind] += value
+        return result
+
+    def violations(self):
+        """
+        Прогоны, вышедшие за бюджет: [(аккаунт, сценарий, действий, бюджет)]
+        """
+        result = []
+        for (account, scenario), runs in sorted(self.runs.items()):
+            budget = self.budgets.get(scenario)
+            if budget is None:
+                continue
+            worst = max(runs)
+            if worst > budget:
+                result.append((account, scenario, worst, budget))
+        return result
+
+    def assert_budgets(self):
+        """
+        Режим проверки: бросает RoundTripBudgetError, если какой-то прогон вышел за бюджет
+        """
+        violations = self.violations()
+        if violations:
+            details = "; ".join(f"{account}/{scenario}: {actions} > {budget}"
+                                for account, scenario, actions, budget in violations)
+            raise RoundTripBudgetError(f"Превышен бюджет действий: {details}")
+
+    def report(self):
+        """
+        Печатает обращения к боту по сценариям
+        """
+        summary = self.summary()
+        if not summary:
+            return
+        print("📊 Обращения к боту по сценариям:")
+        for scenario, stats in sorted(summary.items()):
+            line = (f"  {scenario}: прогонов {stats['runs']}, отправок {stats['sent']}, кликов {stats['clicked']}, "
+                    f"ожиданий {stats['waited']}, таймаутов {stats['timeouts']}, iter_messages {stats['history_fetches']}")
+            if stats["avg_actions"] is not None:
+                line += f", действий за прогон {stats['avg_actions']} (макс. {stats['max_actions']}"
+                line += f" из {stats['budget']})" if stats["budget"] is not None else ")"
+            print(line)
+        for account, scenario, actions, budget in self.violations():
+            print(f"⚠️ [{account}] Сценарий {scenario}: {actions} действий при бюджете {budget}")
+
+    def reset(self):
+        self.counts.clear()
+        self.runs.clear()
+
+
+_shared_counter = None
+
+
+def get_round_trip_counter():
+    """
+    Возвращает общий для процесса счётчик обращений
+    """
+    global _shared_counter
+    if _shared_counter is None:
+        _shared_counter = RoundTripCounter()
+    return _shared_counter
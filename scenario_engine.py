@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scenario Engine - Сценарии как граф шагов
+Шаги: Send (команда и ответ), Notify (команда без ответа), Open (экран из кэша
+или командой), Click (кнопка по подписи), Expect (новое сообщение), Back ("Назад"),
+Branch (развилка), Mark/Stop (журнал наград и выход из раздела), Call (своя логика),
+Group (раздел сценария).
+
+Движок в одном месте: темп и повторы навигации после таймаута, время шагов,
+пропуск наград, уже полученных в этом периоде (claim_ledger), учёт обращений
+(round_trips) и отметки пройденных разделов для чекпоинтов.
+"""
+
+import abc
+import asyncio
+import os
+import random
+import time
+
+from bot_actions import (
+    click_button_and_wait,
+    open_screen,
+    send_and_wait,
+    send_limited,
+    send_message_and_wait,
+    wait_new_from,
+)
+from message_router import get_router
+from round_trips import get_round_trip_counter
+
+# Сколько раз повторять навигационную команду без ответа
+SCENARIO_RETRIES = int(os.getenv("SCENARIO_RETRIES", "1"))
+
+BACK_BUTTON = "Назад 🔙"
+
+
+class StepFailed(Exception):
+    """
+    Шаг не дал ожидаемого результата (нет ответа, нет кнопки)
+    """
+
+
+class StopGroup(Exception):
+    """
+    Досрочный выход из раздела без ошибки
+    """
+
+
+class ScenarioContext:
+    """
+    Состояние прогона сценария для одного аккаунта: текущее сообщение,
+    значения между шагами, журнал наград, чекпоинт и слот concurrency
+    (turn - work_slots.SlotTurn, его можно отдать между порциями работы)
+    """
+
+    def __init__(self, client, entity, ledger=None, checkpoint=None, turn=None):
+        self.client = client
+        self.entity = entity
+        self.session = client.session.filename
+        self.ledger = ledger
+        self.checkpoint = checkpoint
+        self.turn = turn
+        self.pending = ledger.pending(self.session) if ledger else None
+        self.msg = None
+        self.values = {}
+
+    def log(self, emoji, text):
+        print(f"{emoji} [{self.session}] {text}")
+
+    def is_pending(self, *rewards):
+        """
+        True, если хотя бы одна из наград ещё не получена в этом периоде
+        """
+        return self.pending is None or any(reward in self.pending for reward in rewards)
+
+    def mark(self, reward):
+        if self.ledger is not None:
+            self.ledger.mark(self.session, reward)
+        if self.pending is not None:
+            self.pending.discard(reward)
+
+    def text(self):
+        return (self.msg.raw_text or "") if self.msg else ""
+
+    def button_texts(self):
+        if not self.msg or not self.msg.buttons:
+            return []
+        return [b.text for row in self.msg.buttons for b in row]
+
+
+class Step(abc.ABC):
+    """
+    Базовый шаг. reward - награда из журнала: шаг пропускается, если она уже
+    получена, и отмечается после успеха. when(ctx) - условие выполнения.
+    optional - ошибка шага не прерывает раздел
+    """
+
+    emoji = "▶️"
+    retries = 0
+
+    def __init__(self, title=None, reward=None, when=None, optional=False, emoji=None):
+        self.title = title
+        self.reward = reward
+        self.when = when
+        self.optional = optional
+        if emoji:
+            self.emoji = emoji
+
+    def skip_reason(self, ctx):
+        if self.reward and not ctx.is_pending(self.reward):
+            return "уже получено в этом периоде"
+        if self.when is not None and not self.when(ctx):
+            return "не требуется"
+        return None
+
+    @abc.abstractmethod
+    async def run(self, ctx):
+        """
+        Выполняет шаг; False - необязательная часть шага не удалась
+        """
+
+
+class Send(Step):
+    """
+    Отправляет команду и ждёт ответ; ответ становится текущим сообщением.
+    Ожидание регистрируется до отправки. contains/regex - ответом считается
+    только подходящее сообщение. fallback - после таймаута взять последнее
+    сообщение чата; без него таймаут - ошибка шага. retries - повторы команды
+    """
+
+    retries = SCENARIO_RETRIES
+
+    def __init__(self, text, timeout=None, contains=None, regex=None, fallback=True, retries=None, **kwargs):
+        kwargs.setdefault("title", f"Отправляем '{text}'")
+        super().__init__(**kwargs)
+        self.message = text
+        self.timeout = timeout
+        self.contains = contains
+        self.regex = regex
+        self.fallback = fallback
+        if retries is not None:
+            self.retries = retries
+
+    async def run(self, ctx):
+        message = self.message(ctx) if callable(self.message) else self.message
+        if self.fallback:
+            reply = await send_message_and_wait(ctx.client, ctx.entity, message, timeout=self.timeout,
+                                                contains=self.contains, regex=self.regex)
+        else:
+            try:
+                reply = await send_and_wait(ctx.client, ctx.entity, message, timeout=self.timeout,
+                                            contains=self.contains, regex=self.regex)
+            except asyncio.TimeoutError:
+                reply = None
+        if not reply:
+            raise StepFailed(f"нет ответа на '{message}'")
+        ctx.msg = reply
+
+
+class Notify(Step):
+    """
+    Отправляет команду, не дожидаясь ответа
+    """
+
+    def __init__(self, text, **kwargs):
+        kwargs.setdefault("title", f"Отправляем '{text}'")
+        super().__init__(**kwargs)
+        self.message = text
+
+    async def run(self, ctx):
+        message = self.message(ctx) if callable(self.message) else self.message
+        await send_limited(ctx.client, ctx.entity, message)
+
+
+class Open(Send):
+    """
+    Экран с инлайн-кнопками: сохранённое сообщение (screen_cache) или команда
+    """
+
+    async def run(self, ctx):
+        reply = await open_screen(ctx.client, ctx.entity, self.message)
+        if not reply:
+            raise StepFailed(f"нет ответа на '{self.message}'")
+        ctx.msg = reply
+
+
+class Click(Step):
+    """
+    Нажимает кнопку текущего сообщения.
+    match - точная подпись или кортеж подстрок (первая кнопка, где есть любая из них).
+    keep - ответ не заменяет текущее сообщение (награда приходит отдельным сообщением).
+    then_expect - после ответа дождаться нового сообщения с этим текстом
+    (ожидание ставится в очередь вместе с ожиданием ответа, до клика)
+    """
+
+    def __init__(self, match, keep=False, then_expect=None, **kwargs):
+        kwargs.setdefault("title", f"Нажимаем '{match if isinstance(match, str) else match[0]}'")
+        super().__init__(**kwargs)
+        self.match = match
+        self.keep = keep
+        self.then_expect = then_expect
+
+    def find(self, ctx):
+        texts = ctx.button_texts()
+        if isinstance(self.match, str):
+            wanted = self.match.lower()
+            return next((t for t in texts if (t or "").lower() == wanted), None)
+        return next((t for t in texts if any(part in t for part in self.match)), None)
+
+    async def run(self, ctx):
+        button = self.find(ctx)
+        if not button:
+            raise StepFailed(f"кнопка не найдена, доступны: {ctx.button_texts()}")
+        if not self.then_expect:
+            reply = await click_button_and_wait(ctx.client, ctx.entity, ctx.msg, button_text=button)
+            if not reply:
+                raise StepFailed(f"нет ответа на '{button}'")
+            if not self.keep:
+                ctx.msg = reply
+            return
+
+        # Следующее сообщение может прийти сразу за ответом на клик
+        router = get_router(ctx.client, ctx.entity)
+        waiter = router.arm(edit_of=getattr(ctx.msg, "id", None))
+        follow = router.arm(contains=self.then_expect)
+        try:
+            reply = await click_button_and_wait(ctx.client, ctx.entity, ctx.msg, button_text=button, waiter=waiter)
+            if not reply:
+                raise StepFailed(f"нет ответа на '{button}'")
+        except BaseException:
+            router.disarm(follow)
+            raise
+        if not self.keep:
+            ctx.msg = reply
+        try:
+            ctx.msg = await router.wait(follow, step=f"wait:{self.then_expect}")
+        except asyncio.TimeoutError:
+            ctx.log("⚠️", f"Не дождались '{self.then_expect}', продолжаем с текущим сообщением")
+
+
+class Back(Click):
+    """
+    Возврат в предыдущее меню
+    """
+
+    emoji = "🔙"
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("title", "Нажимаем 'Назад'")
+        super().__init__(BACK_BUTTON, **kwargs)
+
+
+class Expect(Step):
+    """
+    Ждёт новое сообщение бота (contains - подстрока) и делает его текущим
+    """
+
+    def __init__(self, contains=None, timeout=None, **kwargs):
+        kwargs.setdefault("title", f"Ждём '{contains or 'ответ'}'")
+        super().__init__(**kwargs)
+        self.contains = contains
+        self.timeout = timeout
+
+    async def run(self, ctx):
+        try:
+            ctx.msg = await wait_new_from(ctx.client, ctx.entity, timeout=self.timeout, contains=self.contains)
+        except asyncio.TimeoutError:
+            raise StepFailed(f"не дождались '{self.contains or 'ответ'}'")
+
+
+class Call(Step):
+    """
+    Своя логика шага: await fn(ctx)
+    """
+
+    def __init__(self, fn, **kwargs):
+        kwargs.setdefault("title", fn.__name__)
+        super().__init__(**kwargs)
+        self.fn = fn
+
+    async def run(self, ctx):
+        await self.fn(ctx)
+
+
+class Mark(Step):
+    """
+    Отмечает награду в журнале (например, "no_clan")
+    """
+
+    def __init__(self, reward_name, **kwargs):
+        kwargs.setdefault("title", f"Отмечаем '{reward_name}'")
+        super().__init__(**kwargs)
+        self.reward_name = reward_name
+
+    async def run(self, ctx):
+        ctx.mark(self.reward_name)
+
+
+class Stop(Step):
+    """
+    Завершает раздел без ошибки
+    """
+
+    async def run(self, ctx):
+        if self.title:
+            ctx.log("ℹ️", self.title)
+        raise StopGroup()
+
+
+class Branch(Step):
+    """
+    Развилка: condition(ctx) -> шаги then, иначе шаги otherwise
+    """
+
+    def __init__(self, condition, then=(), otherwise=(), **kwargs):
+        super().__init__(**kwargs)
+        self.condition = condition
+        self.then = list(then)
+        self.otherwise = list(otherwise)
+
+    async def run(self, ctx):
+        steps = self.then if self.condition(ctx) else self.otherwise
+        complete = True
+        for step in steps:
+            complete = await run_step(ctx, step) and complete
+        return complete
+
+
+class Group(Step):
+    """
+    Раздел сценария. Ошибка шага прерывает только раздел (required - весь сценарий).
+    Пройденный раздел отмечается в журнале (reward) и в чекпоинте
+    """
+
+    emoji = "📂"
+
+    def __init__(self, title, steps, required=False, **kwargs):
+        super().__init__(title=title, **kwargs)
+        self.steps = list(steps)
+        self.required = required
+
+    async def run(self, ctx):
+        return await run_group(ctx, self)
+
+
+class Scenario:
+    """
+    Именованный список шагов и разделов
+    """
+
+    def __init__(self, name, steps, start_delay=(0.1, 0.3)):
+        self.name = name
+        self.steps = list(steps)
+        self.start_delay = start_delay
+
+
+class StepStats:
+    """
+    Время и исходы шагов по (сценарий, шаг) за прогон
+    """
+
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, scenario, title, seconds=0.0, outcome="ok"):
+        stats = self.stats.get((scenario, title))
+        if stats is None:
+            stats = {"ok": 0, "failed": 0, "skipped": 0, "seconds": 0.0}
+            self.stats[(scenario, title)] = stats
+        stats[outcome] += 1
+        stats["seconds"] += seconds
+
+    def report(self):
+        if not self.stats:
+            return
+        print("📊 Шаги сценариев:")
+        for (scenario, title), stats in sorted(self.stats.items(), key=lambda item: -item[1]["seconds"]):
+            runs = stats["ok"] + stats["failed"]
+            avg = stats["seconds"] / runs if runs else 0.0
+            print(f"  {scenario} / {title}: выполнено {stats['ok']}, ошибок {stats['failed']}, "
+                  f"пропущено {stats['skipped']}, в среднем {avg * 1000:.0f} мс")
+
+    def reset(self):
+        self.stats.clear()
+
+
+_shared_stats = StepStats()
+
+
+def get_step_stats():
+    """
+    Возвращает общую для процесса статистику шагов
+    """
+    return _shared_stats
+
+
+async def run_step(ctx, step):
+    """
+    Выполняет шаг: пропуск, повторы навигации, время, отметка награды.
+    Возвращает False, если необязательный шаг не удался
+    """
+    scenario = ctx.values.get("scenario", "")
+    reason = step.skip_reason(ctx)
+    if reason:
+        if step.title:
+            ctx.log("⏭️", f"{step.title}: {reason}")
+        _shared_stats.record(scenario, step.title or type(step).__name__, outcome="skipped")
+        return True
+
+    if isinstance(step, Group):
+        return await run_group(ctx, step)
+
+    if step.title and not isinstance(step, (Branch, Stop)):
+        ctx.log(step.emoji, f"{step.title}...")
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            complete = await step.run(ctx) is not False
+            break
+        except StepFailed:
+            attempt += 1
+            if attempt > step.retries:
+                _shared_stats.record(scenario, step.title or type(step).__name__, time.monotonic() - started, "failed")
+                if step.optional:
+                    return False
+                raise
+            ctx.log("🔁", f"{step.title}: повтор ({attempt}/{step.retries})")
+    _shared_stats.record(scenario, step.title or type(step).__name__, time.monotonic() - started)
+    if step.reward and complete:
+        ctx.mark(step.reward)
+    return complete
+
+
+async def run_group(ctx, group):
+    """
+    Выполняет раздел. Возвращает True, если раздел пройден полностью
+    """
+    scenario = ctx.values.get("scenario", "")
+    key = f"{scenario}:{group.title}"
+    if ctx.checkpoint is not None and ctx.checkpoint.is_done(key):
+        ctx.log("⏭️", f"{group.title}: уже пройдено до перезапуска")
+        return True
+
+    ctx.log(group.emoji, group.title)
+    # Раздел с неудавшимся необязательным шагом не отмечается в чекпоинте
+    complete = True
+    try:
+        for step in group.steps:
+            complete = await run_step(ctx, step) and complete
+    except StopGroup:
+        pass
+    except (StepFailed, asyncio.TimeoutError) as e:
+        if group.required:
+            raise
+        ctx.log("⚠️", f"{group.title}: {e or 'таймаут'}")
+        ctx.values.setdefault("failed_groups", []).append(group.title)
+        return False
+    except Exception as e:
+        if group.required:
+            raise
+        ctx.log("⚠️", f"Ошибка в разделе '{group.title}': {e}")
+        ctx.values.setdefault("failed_groups", []).append(group.title)
+        return False
+
+    if not complete:
+        # Награда раздела не отмечается: следующий прогон попробует снова
+        ctx.values.setdefault("failed_groups", []).append(group.title)
+        return False
+    if group.reward:
+        ctx.mark(group.reward)
+    if ctx.checkpoint is not None:
+        ctx.checkpoint.mark_done(key)
+    return True
+
+
+async def run_scenario(ctx, scenario):
+    """
+    Выполняет сценарий для одного аккаунта. Возвращает True, только если
+    все шаги и разделы пройдены полностью; непройденные разделы - в
+    ctx.values["failed_groups"]
+    """
+    ctx.values["scenario"] = scenario.name
+    ctx.values["failed_groups"] = []
+    complete = True
+    if scenario.start_delay:
+        # Небольшой разброс старта между аккаунтами
+        await asyncio.sleep(random.uniform(*scenario.start_delay))
+
+    with get_round_trip_counter().scenario(ctx.session, scenario.name):
+        try:
+            for step in scenario.steps:
+                complete = await run_step(ctx, step) and complete
+        except StopGroup:
+            pass
+        except (StepFailed, asyncio.TimeoutError) as e:
+            ctx.log("⚠️", f"Сценарий '{scenario.name}' остановлен: {e or 'таймаут'}")
+            return False
+    if ctx.values["failed_groups"]:
+        ctx.log("⚠️", f"Сценарий '{scenario.name}': не пройдены разделы {', '.join(ctx.values['failed_groups'])}")
+    return complete and not ctx.values["failed_groups"]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Screen Cache - Кэш экранов бота с инлайн-кнопками
+Для каждого экрана (главное меню, магазин, клан) хранится последнее сообщение
+и его раскладка: подписи кнопок и callback data. Пока сообщение показывает
+ту же раскладку, цикл нажимает кнопки прямо в нём, не запрашивая экран заново.
+Редактирования сообщения отслеживаются: другая раскладка - запись недействительна.
+"""
+
+import os
+import time
+
+# Сколько хранить сообщение экрана (сек); 0 - кэш выключен
+SCREEN_CACHE_TTL = int(os.getenv("SCREEN_CACHE_TTL", str(26 * 3600)))
+
+
+def button_layout(message):
+    """
+    Раскладка инлайн-кнопок: ((подпись, callback data), ...) по рядам
+    """
+    rows = getattr(message, "buttons", None) or []
+    return tuple(
+        tuple((button.text, getattr(button, "data", None)) for button in row)
+        for row in rows
+    )
+
+
+class ScreenEntry:
+    """
+    Сообщение экрана, раскладка при запоминании и текущая раскладка
+    """
+
+    def __init__(self, message, layout):
+        self.message = message
+        self.layout = layout
+        self.current = layout
+        self.seen_at = time.monotonic()
+
+
+class ScreenCache:
+    """
+    Экраны одного клиента: {экран: ScreenEntry}
+    """
+
+    def __init__(self, ttl=SCREEN_CACHE_TTL):
+        self.ttl = ttl
+        self._screens = {}
+        self.hits = 0
+        self.misses = 0
+
+    def remember(self, screen, message):
+        """
+        Запоминает сообщение экрана. Возвращает False, если раскладка
+        изменилась по сравнению с прошлой (бот поменял меню)
+        """
+        layout = button_layout(message)
+        if not layout or self.ttl <= 0:
+            self._screens.pop(screen, None)
+            return True
+        previous = self._screens.get(screen)
+        self._screens[screen] = ScreenEntry(message, layout)
+        return previous is None or previous.layout == layout
+
+    def get(self, screen):
+        """
+        Сообщение экрана, если оно всё ещё показывает запомненную раскладку
+        """
+        entry = self._screens.get(screen)
+        if entry is None or entry.current != entry.layout:
+            self.misses += 1
+            return None
+        if time.monotonic() - entry.seen_at > self.ttl:
+            self._screens.pop(screen, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.message
+
+    def observe(self, message):
+        """
+        Новое или отредактированное сообщение бота. Сообщение экрана, показавшее
+        другую раскладку, недействительно; сообщение с раскладкой экрана становится
+        его последним сообщением (например, "Назад 🔙" вернул меню в другом сообщении)
+        """
+        if not self._screens:
+            return
+        layout = button_layout(message)
+        for entry in self._screens.values():
+            if layout and layout == entry.layout:
+                entry.message = message
+                entry.current = layout
+                entry.seen_at = time.monotonic()
+            elif entry.message.id == message.id:
+                entry.current = layout
+
+    def forget_message(self, message_id):
+        """
+        Сбрасывает экраны с этим сообщением (нажатие в нём не прошло)
+        """
+        for screen, entry in list(self._screens.items()):
+            if entry.message.id == message_id:
+                del self._screens[screen]
+
+    def invalidate(self, screen=None):
+        """
+        Сбрасывает экран (или все экраны)
+        """
+        if screen is None:
+            self._screens.clear()
+        else:
+            self._screens.pop(screen, None)
@@ -1,8 +1,19 @@
-import asyncio, json, os, random, re, datetime
+import asyncio, json, os, random, re, sys, datetime
 from dotenv import load_dotenv
 from telethon import TelegramClient, events
 from telethon.errors import FloodWaitError, SessionPasswordNeededError
 
+# Общие модули лежат в корне проекта
+PARENT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+from async_writer import read_json_async, write_async
+from card_store import get_card_store
+from message_classifier import classify_message, is_ignored, log_ignored
+from rare_card_index import is_rare_card_by_name
+from session_names import account_name
+
 load_dotenv()
 
 # Загружаем API ключи из .env
@@ -10,10 +21,6 @@ API_ID = int(os.getenv("API_ID"))
 API_HASH = os.getenv("API_HASH")
 MESSAGE_TIMEOUT = int(os.getenv("MESSAGE_TIMEOUT", "30"))
 
-# Создаем папку для карт если её нет
-CARDS_FOLDER = "accounts/cards"
-if not os.path.exists(CARDS_FOLDER):
-    os.makedirs(CARDS_FOLDER)
 
 # === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 
@@ -25,39 +32,23 @@ async def wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, regex=None, con
     """
     loop = asyncio.get_event_loop()
     fut = loop.create_future()
+    contains_lower = contains.lower() if contains else None
+    compiled_regex = re.compile(regex, re.I) if regex else None
     
     @client.on(events.NewMessage(from_users=entity))
     async def handler(event):
         text = event.raw_text or ""
+        lowered = text.lower()
         
-        # Игнорируем видео сообщения
-        if event.message.video:
-            print(f"🎥 [{client.session.filename}] Получено видео сообщение - игнорируем")
-            return
-            
-        # Игнорируем системные сообщения бота
-        system_messages = [
-            "Получена новая",
-            "Вам попалась повторная карта", 
-            "Следующая попытка будет доступна",
-            "повторная карта",
-            "следующая попытка",
-            "будет доступна"
-        ]
-        
-        if any(sys_msg.lower() in text.lower() for sys_msg in system_messages):
-            print(f"ℹ️ [{client.session.filename}] Системное сообщение: {text[:50]}...")
-            return
-            
-        # Игнорируем квестовые сообщения (обычно содержат "квест", "задание", "миссия")
-        quest_keywords = ["квест", "задание", "миссия", "quest", "mission"]
-        if any(keyword in text.lower() for keyword in quest_keywords):
-            print(f"📋 [{client.session.filename}] Квестовое сообщение: {text[:50]}...")
+        # Игнорируем видео, системные и квестовые сообщения
+        category = classify_message(event.message, lowered)
+        if is_ignored(category):
+            log_ignored(client.session.filename, category, text)
             return
         
         # Применяем пользовательские фильтры
-        if (contains and contains.lower() in text.lower()) or \
-           (regex and re.search(regex, text, re.I)) or \
+        if (contains and contains_lower in lowered) or \
+           (regex and compiled_regex.search(text)) or \
            (not contains and not regex):
             if not fut.done():
                 fut.set_result(event.message)
@@ -97,43 +88,6 @@ async def click_button(msg, *, text=None, regex=None, index=None, case_insensiti
 
 # === ФУНКЦИИ ДЛЯ РАБОТЫ С КАРТАМИ ===
 
-def load_rare_cards_filter():
-    """
-    Загружает список редких карт из JSON файла для фильтрации
-    """
-    try:
-        with open("rare_cards_filter.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("cards", {})
-    except FileNotFoundError:
-        print("⚠️ Файл rare_cards_filter.json не найден, фильтрация по названию отключена")
-        return {}
-    except Exception as e:
-        print(f"❌ Ошибка загрузки rare_cards_filter.json: {e}")
-        return {}
-
-def is_rare_card_by_name(card_name):
-    """
-    Проверяет, является ли карта редкой по названию из списка фильтрации
-    Возвращает кортеж (категория, рейтинг) или (None, None)
-    """
-    rare_cards = load_rare_cards_filter()
-    
-    if not rare_cards:
-        return None, None
-    
-    # Нормализуем название карты для поиска
-    normalized_name = card_name.strip()
-    
-    # Проверяем по всем категориям редкости
-    for category, cards in rare_cards.items():
-        for card in cards:
-            if card.get("name", "").strip() == normalized_name:
-                rating = card.get("strength", None)  # Берем рейтинг из поля strength
-                return category, rating
-    
-    return None, None
-
 def parse_card_response(text, card_type):
     """
     Парсит ответ бота на получение карты и извлекает информацию о редких картах
@@ -198,53 +152,26 @@ def parse_card_response(text, card_type):
     # Карта не найдена в списке редких карт
     return None
 
-def save_card_to_file(session_name, card_info):
+def save_card(session_name, card_info):
     """
-    Сохраняет информацию о редкой карте в JSON файл аккаунта
+    Сохраняет информацию о редкой карте в хранилище (SQLite)
     """
-    file_path = os.path.join(CARDS_FOLDER, f"{session_name}.json")
-    
-    # Загружаем существующие данные или создаем новые
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except:
-            data = {"epic": [], "legendary": [], "myfics": [], "adamant": []}
-    else:
-        data = {"epic": [], "legendary": [], "myfics": [], "adamant": []}
-    
-    # Определяем категорию редкости
-    rarity = card_info["rarity"]
-    category = rarity  # Теперь rarity уже содержит правильную категорию
-    
-    # Проверяем, что категория существует
-    if category not in data:
-        data[category] = []
-    
-    # Проверяем, нет ли уже такой карты
+    # Категория редкости уже определена при парсинге
+    category = card_info["rarity"]
     card_name = card_info["name"] or card_info["character"]
-    for existing_card in data[category]:
-        if existing_card.get("name") == card_name:
-            print(f"🔄 [{session_name}] Карта {card_name} уже есть в коллекции ({category})")
-            return
     
-    # Добавляем карту в соответствующую категорию (только имя, элемент, рейтинг)
+    # Сохраняем только имя, элемент и рейтинг
     card_entry = {
         "name": card_name,
-        "rating": card_info["rating"]
+        "rating": card_info["rating"],
+        "element": card_info["element"],
+        "rarity": category
     }
     
-    if card_info["element"]:
-        card_entry["element"] = card_info["element"]
-    
-    data[category].append(card_entry)
-    
-    # Сохраняем обновленные данные
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    print(f"💾 [{session_name}] Редкая карта сохранена: {card_name} ({category})")
+    if get_card_store().add_card(session_name, card_entry):
+        print(f"💾 [{session_name}] Редкая карта сохранена: {card_name} ({category})")
+    else:
+        print(f"🔄 [{session_name}] Карта {card_name} уже есть в коллекции ({category})")
 
 def send_card_notification(session_name, card_info):
     """
@@ -287,8 +214,7 @@ async def get_current_accounts():
     Загружает текущий список аккаунтов из accounts.json
     """
     try:
-        with open("accounts.json", "r", encoding="utf-8") as f:
-            cfg = json.load(f)
+        cfg = await read_json_async("accounts.json")
         return cfg.get("accounts", [])
     except FileNotFoundError:
         print("❌ Файл accounts.json не найден!")
@@ -316,7 +242,7 @@ async def use_battle_attempts(client, entity, attempts):
                     card_info = parse_card_response(reply.raw_text, "battle")
                     if card_info:
                         # Сохраняем в файл
-                        save_card_to_file(client.session.filename, card_info)
+                        await write_async(save_card, client.session.filename, card_info)
                         # Отправляем уведомление
                         send_card_notification(client.session.filename, card_info)
                     else:
@@ -355,7 +281,7 @@ async def use_collection_attempts(client, entity, attempts):
                         card_info = parse_card_response(reply.raw_text, "collection")
                         if card_info:
                             # Сохраняем в файл
-                            save_card_to_file(client.session.filename, card_info)
+                            await write_async(save_card, client.session.filename, card_info)
                             # Отправляем уведомление
                             send_card_notification(client.session.filename, card_info)
                         else:
@@ -571,7 +497,7 @@ async def run_daily_rewards(client, bot_username):
                         card_info["type"] = "collection"
                         
                         # Сохраняем в файл
-                        save_card_to_file(client.session.filename, card_info)
+                        await write_async(save_card, client.session.filename, card_info)
                         # Отправляем уведомление
                         send_card_notification(client.session.filename, card_info)
                     else:
@@ -638,7 +564,7 @@ async def get_cards(client, bot_username, card_type="both", count=1):
                             card_info = parse_card_response(reply.raw_text, current_card_type)
                             if card_info:
                                 # Сохраняем в файл
-                                save_card_to_file(client.session.filename, card_info)
+                                await write_async(save_card, client.session.filename, card_info)
                                 # Отправляем уведомление
                                 send_card_notification(client.session.filename, card_info)
                             else:
@@ -777,8 +703,7 @@ async def show_cards_statistics(selected_accounts=None):
     print("📊 Получаем статистику карт...")
     
     try:
-        with open("accounts.json", "r", encoding="utf-8") as f:
-            cfg = json.load(f)
+        cfg = await read_json_async("accounts.json")
         
         api_id = API_ID
         api_hash = API_HASH
@@ -886,47 +811,34 @@ def show_rare_cards(selected_accounts=None):
         print("\n🎴 Редкие карты по аккаунтам:")
         print("=" * 60)
         
+        # Одним запросом забираем карты всех выбранных аккаунтов
+        cards_by_account = get_card_store().cards_by_account([acc["session"] for acc in accounts])
+        
         for acc in accounts:
             session_name = acc["session"]
-            file_path = os.path.join(CARDS_FOLDER, f"{session_name}.json")
             
             print(f"\n👤 [{session_name}] ({acc.get('phone', 'N/A')})")
             
-            if not os.path.exists(file_path):
+            data = cards_by_account.get(account_name(session_name))
+            if not data:
                 print("   📝 Нет сохраненных карт")
                 continue
             
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                # Показываем карты по категориям
-                for category, cards in data.items():
-                    if not cards:
-                        continue
-                    
-                    category_name = {
-                        "legendary": "🌟 Легендарные",
-                        "mythic": "✨ Мифические", 
-                        "adamantine": "💎 Адамантиновые"
-                    }.get(category, category)
-                    
-                    print(f"   {category_name}: {len(cards)}")
-                    for card in cards:
-                        name = card.get("name", card.get("character", "Неизвестно"))
-                        print(f"      • {name}")
-                        if card.get("universe"):
-                            print(f"        🔮 {card['universe']}")
-                        if card.get("element"):
-                            print(f"        🍃 {card['element']}")
-                        if card.get("character") and card.get("name"):
-                            print(f"        👤 {card['character']}")
+            # Показываем карты по категориям
+            for category, cards in data.items():
+                category_name = {
+                    "legendary": "🌟 Легендарные",
+                    "mythic": "✨ Мифические", 
+                    "adamantine": "💎 Адамантиновые"
+                }.get(category, category)
                 
-                if not any(data.values()):
-                    print("   📝 Нет редких карт")
-                    
-            except Exception as e:
-                print(f"   ❌ Ошибка чтения файла: {e}")
+                print(f"   {category_name}: {len(cards)}")
+                for card in cards:
+                    print(f"      • {card['name']}")
+                    if card.get("universe"):
+                        print(f"        🔮 {card['universe']}")
+                    if card.get("element"):
+                        print(f"        🍃 {card['element']}")
         
     except Exception as e:
         print(f"❌ Ошибка: {e}")
@@ -1039,8 +951,7 @@ async def run_scenario_for_all_accounts(scenario_func):
     Запускает сценарий для всех аккаунтов с ограничением concurrency
     """
     try:
-        with open("accounts.json", "r", encoding="utf-8") as f:
-            cfg = json.load(f)
+        cfg = await read_json_async("accounts.json")
 
         # API ключи берем из .env файла
         api_id = API_ID
@@ -1220,8 +1131,7 @@ async def run_cards_for_selected_accounts(selected_accounts=None, card_type="bot
     Запускает получение карт для выбранных аккаунтов с указанным типом и количеством
     """
     try:
-        with open("accounts.json", "r", encoding="utf-8") as f:
-            cfg = json.load(f)
+        cfg = await read_json_async("accounts.json")
 
         # API ключи берем из .env файла
         api_id = API_ID
@@ -1273,8 +1183,7 @@ async def run_scenario_for_selected_accounts(scenario_func, selected_accounts=No
     Если selected_accounts is [] - не запускает ничего
     """
     try:
-        with open("accounts.json", "r", encoding="utf-8") as f:
-            cfg = json.load(f)
+        cfg = await read_json_async("accounts.json")
 
         # API ключи берем из .env файла
         api_id = API_ID
@@ -1356,8 +1265,7 @@ async def main():
         elif mode == "test":
             print("🧪 Тестовый режим - проверяем подключение к боту")
             try:
-                with open("accounts.json", "r", encoding="utf-8") as f:
-                    cfg = json.load(f)
+                cfg = await read_json_async("accounts.json")
                 
                 # API ключи берем из .env файла
                 api_id = API_ID
@@ -1455,8 +1363,7 @@ async def main():
                 selected_accounts = select_accounts()
                 if selected_accounts != []:  # Не отмена (None = все аккаунты, [] = отмена)
                     try:
-                        with open("accounts.json", "r", encoding="utf-8") as f:
-                            cfg = json.load(f)
+                        cfg = await read_json_async("accounts.json")
                         
                         # API ключи берем из .env файла
                         api_id = API_ID
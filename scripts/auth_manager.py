@@ -4,6 +4,13 @@ from dotenv import load_dotenv
 from telethon import TelegramClient
 from telethon import errors as te
 
+# Общие модули лежат в корне проекта
+PARENT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+from async_writer import flush_writes, get_writer
+
 load_dotenv()
 API_ID = int(os.getenv("API_ID"))
 API_HASH = os.getenv("API_HASH")
@@ -19,9 +26,13 @@ def log_err(kind, session, phone, detail=""):
         "phone": phone,
         "detail": str(detail)
     }
+    # Запись в лог уходит в фоновый поток, чтобы не блокировать цикл событий
+    get_writer().submit_nowait(append_error, rec)
+    print(f"[AUTH][{session}] {kind}: {detail}")
+
+def append_error(rec):
     with ERROR_LOG.open("a", encoding="utf-8") as f:
         f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-    print(f"[AUTH][{session}] {kind}: {detail}")
 
 def add_account_to_config(session, phone):
     """
@@ -110,8 +121,8 @@ async def auth_one(session: str, phone: str):
 
         if await client.is_user_authorized():
             print(f"[AUTH][{session}] ✅ Успех. Создан файл сессии.")
-            # Добавляем аккаунт в конфигурацию
-            add_account_to_config(session, phone)
+            # Добавляем аккаунт в конфигурацию (запись в фоновом потоке)
+            get_writer().submit_nowait(add_account_to_config, session, phone)
         else:
             log_err("AUTH_UNKNOWN", session, phone, "Авторизация не подтверждена")
 
@@ -184,5 +195,8 @@ async def main():
     for coro in tasks:
         await coro
 
+    # Дожидаемся записи логов и конфигурации
+    await flush_writes()
+
 if __name__ == "__main__":
     asyncio.run(main())
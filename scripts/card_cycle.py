@@ -1,8 +1,18 @@
-import asyncio, json, os, random, re, datetime
+import asyncio, os, random, re, sys
 from dotenv import load_dotenv
 from telethon import TelegramClient, events
 from telethon.errors import FloodWaitError, SessionPasswordNeededError
 
+# Общие модули лежат в корне проекта
+PARENT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+from async_writer import read_json_async, write_async
+from card_store import get_card_store
+from cooldown_scheduler import AccountScheduler, record_cooldown_message
+from message_classifier import MessageCategory, classify_message, is_ignored, log_ignored
+
 load_dotenv()
 
 # Загружаем API ключи из .env
@@ -12,10 +22,6 @@ MESSAGE_TIMEOUT_MS = int(os.getenv("MESSAGE_TIMEOUT", "700"))  # Миллисе
 MESSAGE_TIMEOUT = MESSAGE_TIMEOUT_MS / 1000.0  # Конвертируем в секунды (0.7 секунды)
 WAIT_TIMEOUT = 10.0  # Таймаут для ожидания ответов от бота
 
-# Создаем папку для карт если её нет
-CARDS_FOLDER = "accounts/cards"
-if not os.path.exists(CARDS_FOLDER):
-    os.makedirs(CARDS_FOLDER)
 
 # === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 
@@ -27,39 +33,26 @@ async def wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, regex=None, con
     """
     loop = asyncio.get_event_loop()
     fut = loop.create_future()
+    contains_lower = contains.lower() if contains else None
+    compiled_regex = re.compile(regex, re.I) if regex else None
     
     @client.on(events.NewMessage(from_users=entity))
     async def handler(event):
         text = event.raw_text or ""
-        
-        # Игнорируем видео сообщения
-        if event.message.video:
-            print(f"🎥 [{client.session.filename}] Получено видео сообщение - игнорируем")
-            return
-            
-        # Игнорируем системные сообщения бота
-        system_messages = [
-            "Получена новая",
-            "Вам попалась повторная карта", 
-            "Следующая попытка будет доступна",
-            "повторная карта",
-            "следующая попытка",
-            "будет доступна"
-        ]
-        
-        if any(sys_msg.lower() in text.lower() for sys_msg in system_messages):
-            print(f"ℹ️ [{client.session.filename}] Системное сообщение: {text[:50]}...")
-            return
-            
-        # Игнорируем квестовые сообщения (обычно содержат "квест", "задание", "миссия")
-        quest_keywords = ["квест", "задание", "миссия", "quest", "mission"]
-        if any(keyword in text.lower() for keyword in quest_keywords):
-            print(f"📋 [{client.session.filename}] Квестовое сообщение: {text[:50]}...")
+        lowered = text.lower()
+        
+        # Игнорируем видео, системные и квестовые сообщения
+        category = classify_message(event.message, lowered)
+        if is_ignored(category):
+            log_ignored(client.session.filename, category, text)
+            if category == MessageCategory.COOLDOWN:
+                # Кулдаун не ответ на действие, но нужен планировщику
+                record_cooldown_message(client.session.filename, text)
             return
         
         # Применяем пользовательские фильтры
-        if (contains and contains.lower() in text.lower()) or \
-           (regex and re.search(regex, text, re.I)) or \
+        if (contains and contains_lower in lowered) or \
+           (regex and compiled_regex.search(text)) or \
            (not contains and not regex):
             if not fut.done():
                 fut.set_result(event.message)
@@ -196,48 +189,20 @@ def is_rare_card(rating):
     else:
         return None
 
-def save_card_to_file(session_name, card_info):
+def save_card(session_name, card_info):
     """
-    Сохраняет редкую карту в файл
+    Сохраняет редкую карту в хранилище (SQLite)
     """
     try:
-        # Убираем .session из имени файла
-        clean_name = session_name.replace('.session', '')
-        file_path = os.path.join(CARDS_FOLDER, f"{clean_name}.json")
-        
-        # Загружаем существующие карты
-        cards = {"legendary": [], "mythic": [], "adamantine": [], "epic": []}
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                cards = json.load(f)
-        
         # Определяем редкость
         rarity = is_rare_card(card_info["rating"])
         if not rarity:
             return
         
-        # Проверяем дубликаты
-        for existing_card in cards[rarity]:
-            if existing_card["name"] == card_info["name"]:
-                print(f"🔄 [{session_name}] Карта {card_info['name']} уже есть в коллекции")
-                return
-        
-        # Добавляем новую карту
-        cards[rarity].append({
-            "name": card_info["name"],
-            "rating": card_info["rating"],
-            "universe": card_info["universe"],
-            "element": card_info["element"],
-            "type": card_info["type"],
-            "rarity": rarity,
-            "timestamp": datetime.datetime.now().isoformat()
-        })
-        
-        # Сохраняем обратно
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(cards, f, ensure_ascii=False, indent=2)
-        
-        print(f"💾 [{session_name}] Редкая карта сохранена: {card_info['name']} ({rarity})")
+        if get_card_store().add_card(session_name, dict(card_info, rarity=rarity)):
+            print(f"💾 [{session_name}] Редкая карта сохранена: {card_info['name']} ({rarity})")
+        else:
+            print(f"🔄 [{session_name}] Карта {card_info['name']} уже есть в коллекции")
         
     except Exception as e:
         print(f"❌ [{session_name}] Ошибка при сохранении карты: {e}")
@@ -296,7 +261,7 @@ async def use_attempts(client, entity, attempts, card_type):
                         rarity = is_rare_card(card_info["rating"])
                         if rarity:
                             card_info["rarity"] = rarity
-                            save_card_to_file(client.session.filename, card_info)
+                            await write_async(save_card, client.session.filename, card_info)
                             send_card_notification(client.session.filename, card_info)
                             print(f"🎉 [{client.session.filename}] Редкая карта: {card_info['name']} (Рейтинг: {card_info['rating']})")
                         else:
@@ -538,6 +503,65 @@ async def card_cycle_for_account(client, bot_username):
         print(f"📋 [{client.session.filename}] Детали ошибки: {traceback.format_exc()}")
         return 0
 
+async def run_account_card_cycle(acc, bot_username):
+    """
+    Подключает один аккаунт и запускает для него цикл карт
+    Возвращает таймаут в минутах (0 - без таймаута)
+    """
+    session_name = acc["session"]
+    phone = acc.get("phone", "Неизвестно")
+    
+    print(f"🔐 [{session_name}] Подключаемся к аккаунту {phone}...")
+    
+    client = TelegramClient(session_name, API_ID, API_HASH)
+    
+    try:
+        await client.start()
+        user = await client.get_me()
+        print(f"✅ [{session_name}] Подключен как: @{user.username} ({user.phone})")
+        
+        # Запускаем цикл карт
+        timeout = await card_cycle_for_account(client, bot_username)
+        
+        if timeout > 0:
+            print(f"⏰ [{session_name}] Следующий цикл через {timeout} минут")
+        else:
+            print(f"✅ [{session_name}] Цикл завершен без таймаута")
+        
+        return timeout
+        
+    except Exception as e:
+        print(f"❌ [{session_name}] Ошибка: {e}")
+        return 0
+    finally:
+        await client.disconnect()
+
+async def run_card_scheduler():
+    """
+    Запускает каждый аккаунт, как только закончился его кулдаун,
+    вместо ожидания максимального таймаута среди всех аккаунтов
+    """
+    config = await read_json_async("accounts.json")
+    
+    bot_username = config.get("bot", "@anicardplaybot")
+    concurrency = config.get("concurrency", 2)
+    accounts = config.get("accounts", [])
+    
+    print(f"🔐 Настроено аккаунтов: {len(accounts)}")
+    print(f"⚡ Одновременно работает: {concurrency}")
+    
+    scheduler = AccountScheduler()
+    for acc in accounts:
+        scheduler.add(acc)
+    
+    async def worker(acc):
+        timeout = await run_account_card_cycle(acc, bot_username)
+        if timeout > 0:
+            # Таймаут уже включает +1 минуту
+            scheduler.tracker.record(acc["session"], timeout * 60 - scheduler.tracker.margin)
+    
+    await scheduler.run(worker, concurrency)
+
 async def run_card_cycle():
     """
     Запускает цикл карт для всех аккаунтов
@@ -545,8 +569,7 @@ async def run_card_cycle():
     """
     try:
         # Загружаем конфигурацию аккаунтов
-        with open("accounts.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = await read_json_async("accounts.json")
         
         bot_username = config.get("bot", "@anicardplaybot")
         concurrency = config.get("concurrency", 2)
@@ -564,33 +587,7 @@ async def run_card_cycle():
         
         async def process_account(acc):
             async with semaphore:
-                session_name = acc["session"]
-                phone = acc.get("phone", "Неизвестно")
-                
-                print(f"🔐 [{session_name}] Подключаемся к аккаунту {phone}...")
-                
-                client = TelegramClient(session_name, API_ID, API_HASH)
-                
-                try:
-                    await client.start()
-                    user = await client.get_me()
-                    print(f"✅ [{session_name}] Подключен как: @{user.username} ({user.phone})")
-                    
-                    # Запускаем цикл карт
-                    timeout = await card_cycle_for_account(client, bot_username)
-                    
-                    if timeout > 0:
-                        print(f"⏰ [{session_name}] Следующий цикл через {timeout} минут")
-                    else:
-                        print(f"✅ [{session_name}] Цикл завершен без таймаута")
-                    
-                    return timeout
-                    
-                except Exception as e:
-                    print(f"❌ [{session_name}] Ошибка: {e}")
-                    return 0
-                finally:
-                    await client.disconnect()
+                return await run_account_card_cycle(acc, bot_username)
         
         # Запускаем все аккаунты и собираем таймауты
         tasks = [process_account(acc) for acc in accounts]
@@ -624,24 +621,11 @@ async def main():
         print("🚀 Запуск цикла карт немедленно")
         await run_card_cycle()
     else:
-        print("🕐 Запуск цикла карт каждые 4 часа 10 секунд...")
+        print("🕐 Запуск цикла карт по кулдаунам аккаунтов (по умолчанию каждые 4 часа 10 секунд)...")
         
         while True:
             try:
-                # Запускаем цикл и получаем таймаут
-                timeout_minutes = await run_card_cycle()
-                
-                if timeout_minutes > 0:
-                    # Используем таймаут от бота + 1 минута
-                    wait_time = timeout_minutes * 60 + 60  # минуты в секунды + 1 минута
-                    print(f"⏰ Следующий цикл через {timeout_minutes} минут (установлено ботом)")
-                else:
-                    # Используем стандартный интервал 4 часа 10 секунд
-                    wait_time = 4 * 60 * 60 + 10  # 4 часа 10 секунд
-                    print(f"⏰ Следующий цикл через 4 часа 10 секунд (стандартный интервал)")
-                
-                print(f"⏰ Ожидание {wait_time} секунд...")
-                await asyncio.sleep(wait_time)
+                await run_card_scheduler()
                 
             except KeyboardInterrupt:
                 print("🛑 Остановка цикла карт...")
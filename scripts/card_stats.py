@@ -5,28 +5,25 @@ Card Statistics - Статистика карт
 Показывает подробную статистику по редким картам
 """
 
-import json
 import os
-from pathlib import Path
+import sys
 from collections import Counter
 from datetime import datetime
 
+# Хранилище карт лежит в корне проекта
+PARENT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+from card_store import get_card_store
+
 def load_cards_data():
-    """Загружает данные о картах из всех файлов"""
-    cards_folder = Path("accounts/cards")
-    if not cards_folder.exists():
+    """Загружает данные о картах из хранилища"""
+    try:
+        return get_card_store().cards_by_account()
+    except Exception as e:
+        print(f"❌ Ошибка при чтении хранилища карт: {e}")
         return {}
-    
-    all_cards = {}
-    for card_file in cards_folder.glob("*.json"):
-        try:
-            with open(card_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            all_cards[card_file.stem] = data
-        except Exception as e:
-            print(f"❌ Ошибка при чтении {card_file}: {e}")
-    
-    return all_cards
 
 def print_general_stats(all_cards):
     """Выводит общую статистику"""
@@ -92,22 +89,8 @@ def print_rare_cards_list(all_cards, min_rating=90):
     print(f"\n💎 САМЫЕ РЕДКИЕ КАРТЫ (рейтинг {min_rating}+)")
     print("=" * 50)
     
-    rare_cards = []
-    for account, data in all_cards.items():
-        for rarity, cards in data.items():
-            for card in cards:
-                if card.get('rating', 0) >= min_rating:
-                    rare_cards.append({
-                        'account': account,
-                        'name': card['name'],
-                        'rating': card['rating'],
-                        'rarity': rarity,
-                        'universe': card.get('universe', ''),
-                        'element': card.get('element', '')
-                    })
-    
-    # Сортируем по рейтингу
-    rare_cards.sort(key=lambda x: x['rating'], reverse=True)
+    # Фильтрация и сортировка по рейтингу выполняются в базе
+    rare_cards = get_card_store().cards(min_rating=min_rating)
     
     if not rare_cards:
         print(f"📭 Карт с рейтингом {min_rating}+ не найдено")
@@ -131,19 +114,7 @@ def search_cards(all_cards, search_term):
     print(f"\n🔍 ПОИСК КАРТ: '{search_term}'")
     print("=" * 50)
     
-    found_cards = []
-    for account, data in all_cards.items():
-        for rarity, cards in data.items():
-            for card in cards:
-                if search_term.lower() in card['name'].lower():
-                    found_cards.append({
-                        'account': account,
-                        'name': card['name'],
-                        'rating': card['rating'],
-                        'rarity': rarity,
-                        'universe': card.get('universe', ''),
-                        'element': card.get('element', '')
-                    })
+    found_cards = get_card_store().cards(search=search_term)
     
     if not found_cards:
         print(f"📭 Карты с названием '{search_term}' не найдены")
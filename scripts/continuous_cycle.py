@@ -2,14 +2,14 @@
 # -*- coding: utf-8 -*-
 """
 Anicard Continuous Cycle - Непрерывный цикл
-Запускает ежедневный цикл в 22:01 UTC и цикл карт каждые 4ч 10с
+Запускает ежедневный цикл в 22:01 UTC и цикл карт по кулдауну каждого аккаунта
+(если бот не сообщил кулдаун - через 4ч 10с)
 """
 
 import asyncio
-import json
 import os
 import sys
-import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import pytz
 
@@ -19,19 +19,65 @@ sys.path.insert(0, parent_dir)
 
 # Импортируем функции из combined_cycle
 try:
-    from combined_cycle import run_daily_cycle, run_card_cycle
+    from combined_cycle import run_daily_cycle, run_card_cycle_for, create_client_pool, precheck_sessions, warm_up_accounts
 except ImportError:
     # Если импорт не удался, добавляем текущую директорию в путь
     current_dir = os.path.dirname(os.path.abspath(__file__))
     sys.path.insert(0, current_dir)
-    from combined_cycle import run_daily_cycle, run_card_cycle
+    from combined_cycle import run_daily_cycle, run_card_cycle_for, create_client_pool, precheck_sessions, warm_up_accounts
+
+from async_writer import read_json_async
+from cooldown_scheduler import AccountScheduler
 
 # Блокировка для предотвращения одновременного запуска циклов
 cycle_lock = asyncio.Lock()
 
+
+class CardRunsGate:
+    """
+    Аккаунты цикла карт, которые работают сейчас.
+    Новый аккаунт карт ждёт cycle_lock (идущий ежедневный цикл) без слота;
+    ежедневный цикл берёт cycle_lock и ждёт, пока работающие аккаунты закончат
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def wait(self):
+        async with cycle_lock:
+            pass
+
+    def is_open(self):
+        return not cycle_lock.locked()
+
+    @contextmanager
+    def running(self):
+        self.active += 1
+        self.idle.clear()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if self.active == 0:
+                self.idle.set()
+
+
+card_runs = CardRunsGate()
+
+# Клиенты аккаунтов остаются подключены между циклами
+client_pool = create_client_pool()
+
+# За сколько минут до 22:01 UTC подключать аккаунты (0 - без прогрева)
+DAILY_WARMUP_MINUTES = float(os.getenv("DAILY_WARMUP_MINUTES", "3"))
+# Как часто цикл карт перечитывает accounts.json и перепроверяет отсеянные сессии (0 - никогда)
+ACCOUNTS_REFRESH_MINUTES = float(os.getenv("ACCOUNTS_REFRESH_MINUTES", "10"))
+
 async def wait_until_daily_time():
     """
-    Ждет до 22:01 UTC
+    Ждет до 22:01 UTC. Заранее (DAILY_WARMUP_MINUTES) подключает аккаунты пула
+    и получает сущность бота, чтобы к 22:01 осталось только отправить сообщения
     """
     utc = pytz.UTC
     now = datetime.now(utc)
@@ -49,11 +95,18 @@ async def wait_until_daily_time():
     print(f"⏰ Следующий ежедневный цикл в: {target_time.strftime('%H:%M:%S UTC')}")
     print(f"⏳ Ожидание: {wait_seconds/3600:.1f} часов")
     
-    await asyncio.sleep(wait_seconds)
+    warmup_seconds = DAILY_WARMUP_MINUTES * 60
+    if warmup_seconds > 0 and wait_seconds > warmup_seconds:
+        await asyncio.sleep(wait_seconds - warmup_seconds)
+        print(f"🔥 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] До ежедневного цикла {DAILY_WARMUP_MINUTES:g} мин, прогреваем аккаунты...")
+        await warm_up_accounts(client_pool)
+        wait_seconds = (target_time - datetime.now(utc)).total_seconds()
+    
+    await asyncio.sleep(max(0, wait_seconds))
 
 async def continuous_cycle():
     """
-    Непрерывный цикл: ежедневный в 22:01 UTC + карты каждые 4 часа 10 секунд
+    Непрерывный цикл: ежедневный в 22:01 UTC + карты по кулдаунам аккаунтов
     """
     print("🚀 Запуск непрерывного цикла Anicard Auto")
     print("=" * 50)
@@ -71,6 +124,8 @@ async def continuous_cycle():
         card_task.cancel()
     except Exception as e:
         print(f"\n❌ Ошибка в непрерывном цикле: {e}")
+    finally:
+        await client_pool.close()
 
 async def daily_cycle_scheduler():
     """
@@ -78,16 +133,15 @@ async def daily_cycle_scheduler():
     """
     while True:
         try:
-            # Проверяем блокировку
-            if cycle_lock.locked():
-                print(f"⏳ [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ежедневный цикл ждет завершения другого цикла...")
-                await asyncio.sleep(60)  # Ждем 1 минуту
-                continue
-            
-            # Запускаем ежедневный цикл с блокировкой
+            # Запускаем ежедневный цикл с блокировкой (аккаунты карт берут её
+            # лишь на миг перед стартом, поэтому просто ждём её в очереди)
             async with cycle_lock:
+                # Новые аккаунты карт уже не начнут; ждём тех, что работают
+                if card_runs.active:
+                    print(f"⏳ [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ежедневный цикл ждет {card_runs.active} аккаунт(ов) цикла карт...")
+                    await card_runs.idle.wait()
                 print(f"\n🌅 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Запуск ежедневного цикла...")
-                await run_daily_cycle()
+                await run_daily_cycle(pool=client_pool)
                 print(f"✅ [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ежедневный цикл завершен!")
             
             # Ждем до следующего 22:01 UTC
@@ -103,26 +157,12 @@ async def daily_cycle_scheduler():
 
 async def card_cycle_scheduler():
     """
-    Планировщик цикла карт (каждые 4 часа 10 секунд)
+    Планировщик цикла карт: каждый аккаунт запускается, как только закончился
+    его кулдаун (по сообщению бота), иначе через 4 часа 10 секунд
     """
     while True:
         try:
-            # Проверяем блокировку
-            if cycle_lock.locked():
-                print(f"⏳ [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Цикл карт ждет завершения другого цикла...")
-                await asyncio.sleep(60)  # Ждем 1 минуту
-                continue
-            
-            # Запускаем цикл карт с блокировкой
-            async with cycle_lock:
-                print(f"\n🎴 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Запуск цикла карт...")
-                await run_card_cycle()
-                print(f"✅ [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Цикл карт завершен!")
-            
-            # Ждем 4 часа 10 секунд
-            print(f"⏰ [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Ожидание следующего цикла карт (4 часа 10 секунд)...")
-            await asyncio.sleep(4 * 3600 + 10)  # 4 часа 10 секунд
-            
+            await run_card_scheduler(wait_for_daily=True)
         except asyncio.CancelledError:
             break
         except Exception as e:
@@ -130,22 +170,76 @@ async def card_cycle_scheduler():
             print("⏰ Повтор через 5 минут...")
             await asyncio.sleep(300)  # 5 минут
 
+async def run_card_scheduler(wait_for_daily=False):
+    """
+    Запускает планировщик по кулдаунам для всех аккаунтов из accounts.json
+    wait_for_daily - не начинать аккаунт, пока идёт ежедневный цикл
+    """
+    config = await read_json_async("accounts/accounts.json")
+    bot_username = config.get("bot", "@anicardplaybot")
+    concurrency = config.get("concurrency", 2)
+    accounts = config.get("accounts", [])
+    
+    print(f"🔐 Настроено аккаунтов: {len(accounts)}")
+    print(f"⚡ Одновременно работает: {concurrency}")
+    
+    accounts = await precheck_sessions(accounts, client_pool)
+    
+    scheduler = AccountScheduler()
+    scheduled = set()
+    for acc in accounts:
+        scheduler.add(acc)
+        scheduled.add(acc["session"])
+    
+    async def worker(acc):
+        print(f"\n🎴 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [{acc['session']}] Запуск цикла карт...")
+        await run_card_cycle_for(acc, bot_username, pool=client_pool)
+    
+    refresher = None
+    if ACCOUNTS_REFRESH_MINUTES > 0:
+        refresher = asyncio.create_task(refresh_card_accounts(scheduler, scheduled))
+    try:
+        # Аккаунт карт не начинает во время ежедневного цикла и ждёт его без слота
+        await scheduler.run(worker, concurrency, gate=card_runs if wait_for_daily else None)
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+
+async def add_new_card_accounts(scheduler, scheduled):
+    """
+    Перечитывает accounts.json и ставит в планировщик аккаунты, которых в нём
+    ещё нет: добавленные после запуска и не прошедшие прошлую проверку сессий
+    """
+    config = await read_json_async("accounts/accounts.json")
+    pending = [acc for acc in config.get("accounts", []) if acc["session"] not in scheduled]
+    if not pending:
+        return
+    for acc in await precheck_sessions(pending, client_pool):
+        scheduler.add(acc)
+        scheduled.add(acc["session"])
+        print(f"➕ [{acc['session']}] Добавлен в цикл карт")
+
+async def refresh_card_accounts(scheduler, scheduled):
+    """
+    Каждые ACCOUNTS_REFRESH_MINUTES добавляет в цикл карт новые и восстановившиеся аккаунты
+    """
+    while True:
+        await asyncio.sleep(ACCOUNTS_REFRESH_MINUTES * 60)
+        try:
+            await add_new_card_accounts(scheduler, scheduled)
+        except Exception as e:
+            print(f"⚠️ Не удалось обновить список аккаунтов цикла карт: {e}")
+
 async def card_cycle_only():
     """
-    Только цикл карт каждые 4 часа 10 секунд
+    Только цикл карт: каждый аккаунт по своему кулдауну (по умолчанию 4 часа 10 секунд)
     """
-    print("🎴 Запуск цикла карт каждые 4 часа 10 секунд")
+    print("🎴 Запуск цикла карт по кулдаунам аккаунтов")
     print("=" * 50)
     
     while True:
         try:
-            print(f"\n🎴 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Запуск цикла карт...")
-            await run_card_cycle()
-            
-            # Ждем 4 часа 10 секунд
-            wait_time = 4 * 60 * 60 + 10  # 4 часа 10 секунд
-            print(f"\n⏰ [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Следующий цикл карт через {wait_time} секунд...")
-            await asyncio.sleep(wait_time)
+            await run_card_scheduler()
             
         except KeyboardInterrupt:
             print("\n🛑 Остановка цикла карт...")
@@ -154,6 +248,8 @@ async def card_cycle_only():
             print(f"\n❌ Ошибка в цикле карт: {e}")
             print("⏰ Повтор через 5 минут...")
             await asyncio.sleep(300)  # 5 минут
+    
+    await client_pool.close()
 
 async def daily_cycle_only():
     """
@@ -168,7 +264,7 @@ async def daily_cycle_only():
             await wait_until_daily_time()
             
             print(f"\n🌅 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Запуск ежедневного цикла...")
-            await run_daily_cycle()
+            await run_daily_cycle(pool=client_pool)
             
         except KeyboardInterrupt:
             print("\n🛑 Остановка ежедневного цикла...")
@@ -177,6 +273,8 @@ async def daily_cycle_only():
             print(f"\n❌ Ошибка в ежедневном цикле: {e}")
             print("⏰ Повтор через 5 минут...")
             await asyncio.sleep(300)  # 5 минут
+    
+    await client_pool.close()
 
 async def main():
     """
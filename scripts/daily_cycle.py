@@ -1,8 +1,19 @@
-import asyncio, json, os, random, re, datetime
+import asyncio, os, random, re, sys, datetime
 from dotenv import load_dotenv
 from telethon import TelegramClient, events
 from telethon.errors import FloodWaitError, SessionPasswordNeededError
 
+# Общие модули лежат в корне проекта
+PARENT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+
+from async_writer import read_json_async, write_async
+from card_store import get_card_store
+from message_classifier import classify_message, is_ignored, log_ignored
+from rare_card_index import is_rare_card_by_name
+from rate_limiter import get_rate_limiter
+
 load_dotenv()
 
 # Загружаем API ключи из .env
@@ -11,59 +22,44 @@ API_HASH = os.getenv("API_HASH")
 MESSAGE_TIMEOUT_MS = int(os.getenv("MESSAGE_TIMEOUT", "700"))  # Миллисекунды
 MESSAGE_TIMEOUT = MESSAGE_TIMEOUT_MS / 1000.0  # Конвертируем в секунды (0.7 секунды)
 
-# Создаем папку для карт если её нет
-CARDS_FOLDER = "accounts/cards"
-if not os.path.exists(CARDS_FOLDER):
-    os.makedirs(CARDS_FOLDER)
 
 # === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 
-async def wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, regex=None, contains=None):
+async def wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, regex=None, contains=None, action=None):
     """
     Ждём НОВОЕ сообщение от entity (бота).
     Можно фильтровать по подстроке (contains) или regex.
     Игнорирует видео, квесты и системные сообщения.
+    action - отправка или клик: выполняется после регистрации обработчика,
+    чтобы быстрый ответ бота не пришёл раньше, чем мы начали его ждать;
+    если action вернул False (кнопка не найдена), возвращается None.
     """
     loop = asyncio.get_event_loop()
     fut = loop.create_future()
+    contains_lower = contains.lower() if contains else None
+    compiled_regex = re.compile(regex, re.I) if regex else None
 
     @client.on(events.NewMessage(from_users=entity))
     async def handler(event):
         text = event.raw_text or ""
+        lowered = text.lower()
         
-        # Игнорируем видео сообщения
-        if event.message.video:
-            print(f"🎥 [{client.session.filename}] Получено видео сообщение - игнорируем")
-            return
-            
-        # Игнорируем системные сообщения бота
-        system_messages = [
-            "Получена новая",
-            "Вам попалась повторная карта", 
-            "Следующая попытка будет доступна",
-            "повторная карта",
-            "следующая попытка",
-            "будет доступна"
-        ]
-        
-        if any(sys_msg.lower() in text.lower() for sys_msg in system_messages):
-            print(f"ℹ️ [{client.session.filename}] Системное сообщение: {text[:50]}...")
-            return
-            
-        # Игнорируем квестовые сообщения (обычно содержат "квест", "задание", "миссия")
-        quest_keywords = ["квест", "задание", "миссия", "quest", "mission"]
-        if any(keyword in text.lower() for keyword in quest_keywords):
-            print(f"📋 [{client.session.filename}] Квестовое сообщение: {text[:50]}...")
+        # Игнорируем видео, системные и квестовые сообщения
+        category = classify_message(event.message, lowered)
+        if is_ignored(category):
+            log_ignored(client.session.filename, category, text)
             return
         
         # Применяем пользовательские фильтры
-        if (contains and contains.lower() in text.lower()) or \
-           (regex and re.search(regex, text, re.I)) or \
+        if (contains and contains_lower in lowered) or \
+           (regex and compiled_regex.search(text)) or \
            (not contains and not regex):
             if not fut.done():
                 fut.set_result(event.message)
 
     try:
+        if action is not None and await action() is False:
+            return None
         return await asyncio.wait_for(fut, timeout=timeout)
     finally:
         client.remove_event_handler(handler)
@@ -96,80 +92,62 @@ async def click_button(msg, *, text=None, regex=None, index=None, case_insensiti
             await b.click(); return True
     return False
 
+async def send_limited(client, entity, message):
+    """
+    Отправляет сообщение через лимитер (при FloodWait - пауза и повтор)
+    """
+    return await get_rate_limiter().run(client.session.filename, client.send_message, entity, message)
+
+async def click_limited(client, button):
+    """
+    Нажимает кнопку через лимитер (при FloodWait - пауза и повтор)
+    """
+    return await get_rate_limiter().run(client.session.filename, button.click)
+
+async def click_index_limited(client, msg, index):
+    """
+    Нажимает кнопку по номеру через лимитер; False - кнопки нет
+    """
+    return await get_rate_limiter().run(client.session.filename, click_button, msg, index=index)
+
 async def send_message_and_wait(client, entity, message, timeout=MESSAGE_TIMEOUT):
     """
-    Отправляет сообщение и ждет ответ
+    Отправляет сообщение и ждет ответ.
+    Ожидание регистрируется до отправки; темп задаёт лимитер (rate_limiter).
+    Бросает asyncio.TimeoutError, если ответа нет.
     """
-    await client.send_message(entity, message)
-    return await wait_new_from(client, entity, timeout=timeout)
+    return await wait_new_from(client, entity, timeout=timeout, action=lambda: send_limited(client, entity, message))
 
 async def click_button_and_wait(client, entity, msg, button_text=None, button_index=None, timeout=MESSAGE_TIMEOUT):
     """
     Нажимает кнопку и ждет новое сообщение
     """
     try:
+        limiter = get_rate_limiter()
         if button_text:
-            clicked = await click_button(msg, text=button_text)
+            click = lambda: limiter.run(client.session.filename, click_button, msg, text=button_text)
         elif button_index is not None:
-            clicked = await click_button(msg, index=button_index)
+            click = lambda: limiter.run(client.session.filename, click_button, msg, index=button_index)
         else:
             return None
         
-        if clicked:
+        try:
+            # Ожидание регистрируется до клика; None - кнопка не найдена
+            return await wait_new_from(client, entity, timeout=timeout, action=click)
+        except asyncio.TimeoutError:
+            print(f"⚠️ [{client.session.filename}] Таймаут при ожидании ответа после клика")
+            # Пытаемся получить последнее сообщение
             try:
-                return await wait_new_from(client, entity, timeout=timeout)
-            except asyncio.TimeoutError:
-                print(f"⚠️ [{client.session.filename}] Таймаут при ожидании ответа после клика")
-                # Пытаемся получить последнее сообщение
-                try:
-                    async for message in client.iter_messages(entity, limit=1):
-                        return message
-                except:
-                    return None
-        return None
+                async for message in client.iter_messages(entity, limit=1):
+                    return message
+            except:
+                return None
     except Exception as e:
         print(f"❌ [{client.session.filename}] Ошибка в click_button_and_wait: {e}")
         return None
 
 # === ФУНКЦИИ ДЛЯ РАБОТЫ С КАРТАМИ ===
 
-def load_rare_cards_filter():
-    """
-    Загружает список редких карт из JSON файла для фильтрации
-    """
-    try:
-        with open("rare_cards_filter.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("cards", {})
-    except FileNotFoundError:
-        print("⚠️ Файл rare_cards_filter.json не найден, фильтрация по названию отключена")
-        return {}
-    except Exception as e:
-        print(f"❌ Ошибка загрузки rare_cards_filter.json: {e}")
-        return {}
-
-def is_rare_card_by_name(card_name):
-    """
-    Проверяет, является ли карта редкой по названию из списка фильтрации
-    Возвращает кортеж (категория, рейтинг) или (None, None)
-    """
-    rare_cards = load_rare_cards_filter()
-    
-    if not rare_cards:
-        return None, None
-    
-    # Нормализуем название карты для поиска
-    normalized_name = card_name.strip()
-    
-    # Проверяем по всем категориям редкости
-    for category, cards in rare_cards.items():
-        for card in cards:
-            if card.get("name", "").strip() == normalized_name:
-                rating = card.get("strength", None)  # Берем рейтинг из поля strength
-                return category, rating
-    
-    return None, None
-
 def parse_card_response(text, card_type):
     """
     Парсит ответ бота на получение карты и извлекает информацию о редких картах
@@ -234,53 +212,26 @@ def parse_card_response(text, card_type):
     # Карта не найдена в списке редких карт
     return None
 
-def save_card_to_file(session_name, card_info):
+def save_card(session_name, card_info):
     """
-    Сохраняет информацию о редкой карте в JSON файл аккаунта
+    Сохраняет информацию о редкой карте в хранилище (SQLite)
     """
-    file_path = os.path.join(CARDS_FOLDER, f"{session_name}.json")
-    
-    # Загружаем существующие данные или создаем новые
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except:
-            data = {"epic": [], "legendary": [], "myfics": [], "adamant": []}
-    else:
-        data = {"epic": [], "legendary": [], "myfics": [], "adamant": []}
-    
-    # Определяем категорию редкости
-    rarity = card_info["rarity"]
-    category = rarity  # Теперь rarity уже содержит правильную категорию
-    
-    # Проверяем, что категория существует
-    if category not in data:
-        data[category] = []
-    
-    # Проверяем, нет ли уже такой карты
+    # Категория редкости уже определена при парсинге
+    category = card_info["rarity"]
     card_name = card_info["name"] or card_info["character"]
-    for existing_card in data[category]:
-        if existing_card.get("name") == card_name:
-            print(f"🔄 [{session_name}] Карта {card_name} уже есть в коллекции ({category})")
-            return
     
-    # Добавляем карту в соответствующую категорию (только имя, элемент, рейтинг)
+    # Сохраняем только имя, элемент и рейтинг
     card_entry = {
         "name": card_name,
-        "rating": card_info["rating"]
+        "rating": card_info["rating"],
+        "element": card_info["element"],
+        "rarity": category
     }
     
-    if card_info["element"]:
-        card_entry["element"] = card_info["element"]
-    
-    data[category].append(card_entry)
-    
-    # Сохраняем обновленные данные
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    print(f"💾 [{session_name}] Редкая карта сохранена: {card_name} ({category})")
+    if get_card_store().add_card(session_name, card_entry):
+        print(f"💾 [{session_name}] Редкая карта сохранена: {card_name} ({category})")
+    else:
+        print(f"🔄 [{session_name}] Карта {card_name} уже есть в коллекции ({category})")
 
 def send_card_notification(session_name, card_info):
     """
@@ -327,7 +278,6 @@ async def filter_rare_card(client, entity, card_info):
         
         # Отправляем "Мои карты"
         print(f"🧳 [{client.session.filename}] Отправляем 'Мои карты'...")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
         msg = await send_message_and_wait(client, entity, "🧳 Мои карты")
         
         if msg and msg.buttons:
@@ -344,7 +294,6 @@ async def filter_rare_card(client, entity, card_info):
                 
                 if msg and "Введите название карты" in msg.raw_text:
                     print(f"📝 [{client.session.filename}] Отправляем название карты: {card_info['name']}")
-                    await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
                     msg = await send_message_and_wait(client, entity, card_info['name'])
                     
                     if msg and "Выберите нужные фильтры для карт" in msg.raw_text:
@@ -377,49 +326,34 @@ async def set_card_filters(client, entity, card_name, card_type):
         # 1. Устанавливаем тип карт - Боевые ⚔️ или Коллекционные 🎭
         if card_type == "battle":
             print(f"⚔️ [{client.session.filename}] Устанавливаем тип карт: Боевые ⚔️")
-            await client.send_message(entity, "Боевые ⚔️")
+            msg = await send_message_and_wait(client, entity, "Боевые ⚔️")
         else:
             print(f"🎭 [{client.session.filename}] Устанавливаем тип карт: Коллекционные 🎭")
-            await client.send_message(entity, "Коллекционные 🎭")
-        
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await send_message_and_wait(client, entity, "Коллекционные 🎭")
         
         # 2. Устанавливаем название карты
         print(f"📝 [{client.session.filename}] Устанавливаем название карты: {card_name}")
-        await client.send_message(entity, card_name)
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+        msg = await send_message_and_wait(client, entity, card_name)
         
         # 3. Устанавливаем Вселенные - ✖️
         print(f"🌍 [{client.session.filename}] Устанавливаем Вселенные: ✖️")
-        await client.send_message(entity, "✖️")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+        msg = await send_message_and_wait(client, entity, "✖️")
         
         # 4. Устанавливаем Редкости - ✖️
         print(f"⭐ [{client.session.filename}] Устанавливаем Редкости: ✖️")
-        await client.send_message(entity, "✖️")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+        msg = await send_message_and_wait(client, entity, "✖️")
         
         # 5. Устанавливаем Стихии - ✖️
         print(f"🔥 [{client.session.filename}] Устанавливаем Стихии: ✖️")
-        await client.send_message(entity, "✖️")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+        msg = await send_message_and_wait(client, entity, "✖️")
         
         # 6. Устанавливаем сортировку: Сначала - Высокий рейтинг вперёд
         print(f"📊 [{client.session.filename}] Устанавливаем сортировку: Высокий рейтинг вперёд")
-        await client.send_message(entity, "Высокий рейтинг вперёд")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+        msg = await send_message_and_wait(client, entity, "Высокий рейтинг вперёд")
         
         # 7. Устанавливаем сортировку: Потом - Новые вперёд
         print(f"📊 [{client.session.filename}] Устанавливаем сортировку: Новые вперёд")
-        await client.send_message(entity, "Новые вперёд")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
-        msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+        msg = await send_message_and_wait(client, entity, "Новые вперёд")
         
         # 8. Ищем кнопку "Карты ⏩"
         if msg and msg.buttons:
@@ -462,16 +396,13 @@ async def use_attempts(client, entity, attempts, card_type):
     for i in range(attempts):
         try:
             print(f"{emoji} [{client.session.filename}] Попытка {i+1}/{attempts}...")
-            await client.send_message(entity, command)
-            await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка после отправки команды
-            
             try:
-                reply = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+                reply = await send_message_and_wait(client, entity, command)
                 if reply and reply.raw_text:
                     card_info = parse_card_response(reply.raw_text, card_type)
                     if card_info:
                         # Карта уже проверена в parse_card_response и является редкой
-                        save_card_to_file(client.session.filename, card_info)
+                        await write_async(save_card, client.session.filename, card_info)
                         send_card_notification(client.session.filename, card_info)
                         print(f"🎉 [{client.session.filename}] Редкая карта: {card_info['name']} ({card_info['rarity']})")
                     else:
@@ -479,9 +410,6 @@ async def use_attempts(client, entity, attempts, card_type):
                             
             except asyncio.TimeoutError:
                 print(f"⚠️ [{client.session.filename}] Таймаут при попытке {i+1}")
-            
-            if i < attempts - 1:
-                await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между попытками получения карт
         except Exception as e:
             print(f"❌ [{client.session.filename}] Ошибка при попытке {i+1}: {e}")
 
@@ -503,7 +431,6 @@ async def daily_cycle_for_account(client, bot_username):
         print(f"📜 [{client.session.filename}] Отправляем 'Меню'...")
         msg = await send_message_and_wait(client, entity, "📜 Меню")
         print(f"✅ [{client.session.filename}] Меню получено")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
 
         # 2. Нажимаем на кнопку 🎫 AniPass
         print(f"🎫 [{client.session.filename}] Нажимаем 'AniPass'...")
@@ -514,23 +441,22 @@ async def daily_cycle_for_account(client, bot_username):
             print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
         
         # Ищем кнопку AniPass
-        anipass_clicked = False
+        anipass_button = None
         if msg.buttons:
             flat_buttons = [b for row in msg.buttons for b in row]
             for button in flat_buttons:
                 if "AniPass" in button.text or "🎫" in button.text:
                     print(f"🎯 [{client.session.filename}] Найдена кнопка: {button.text}")
-                    await button.click()
-                    anipass_clicked = True
+                    anipass_button = button
                     break
         
-        if not anipass_clicked:
+        if not anipass_button:
             print(f"❌ [{client.session.filename}] Не удалось найти кнопку AniPass")
             return False
         
-        # Ждем ответ после клика
+        # Ждем ответ после клика (ожидание регистрируется до клика)
         try:
-            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_limited(client, anipass_button))
             print(f"✅ [{client.session.filename}] AniPass открыт")
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при открытии AniPass, пробуем продолжить...")
@@ -584,8 +510,7 @@ async def daily_cycle_for_account(client, bot_username):
             print(f"ℹ️ [{client.session.filename}] Нет кнопок в AniPass, возможно уже забран")
             # Пытаемся вернуться в главное меню
             print(f"🔙 [{client.session.filename}] Пытаемся вернуться в главное меню...")
-            await client.send_message(entity, "📜 Меню")
-            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await send_message_and_wait(client, entity, "📜 Меню")
             print(f"✅ [{client.session.filename}] Вернулись в главное меню")
 
         # 5. Переходим в "Дары богов"
@@ -597,23 +522,22 @@ async def daily_cycle_for_account(client, bot_username):
             print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
         
         # Ищем кнопку "Дары богов"
-        gods_gifts_clicked = False
+        gods_gifts_button = None
         if msg.buttons:
             flat_buttons = [b for row in msg.buttons for b in row]
             for button in flat_buttons:
                 if "Дары богов" in button.text or "⛩" in button.text:
                     print(f"🎯 [{client.session.filename}] Найдена кнопка: {button.text}")
-                    await button.click()
-                    gods_gifts_clicked = True
+                    gods_gifts_button = button
                     break
         
-        if not gods_gifts_clicked:
+        if not gods_gifts_button:
             print(f"❌ [{client.session.filename}] Не удалось найти 'Дары богов'")
             return False
         
-        # Ждем ответ после клика
+        # Ждем ответ после клика (ожидание регистрируется до клика)
         try:
-            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_limited(client, gods_gifts_button))
             print(f"✅ [{client.session.filename}] В 'Дары богов'")
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при переходе в 'Дары богов', пробуем продолжить...")
@@ -630,10 +554,12 @@ async def daily_cycle_for_account(client, bot_username):
         
         # Мистический жетон (ежедневно)
         print(f"🀄️ [{client.session.filename}] Получаем мистический жетон...")
-        await click_button(msg, index=2)  # 3-я кнопка
         try:
-            reply = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-            if "сент" in reply.raw_text or "2025" in reply.raw_text or "доступн" in reply.raw_text.lower():
+            # 3-я кнопка; ожидание регистрируется до клика
+            reply = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_index_limited(client, msg, 2))
+            if not reply:
+                print(f"❌ [{client.session.filename}] Кнопка жетона не найдена")
+            elif "сент" in reply.raw_text or "2025" in reply.raw_text or "доступн" in reply.raw_text.lower():
                 print(f"ℹ️ [{client.session.filename}] Мистический жетон уже получен")
             else:
                 print(f"✅ [{client.session.filename}] Мистический жетон получен")
@@ -642,14 +568,14 @@ async def daily_cycle_for_account(client, bot_username):
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при получении жетона")
 
-        await asyncio.sleep(MESSAGE_TIMEOUT)
-
         # Древний куб удачи (раз в неделю)
         print(f"🎲 [{client.session.filename}] Получаем древний куб удачи...")
-        await click_button(msg, index=0)  # 1-я кнопка
         try:
-            reply = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-            if "сент" in reply.raw_text or "2025" in reply.raw_text or "доступн" in reply.raw_text.lower():
+            # 1-я кнопка; ожидание регистрируется до клика
+            reply = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_index_limited(client, msg, 0))
+            if not reply:
+                print(f"❌ [{client.session.filename}] Кнопка куба удачи не найдена")
+            elif "сент" in reply.raw_text or "2025" in reply.raw_text or "доступн" in reply.raw_text.lower():
                 print(f"ℹ️ [{client.session.filename}] Древний куб удачи уже получен")
             else:
                 print(f"✅ [{client.session.filename}] Древний куб удачи получен")
@@ -671,14 +597,14 @@ async def daily_cycle_for_account(client, bot_username):
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при получении куба удачи")
 
-        await asyncio.sleep(MESSAGE_TIMEOUT)
-
         # Рог призыва (раз в неделю)
         print(f"📯 [{client.session.filename}] Получаем рог призыва...")
-        await click_button(msg, index=1)  # 2-я кнопка
         try:
-            reply = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
-            if "сент" in reply.raw_text or "2025" in reply.raw_text or "доступн" in reply.raw_text.lower():
+            # 2-я кнопка; ожидание регистрируется до клика
+            reply = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_index_limited(client, msg, 1))
+            if not reply:
+                print(f"❌ [{client.session.filename}] Кнопка рога призыва не найдена")
+            elif "сент" in reply.raw_text or "2025" in reply.raw_text or "доступн" in reply.raw_text.lower():
                 print(f"ℹ️ [{client.session.filename}] Рог призыва уже получен")
             else:
                 print(f"✅ [{client.session.filename}] Рог призыва получен")
@@ -687,7 +613,7 @@ async def daily_cycle_for_account(client, bot_username):
                 if card_info:
                     card_info["rarity"] = "Легендарная"
                     card_info["type"] = "collection"
-                    save_card_to_file(client.session.filename, card_info)
+                    await write_async(save_card, client.session.filename, card_info)
                     send_card_notification(client.session.filename, card_info)
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при получении рога призыва")
@@ -698,7 +624,6 @@ async def daily_cycle_for_account(client, bot_username):
         if not msg:
             print(f"❌ [{client.session.filename}] Не удалось найти кнопку 'Назад'")
             return False
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
 
         # 8. Переходим в "Крафт меню"
         print(f"🧬 [{client.session.filename}] Переходим в 'Крафт меню'...")
@@ -709,23 +634,22 @@ async def daily_cycle_for_account(client, bot_username):
             print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
         
         # Ищем кнопку "Крафт меню"
-        craft_clicked = False
+        craft_button = None
         if msg.buttons:
             flat_buttons = [b for row in msg.buttons for b in row]
             for button in flat_buttons:
                 if "Крафт меню" in button.text or "🧬" in button.text:
                     print(f"🎯 [{client.session.filename}] Найдена кнопка: {button.text}")
-                    await button.click()
-                    craft_clicked = True
+                    craft_button = button
                     break
         
-        if not craft_clicked:
+        if not craft_button:
             print(f"❌ [{client.session.filename}] Не удалось найти 'Крафт меню'")
             return False
         
-        # Ждем ответ после клика
+        # Ждем ответ после клика (ожидание регистрируется до клика)
         try:
-            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_limited(client, craft_button))
             print(f"✅ [{client.session.filename}] В 'Крафт меню'")
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при переходе в 'Крафт меню', пробуем продолжить...")
@@ -736,7 +660,6 @@ async def daily_cycle_for_account(client, bot_username):
             except:
                 print(f"❌ [{client.session.filename}] Не удалось получить сообщения")
                 return False
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
 
         # 9. Нажимаем "Омут душ"
         print(f"🌊 [{client.session.filename}] Нажимаем 'Омут душ'...")
@@ -747,23 +670,22 @@ async def daily_cycle_for_account(client, bot_username):
             print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
         
         # Ищем кнопку "Омут душ"
-        soul_clicked = False
+        soul_button = None
         if msg.buttons:
             flat_buttons = [b for row in msg.buttons for b in row]
             for button in flat_buttons:
                 if "🪞 Омут душ" in button.text or "Омут душ" in button.text or "душ" in button.text.lower():
                     print(f"🎯 [{client.session.filename}] Найдена кнопка: {button.text}")
-                    await button.click()
-                    soul_clicked = True
+                    soul_button = button
                     break
         
-        if not soul_clicked:
+        if not soul_button:
             print(f"❌ [{client.session.filename}] Не удалось найти 'Омут душ'")
             return False
         
-        # Ждем ответ после клика
+        # Ждем ответ после клика (ожидание регистрируется до клика)
         try:
-            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_limited(client, soul_button))
             print(f"✅ [{client.session.filename}] В 'Омут душ'")
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при переходе в 'Омут душ', пробуем продолжить...")
@@ -784,23 +706,22 @@ async def daily_cycle_for_account(client, bot_username):
             print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
         
         # Ищем кнопку пожертвования
-        donate_clicked = False
+        donate_button = None
         if msg.buttons:
             flat_buttons = [b for row in msg.buttons for b in row]
             for button in flat_buttons:
                 if "пожертвовать все эссенции/проекции душ" in button.text or "🔘" in button.text:
                     print(f"🎯 [{client.session.filename}] Найдена кнопка: {button.text}")
-                    await button.click()
-                    donate_clicked = True
+                    donate_button = button
                     break
         
-        if not donate_clicked:
+        if not donate_button:
             print(f"❌ [{client.session.filename}] Не удалось найти кнопку пожертвования")
             return False
         
-        # Ждем ответ после клика
+        # Ждем ответ после клика (ожидание регистрируется до клика)
         try:
-            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_limited(client, donate_button))
             print(f"✅ [{client.session.filename}] Эссенции пожертвованы")
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при пожертвовании, пробуем продолжить...")
@@ -811,11 +732,9 @@ async def daily_cycle_for_account(client, bot_username):
             except:
                 print(f"❌ [{client.session.filename}] Не удалось получить сообщения")
                 return False
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
 
         # 11. Отправляем "🛡 Мой клан"
         print(f"🛡 [{client.session.filename}] Проверяем клан...")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между текстовыми сообщениями
         msg = await send_message_and_wait(client, entity, "🛡 Мой клан")
         
         # Проверяем, есть ли клан
@@ -855,10 +774,8 @@ async def daily_cycle_for_account(client, bot_username):
 
         # 12. Отправляем "🛍 Магазин"
         print(f"🛍 [{client.session.filename}] Переходим в магазин...")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между текстовыми сообщениями
         msg = await send_message_and_wait(client, entity, "🛍 Магазин")
         print(f"✅ [{client.session.filename}] В магазине")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
 
         # 13. Нажимаем "крутки за BattleCoin"
         print(f"🎰 [{client.session.filename}] Нажимаем 'крутки за BattleCoin'...")
@@ -869,23 +786,22 @@ async def daily_cycle_for_account(client, bot_username):
             print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
         
         # Ищем кнопку круток
-        spin_clicked = False
+        spin_button = None
         if msg.buttons:
             flat_buttons = [b for row in msg.buttons for b in row]
             for button in flat_buttons:
                 if "Крутки за BattleCoin" in button.text or "🎖️" in button.text:
                     print(f"🎯 [{client.session.filename}] Найдена кнопка: {button.text}")
-                    await button.click()
-                    spin_clicked = True
+                    spin_button = button
                     break
         
-        if not spin_clicked:
+        if not spin_button:
             print(f"❌ [{client.session.filename}] Не удалось найти 'крутки за BattleCoin'")
             return False
         
-        # Ждем ответ после клика
+        # Ждем ответ после клика (ожидание регистрируется до клика)
         try:
-            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_limited(client, spin_button))
             print(f"✅ [{client.session.filename}] В крутках за BattleCoin")
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при переходе в крутки, пробуем продолжить...")
@@ -906,23 +822,22 @@ async def daily_cycle_for_account(client, bot_username):
             print(f"📋 [{client.session.filename}] Доступные кнопки: {button_texts}")
         
         # Ищем кнопку "10 ⚔️"
-        ten_clicked = False
+        ten_button = None
         if msg.buttons:
             flat_buttons = [b for row in msg.buttons for b in row]
             for button in flat_buttons:
                 if "10 ⚔️" in button.text or "10" in button.text and "⚔️" in button.text:
                     print(f"🎯 [{client.session.filename}] Найдена кнопка: {button.text}")
-                    await button.click()
-                    ten_clicked = True
+                    ten_button = button
                     break
         
-        if not ten_clicked:
+        if not ten_button:
             print(f"❌ [{client.session.filename}] Не удалось найти '10 ⚔️'")
             return False
         
-        # Ждем ответ после клика
+        # Ждем ответ после клика (ожидание регистрируется до клика)
         try:
-            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT)
+            msg = await wait_new_from(client, entity, timeout=MESSAGE_TIMEOUT, action=lambda: click_limited(client, ten_button))
             print(f"✅ [{client.session.filename}] Крутки за BattleCoin получены")
         except asyncio.TimeoutError:
             print(f"⚠️ [{client.session.filename}] Таймаут при покупке круток, пробуем продолжить...")
@@ -936,10 +851,8 @@ async def daily_cycle_for_account(client, bot_username):
 
         # 15. Отправляем "🎒 Профиль"
         print(f"🎒 [{client.session.filename}] Получаем профиль...")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между текстовыми сообщениями
         msg = await send_message_and_wait(client, entity, "🎒 Профиль")
         print(f"✅ [{client.session.filename}] Профиль получен")
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка между действиями
 
         # 16. Тратим попытки
         print(f"🎯 [{client.session.filename}] Проверяем попытки...")
@@ -961,7 +874,6 @@ async def daily_cycle_for_account(client, bot_username):
         else:
             print(f"ℹ️ [{client.session.filename}] Попытки не найдены в профиле")
 
-        await asyncio.sleep(MESSAGE_TIMEOUT)  # Задержка перед завершением
         print(f"🎉 [{client.session.filename}] Ежедневный цикл завершен!")
         return True
         
@@ -1028,8 +940,7 @@ async def run_daily_cycle():
     Запускает ежедневный цикл для всех аккаунтов (максимум 2 одновременно)
     """
     try:
-        with open("accounts.json", "r", encoding="utf-8") as f:
-            cfg = json.load(f)
+        cfg = await read_json_async("accounts.json")
 
         api_id = API_ID
         api_hash = API_HASH
@@ -1050,6 +961,7 @@ async def run_daily_cycle():
         
         success_count = sum(1 for r in results if r is True)
         print(f"🎉 Успешно обработано {success_count} из {len(accounts)} аккаунтов")
+        get_rate_limiter().report()
         return success_count > 0
         
     except FileNotFoundError:
@@ -1122,8 +1034,7 @@ async def main():
         elif mode == "test":
             print("🧪 Тестовый режим - проверяем подключение")
             try:
-                with open("accounts.json", "r", encoding="utf-8") as f:
-                    cfg = json.load(f)
+                cfg = await read_json_async("accounts.json")
                 
                 api_id = API_ID
                 api_hash = API_HASH
@@ -1143,8 +1054,7 @@ async def main():
                         print(f"✅ [{acc['session']}] Подключен как: {user_info} ({acc.get('phone')})")
                         
                         entity = await client.get_entity(acc.get("bot", bot))
-                        await client.send_message(entity, "📜 Меню")
-                        msg = await wait_new_from(client, entity, timeout=10)
+                        msg = await send_message_and_wait(client, entity, "📜 Меню", timeout=10)
                         print(f"✅ [{acc['session']}] Подключение к боту работает!")
                         print(f"📱 [{acc['session']}] Получено сообщение: {msg.raw_text[:100]}...")
                     except Exception as e:
@@ -1181,8 +1091,7 @@ async def main():
             elif choice == "3":
                 print("🧪 Тестовый режим...")
                 try:
-                    with open("accounts.json", "r", encoding="utf-8") as f:
-                        cfg = json.load(f)
+                    cfg = await read_json_async("accounts.json")
                     
                     api_id = API_ID
                     api_hash = API_HASH
@@ -1202,8 +1111,7 @@ async def main():
                             print(f"✅ [{acc['session']}] Подключен как: {user_info} ({acc.get('phone')})")
                             
                             entity = await client.get_entity(acc.get("bot", bot))
-                            await client.send_message(entity, "📜 Меню")
-                            msg = await wait_new_from(client, entity, timeout=10)
+                            msg = await send_message_and_wait(client, entity, "📜 Меню", timeout=10)
                             print(f"✅ [{acc['session']}] Подключение к боту работает!")
                             print(f"📱 [{acc['session']}] Получено сообщение: {msg.raw_text[:100]}...")
                         except Exception as e:
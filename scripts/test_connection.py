@@ -7,6 +7,7 @@ Test Connection - Тест подключения к боту
 import os
 import sys
 import asyncio
+import argparse
 
 # Добавляем родительскую директорию в путь для импорта combined_cycle.py
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,6 +26,7 @@ if not os.path.exists(combined_cycle_path):
 
 try:
     from combined_cycle import test_bot_connection
+    from connection_probe import PROBE_CONCURRENCY, PROBE_REPORT_PATH
 except ImportError as e:
     print(f"❌ Ошибка импорта combined_cycle: {e}")
     print(f"📁 Python path: {sys.path}")
@@ -33,8 +35,15 @@ except ImportError as e:
 
 async def main():
     """Запускает тест подключения к боту"""
+    parser = argparse.ArgumentParser(description="Параллельная проверка связи аккаунтов с ботом")
+    parser.add_argument("--concurrency", type=int, default=PROBE_CONCURRENCY,
+                        help=f"сколько аккаунтов проверять одновременно (по умолчанию {PROBE_CONCURRENCY})")
+    parser.add_argument("--output", default=PROBE_REPORT_PATH,
+                        help=f"куда записать JSON отчёт (по умолчанию {PROBE_REPORT_PATH}, '' - не записывать)")
+    args = parser.parse_args()
+    
     print("🔗 Тест подключения к боту...")
-    await test_bot_connection()
+    await test_bot_connection(concurrency=args.concurrency, output=args.output)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Session Health - Проверка сессий перед циклом без интерактивного входа
+Все сессии подключаются параллельно и проверяются только через
+is_user_authorized() и get_me(): код или пароль 2FA никогда не запрашиваются.
+Неавторизованные, заблокированные и зависшие сессии отсеиваются до цикла,
+чтобы не занимать слот concurrency ожиданием ввода.
+
+Результат: accounts/health.json
+    {"account_1": {"status": "ok", "user": "@name", "detail": "", "seconds": 0.42, "checked_at": "..."}}
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from telethon import errors
+
+from async_writer import save_json, write_async
+from message_router import close_routers
+from session_names import account_name
+
+HEALTH_PATH = os.path.join("accounts", "health.json")
+HEALTH_CHECK_ENABLED = os.getenv("HEALTH_CHECK", "1") != "0"
+# Одновременных проверок и время на одну проверку (сек)
+HEALTH_CHECK_CONCURRENCY = int(os.getenv("HEALTH_CHECK_CONCURRENCY", "20"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "20"))
+
+# Сессия отозвана или аккаунт заблокирован - нужен новый вход или другой аккаунт
+BANNED_ERRORS = (
+    errors.UserDeactivatedError,
+    errors.UserDeactivatedBanError,
+    errors.PhoneNumberBannedError,
+)
+REVOKED_ERRORS = (
+    errors.AuthKeyUnregisteredError,
+    errors.SessionRevokedError,
+    errors.SessionExpiredError,
+    errors.AuthKeyDuplicatedError,
+)
+
+STATUS_TEXT = {
+    "ok": "✅ в порядке",
+    "unauthorized": "🔑 не авторизована (нужен вход с кодом/2FA)",
+    "revoked": "🚫 сессия отозвана",
+    "banned": "⛔ аккаунт заблокирован",
+    "timeout": "⏰ нет ответа",
+    "error": "❌ ошибка",
+}
+
+
+async def check_session(client):
+    """
+    Проверяет одну сессию без запроса кода: (статус, get_me() или None, подробности)
+    """
+    try:
+        if not client.is_connected():
+            await client.connect()
+        if not await client.is_user_authorized():
+            return "unauthorized", None, ""
+        user = await client.get_me()
+        if user is None:
+            return "unauthorized", None, ""
+        return "ok", user, ""
+    except BANNED_ERRORS as e:
+        return "banned", None, type(e).__name__
+    except REVOKED_ERRORS as e:
+        return "revoked", None, type(e).__name__
+    except errors.RPCError as e:
+        return "error", None, f"{type(e).__name__}: {e}"
+
+
+async def check_sessions(accounts, make_client, keep_connected=False,
+                         concurrency=HEALTH_CHECK_CONCURRENCY, timeout=HEALTH_CHECK_TIMEOUT,
+                         path=HEALTH_PATH, on_ok=None):
+    """
+    Проверяет все сессии параллельно и возвращает (здоровые аккаунты, результаты).
+    make_client(acc) - клиент аккаунта; keep_connected - не отключать здоровых
+    (клиенты пула остаются подключены для цикла); on_ok(acc, user) - вызывается
+    для здоровых с результатом get_me(), чтобы пул не запрашивал его повторно
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = {}
+
+    async def check(acc):
+        async with semaphore:
+            client = make_client(acc)
+            started = time.monotonic()
+            try:
+                status, user, detail = await asyncio.wait_for(check_session(client), timeout)
+            except asyncio.TimeoutError:
+                status, user, detail = "timeout", None, f"> {timeout:.0f} с"
+            except Exception as e:
+                status, user, detail = "error", None, str(e)
+            seconds = time.monotonic() - started
+
+            if status != "ok" or not keep_connected:
+                close_routers(client)
+                try:
+                    await client.disconnect()
+                except Exception:
+                    pass
+            if status == "ok" and on_ok is not None:
+                on_ok(acc, user)
+
+            results[account_name(acc["session"])] = {
+                "status": status,
+                "user": user_label(user),
+                "detail": detail,
+                "seconds": round(seconds, 3),
+                "checked_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+
+    started = time.monotonic()
+    await asyncio.gather(*(check(acc) for acc in accounts))
+    elapsed = time.monotonic() - started
+
+    healthy = [acc for acc in accounts if results[account_name(acc["session"])]["status"] == "ok"]
+    report(results, elapsed)
+    await write_async(save_health, path, results)
+    return healthy, results
+
+
+def user_label(user):
+    """
+    @username или id пользователя для отчёта
+    """
+    if user is None:
+        return None
+    return f"@{user.username}" if user.username else str(user.id)
+
+
+def report(results, elapsed):
+    """
+    Печатает итог проверки: проблемные сессии по одной, остальные - числом
+    """
+    counts = {}
+    for name, result in sorted(results.items()):
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        if result["status"] != "ok":
+            detail = f" ({result['detail']})" if result["detail"] else ""
+            print(f"⚠️ [{name}] Сессия: {STATUS_TEXT[result['status']]}{detail}")
+    summary = ", ".join(f"{STATUS_TEXT[status]}: {count}" for status, count in sorted(counts.items()))
+    print(f"🩺 Проверка сессий за {elapsed:.1f} с - {summary or 'нет аккаунтов'}")
+
+
+def save_health(path, results):
+    """
+    Дописывает результаты проверки к прошлым (выполняется в фоновом потоке)
+    """
+    health = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            health = json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+    health.update(results)
+    save_json(path, health)
+
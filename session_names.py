@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Session Names - Имя аккаунта по имени его сессии
+Общий ключ аккаунта для журналов, лимитера, замеров и базы карт
+"""
+
+import os
+
+
+def account_name(session_name):
+    """
+    Имя аккаунта из имени сессии: "accounts/account_1.session" -> "account_1"
+    """
+    name = os.path.basename(str(session_name))
+    if name.endswith(".session"):
+        name = name[:-len(".session")]
+    return name
@@ -10,48 +10,7 @@ import os
 # Добавляем путь к скриптам
 sys.path.append('scripts')
 
-def load_rare_cards_filter():
-    """
-    Загружает список редких карт из JSON файла для фильтрации
-    """
-    try:
-        # Ищем файл в текущей директории
-        file_path = "rare_cards_filter.json"
-        if not os.path.exists(file_path):
-            # Если не найден, ищем в родительской директории
-            file_path = os.path.join("..", "rare_cards_filter.json")
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("cards", {})
-    except FileNotFoundError:
-        print("⚠️ Файл rare_cards_filter.json не найден")
-        return {}
-    except Exception as e:
-        print(f"❌ Ошибка загрузки rare_cards_filter.json: {e}")
-        return {}
-
-def is_rare_card_by_name(card_name):
-    """
-    Проверяет, является ли карта редкой по названию из списка фильтрации
-    Возвращает кортеж (категория, рейтинг) или (None, None)
-    """
-    rare_cards = load_rare_cards_filter()
-    
-    if not rare_cards:
-        return None, None
-    
-    # Нормализуем название карты для поиска
-    normalized_name = card_name.strip()
-    
-    # Проверяем по всем категориям редкости
-    for category, cards in rare_cards.items():
-        for card in cards:
-            if card.get("name", "").strip() == normalized_name:
-                rating = card.get("strength", None)
-                return category, rating
-    
-    return None, None
+from rare_card_index import is_rare_card_by_name
 
 def test_card_filter():
     """
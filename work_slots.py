@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Work Slots - Слоты concurrency, которые аккаунты делят порциями работы
+Аккаунт не держит слот на все свои крутки: после каждой порции
+(CARD_CHUNK_SIZE круток) он отдаёт слот следующему в очереди и встаёт в её
+конец, оставаясь подключённым. Очередь FIFO: порции разных аккаунтов
+чередуются, а порядок работы внутри аккаунта сохраняется.
+"""
+
+import asyncio
+import os
+import statistics
+import time
+from collections import deque
+
+# Круток в одной порции; 0 - аккаунт держит слот до конца цикла
+CARD_CHUNK_SIZE = int(os.getenv("CARD_CHUNK_SIZE", "5"))
+
+
+class SlotTurn:
+    """
+    Очередь одного аккаунта к слотам: вход, передача слота между порциями, выход
+    """
+
+    def __init__(self, slots, session_name):
+        self.slots = slots
+        self.session_name = session_name
+        self.busy_seconds = 0.0
+        self.chunks = 0
+        self._held_since = None
+
+    async def _acquire(self):
+        await self.slots._acquire()
+        self._held_since = time.monotonic()
+
+    def _release(self):
+        self.busy_seconds += time.monotonic() - self._held_since
+        self.slots.busy_seconds += time.monotonic() - self._held_since
+        self._held_since = None
+        self.slots._release()
+
+    async def __aenter__(self):
+        await self._acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.chunk_done()
+        self._release()
+
+    def held_seconds(self):
+        """
+        Время аккаунта в слоте с учётом текущей порции
+        """
+        current = time.monotonic() - self._held_since if self._held_since is not None else 0.0
+        return self.busy_seconds + current
+
+    def chunk_done(self):
+        """
+        Порция работы закончена (первая - время до первого результата аккаунта)
+        """
+        self.chunks += 1
+        if self.chunks == 1:
+            self.slots.first_results[self.session_name] = time.monotonic() - self.slots.started
+
+    async def yield_turn(self):
+        """
+        Отдаёт слот первому ожидающему аккаунту и встаёт в конец очереди
+        """
+        self.chunk_done()
+        self._release()
+        await self._acquire()
+
+
+class WorkSlots:
+    """
+    concurrency слотов на прогон + статистика: время до первого результата
+    по аккаунтам и загрузка слотов.
+    Очередь к слотам своя, а не asyncio.Semaphore: освобождённый слот
+    передаётся первому ожидающему напрямую, и вернувший слот аккаунт не может
+    занять его снова раньше очереди (порядок не зависит от версии Python)
+    """
+
+    def __init__(self, concurrency):
+        self.concurrency = max(1, concurrency)
+        self._free = self.concurrency
+        self._waiters = deque()
+        self.started = time.monotonic()
+        self.busy_seconds = 0.0
+        self.first_results = {}
+
+    async def _acquire(self):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже передан этому аккаунту - отдаём его следующему
+                self._release()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def _release(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(True)
+                return
+        self._free += 1
+
+    def turn(self, session_name):
+        return SlotTurn(self, session_name)
+
+    def stats(self):
+        """
+        {"wall_s", "utilization", "first_result_p50_s", "first_result_max_s"}
+        """
+        wall = time.monotonic() - self.started
+        first = list(self.first_results.values())
+        return {
+            "wall_s": round(wall, 2),
+            "utilization": round(self.busy_seconds / (self.concurrency * wall), 3) if wall > 0 else None,
+            "first_result_p50_s": round(statistics.median(first), 2) if first else None,
+            "first_result_max_s": round(max(first), 2) if first else None,
+        }
+
+    def report(self):
+        stats = self.stats()
+        if stats["first_result_p50_s"] is None:
+            return
+        print(f"📦 Слоты: загрузка {stats['utilization'] * 100:.0f}%, первый результат аккаунта "
+              f"через {stats['first_result_p50_s']:.1f} с (медиана), макс. {stats['first_result_max_s']:.1f} с")